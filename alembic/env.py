@@ -12,7 +12,8 @@ sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..'
 from app.core.base_class import Base
 from app.core.config import settings
 from app.domain.users.models import MstUser
-from app.domain.products.models import MstProduct, TrnProductStock
+from app.domain.products.models import MstProduct, TrnPriceChange, TrnProductStock, TrnStockMovement, TrnStockReservation, TrnStockSnapshot
+from app.domain.auth.models import TrnRevokedToken
 from app.domain.transactions.models import MstTransaction, TrnTransactionItem, TrnTransactionStatus
 from app.domain.expeditions.models import MstExpeditionService
 from app.domain.carts.models import MstCart
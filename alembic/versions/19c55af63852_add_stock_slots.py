@@ -0,0 +1,42 @@
+"""Add stock slots
+
+Revision ID: 19c55af63852
+Revises: 6a6f50cd9968
+Create Date: 2026-10-18 09:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '19c55af63852'
+down_revision: Union[str, None] = '6a6f50cd9968'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trn_product_stock', sa.Column('slot', sa.Integer(), server_default='0', nullable=False))
+    op.create_unique_constraint('uq_trn_product_stock_id_product_slot', 'trn_product_stock', ['id_product', 'slot'])
+
+
+def downgrade() -> None:
+    # fold sharded stock back into slot 0 before dropping the extra rows
+    op.execute(
+        """
+        UPDATE trn_product_stock s
+        SET stock = totals.stock
+        FROM (
+            SELECT id_product, SUM(stock) AS stock
+            FROM trn_product_stock
+            GROUP BY id_product
+        ) totals
+        WHERE s.id_product = totals.id_product AND s.slot = 0
+        """
+    )
+    op.execute("DELETE FROM trn_product_stock WHERE slot > 0")
+    op.drop_constraint('uq_trn_product_stock_id_product_slot', 'trn_product_stock', type_='unique')
+    op.drop_column('trn_product_stock', 'slot')
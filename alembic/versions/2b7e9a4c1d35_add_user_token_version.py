@@ -0,0 +1,26 @@
+"""Add user token version
+
+Revision ID: 2b7e9a4c1d35
+Revises: 8f41d2c7b9e0
+Create Date: 2026-10-18 13:37:12.618904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2b7e9a4c1d35'
+down_revision: Union[str, None] = '8f41d2c7b9e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('mst_users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('mst_users', 'token_version')
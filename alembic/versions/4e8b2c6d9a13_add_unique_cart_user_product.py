@@ -0,0 +1,65 @@
+"""Add unique cart user product
+
+Revision ID: 4e8b2c6d9a13
+Revises: 9d3f6a1b7c42
+Create Date: 2026-10-18 15:40:12.907314
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b2c6d9a13'
+down_revision: Union[str, None] = '9d3f6a1b7c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# folds up to BATCH_SIZE duplicated (id_user, id_product) groups into their
+# oldest line, summing quantity and price_at_time, and deletes the rest
+MERGE_DUPLICATES = sa.text("""
+    WITH groups AS (
+        SELECT id_user, id_product
+        FROM mst_carts
+        WHERE id_user IS NOT NULL AND id_product IS NOT NULL
+        GROUP BY id_user, id_product
+        HAVING count(*) > 1
+        LIMIT :batch_size
+    ), ranked AS (
+        SELECT
+            c.id_cart,
+            row_number() OVER (PARTITION BY c.id_user, c.id_product ORDER BY c.created_at, c.id_cart) AS position,
+            sum(c.quantity) OVER (PARTITION BY c.id_user, c.id_product) AS quantity,
+            sum(c.price_at_time) OVER (PARTITION BY c.id_user, c.id_product) AS price_at_time
+        FROM mst_carts c
+        JOIN groups g ON g.id_user = c.id_user AND g.id_product = c.id_product
+    ), merged AS (
+        UPDATE mst_carts
+        SET quantity = ranked.quantity, price_at_time = ranked.price_at_time, updated_at = timezone('utc', now())
+        FROM ranked
+        WHERE mst_carts.id_cart = ranked.id_cart AND ranked.position = 1
+        RETURNING mst_carts.id_cart
+    )
+    DELETE FROM mst_carts
+    USING ranked
+    WHERE mst_carts.id_cart = ranked.id_cart AND ranked.position > 1
+""")
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    # each batch commits on its own so locks stay short on large tables;
+    # CONCURRENTLY cannot run inside a transaction block either
+    with op.get_context().autocommit_block():
+        while connection.execute(MERGE_DUPLICATES, {"batch_size": BATCH_SIZE}).rowcount:
+            pass
+        op.create_index('uq_mst_carts_id_user_id_product', 'mst_carts', ['id_user', 'id_product'], unique=True, postgresql_concurrently=True, if_not_exists=True)
+    op.execute('ALTER TABLE mst_carts ADD CONSTRAINT uq_mst_carts_id_user_id_product UNIQUE USING INDEX uq_mst_carts_id_user_id_product')
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_mst_carts_id_user_id_product', 'mst_carts', type_='unique')
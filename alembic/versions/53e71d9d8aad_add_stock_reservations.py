@@ -0,0 +1,47 @@
+"""Add stock reservations
+
+Revision ID: 53e71d9d8aad
+Revises: 19c55af63852
+Create Date: 2026-10-18 10:03:27.540117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '53e71d9d8aad'
+down_revision: Union[str, None] = '19c55af63852'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trn_product_stock', sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('trn_stock_reservation',
+    sa.Column('id_reservation', sa.UUID(), nullable=False),
+    sa.Column('id_user', sa.UUID(), nullable=False),
+    sa.Column('id_product', sa.UUID(), nullable=False),
+    sa.Column('id_stock', sa.UUID(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_product'], ['mst_product.id_product'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['id_stock'], ['trn_product_stock.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['id_user'], ['mst_users.id_user'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_reservation')
+    )
+    op.create_index(op.f('ix_trn_stock_reservation_id_reservation'), 'trn_stock_reservation', ['id_reservation'], unique=False)
+    op.create_index(op.f('ix_trn_stock_reservation_expires_at'), 'trn_stock_reservation', ['expires_at'], unique=False)
+    op.create_index('ix_trn_stock_reservation_id_user_id_product', 'trn_stock_reservation', ['id_user', 'id_product'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trn_stock_reservation_id_user_id_product', table_name='trn_stock_reservation')
+    op.drop_index(op.f('ix_trn_stock_reservation_expires_at'), table_name='trn_stock_reservation')
+    op.drop_index(op.f('ix_trn_stock_reservation_id_reservation'), table_name='trn_stock_reservation')
+    op.drop_table('trn_stock_reservation')
+    op.drop_column('trn_product_stock', 'reserved')
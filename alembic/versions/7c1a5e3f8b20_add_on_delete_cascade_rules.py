@@ -0,0 +1,46 @@
+"""Add on delete cascade rules
+
+Revision ID: 7c1a5e3f8b20
+Revises: 4e8b2c6d9a13
+Create Date: 2026-10-18 16:21:48.550193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1a5e3f8b20'
+down_revision: Union[str, None] = '4e8b2c6d9a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# order history (transaction items -> products, transactions -> users and
+# expedition services) keeps its RESTRICT rules
+FOREIGN_KEYS = [
+    ('mst_carts_id_product_fkey', 'mst_carts', 'mst_product', 'id_product'),
+    ('mst_carts_id_user_fkey', 'mst_carts', 'mst_users', 'id_user'),
+    ('trn_transaction_items_id_transaction_fkey', 'trn_transaction_items', 'mst_transactions', 'id_transaction'),
+    ('trn_transaction_status_id_transaction_fkey', 'trn_transaction_status', 'mst_transactions', 'id_transaction'),
+]
+
+
+def _replace_foreign_keys(ondelete: Union[str, None]) -> None:
+    # NOT VALID skips the full-table check while the constraint is swapped;
+    # VALIDATE then scans in its own transaction without blocking writes
+    for name, table, referent, column in FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referent, [column], [column], ondelete=ondelete, postgresql_not_valid=True)
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in FOREIGN_KEYS:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
+
+
+def upgrade() -> None:
+    _replace_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    _replace_foreign_keys(None)
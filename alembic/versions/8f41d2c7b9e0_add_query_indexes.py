@@ -0,0 +1,41 @@
+"""Add query indexes
+
+Revision ID: 8f41d2c7b9e0
+Revises: e3c7f6f662f3
+Create Date: 2026-10-18 12:48:51.203117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f41d2c7b9e0'
+down_revision: Union[str, None] = 'e3c7f6f662f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# trn_product_stock.id_product is already covered by uq_trn_product_stock_id_product_slot
+INDEXES = [
+    ('ix_mst_carts_id_user_created_at', 'mst_carts', ['id_user', 'created_at']),
+    ('ix_mst_transactions_id_user_created_at', 'mst_transactions', ['id_user', 'created_at']),
+    ('ix_mst_transactions_created_at_id_transaction', 'mst_transactions', ['created_at', 'id_transaction']),
+    ('ix_trn_transaction_items_id_transaction', 'trn_transaction_items', ['id_transaction']),
+    ('ix_trn_transaction_status_id_transaction', 'trn_transaction_status', ['id_transaction']),
+    ('ix_mst_product_created_at_id_product', 'mst_product', ['created_at', 'id_product']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,36 @@
+"""Add user search indexes
+
+Revision ID: 9d3f6a1b7c42
+Revises: c5d0e8f2a417
+Create Date: 2026-10-18 15:02:37.418256
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3f6a1b7c42'
+down_revision: Union[str, None] = 'c5d0e8f2a417'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_mst_users_created_at_id_user', 'mst_users', ['created_at', 'id_user'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_mst_users_role_created_at_id_user', 'mst_users', ['role', 'created_at', 'id_user'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_mst_users_email_lower', 'mst_users', [sa.text('lower(email) text_pattern_ops')], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_mst_users_name_trgm', 'mst_users', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_mst_users_name_trgm', table_name='mst_users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_mst_users_email_lower', table_name='mst_users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_mst_users_role_created_at_id_user', table_name='mst_users', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_mst_users_created_at_id_user', table_name='mst_users', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,29 @@
+"""Add cart sweep index
+
+Revision ID: b2f4d8e6a5c1
+Revises: 7c1a5e3f8b20
+Create Date: 2026-10-18 17:05:29.614870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2f4d8e6a5c1'
+down_revision: Union[str, None] = '7c1a5e3f8b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_mst_carts_updated_at_id_cart', 'mst_carts', ['updated_at', 'id_cart'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_mst_carts_updated_at_id_cart', table_name='mst_carts', postgresql_concurrently=True, if_exists=True)
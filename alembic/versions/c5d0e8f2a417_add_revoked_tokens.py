@@ -0,0 +1,38 @@
+"""Add revoked tokens
+
+Revision ID: c5d0e8f2a417
+Revises: 2b7e9a4c1d35
+Create Date: 2026-10-18 14:12:40.337251
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d0e8f2a417'
+down_revision: Union[str, None] = '2b7e9a4c1d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('trn_revoked_token',
+    sa.Column('jti', sa.String(), nullable=False),
+    sa.Column('id_user', sa.UUID(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_user'], ['mst_users.id_user'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('jti')
+    )
+    op.create_index(op.f('ix_trn_revoked_token_created_at'), 'trn_revoked_token', ['created_at'], unique=False)
+    op.create_index(op.f('ix_trn_revoked_token_expires_at'), 'trn_revoked_token', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_trn_revoked_token_expires_at'), table_name='trn_revoked_token')
+    op.drop_index(op.f('ix_trn_revoked_token_created_at'), table_name='trn_revoked_token')
+    op.drop_table('trn_revoked_token')
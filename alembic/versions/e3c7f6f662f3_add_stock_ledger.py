@@ -0,0 +1,64 @@
+"""Add stock ledger
+
+Revision ID: e3c7f6f662f3
+Revises: 53e71d9d8aad
+Create Date: 2026-10-18 11:26:05.772431
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3c7f6f662f3'
+down_revision: Union[str, None] = '53e71d9d8aad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('trn_stock_movement',
+    sa.Column('id_movement', sa.UUID(), nullable=False),
+    sa.Column('id_product', sa.UUID(), nullable=False),
+    sa.Column('kind', sa.Enum('RESTOCK', 'SALE', 'CANCELLATION', 'ADJUSTMENT', name='stockmovementkind'), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_product'], ['mst_product.id_product'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_movement')
+    )
+    op.create_index(op.f('ix_trn_stock_movement_id_movement'), 'trn_stock_movement', ['id_movement'], unique=False)
+    op.create_index('ix_trn_stock_movement_id_product_created_at', 'trn_stock_movement', ['id_product', 'created_at'], unique=False)
+    op.create_table('trn_stock_snapshot',
+    sa.Column('id_snapshot', sa.UUID(), nullable=False),
+    sa.Column('id_product', sa.UUID(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_product'], ['mst_product.id_product'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_snapshot')
+    )
+    op.create_index(op.f('ix_trn_stock_snapshot_id_snapshot'), 'trn_stock_snapshot', ['id_snapshot'], unique=False)
+    op.create_index('ix_trn_stock_snapshot_id_product_taken_at', 'trn_stock_snapshot', ['id_product', 'taken_at'], unique=False)
+    # opening snapshot so the ledger starts from the current counters
+    op.execute(
+        """
+        INSERT INTO trn_stock_snapshot (id_snapshot, id_product, stock, taken_at, created_at, updated_at)
+        SELECT gen_random_uuid(), id_product, COALESCE(SUM(stock), 0), timezone('utc', now()), timezone('utc', now()), timezone('utc', now())
+        FROM trn_product_stock
+        GROUP BY id_product
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trn_stock_snapshot_id_product_taken_at', table_name='trn_stock_snapshot')
+    op.drop_index(op.f('ix_trn_stock_snapshot_id_snapshot'), table_name='trn_stock_snapshot')
+    op.drop_table('trn_stock_snapshot')
+    op.drop_index('ix_trn_stock_movement_id_product_created_at', table_name='trn_stock_movement')
+    op.drop_index(op.f('ix_trn_stock_movement_id_movement'), table_name='trn_stock_movement')
+    op.drop_table('trn_stock_movement')
+    sa.Enum(name='stockmovementkind').drop(op.get_bind(), checkfirst=True)
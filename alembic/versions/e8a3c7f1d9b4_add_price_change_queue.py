@@ -0,0 +1,39 @@
+"""Add price change queue
+
+Revision ID: e8a3c7f1d9b4
+Revises: b2f4d8e6a5c1
+Create Date: 2026-10-18 18:12:47.305216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8a3c7f1d9b4'
+down_revision: Union[str, None] = 'b2f4d8e6a5c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('trn_price_change',
+    sa.Column('id_product', sa.UUID(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['id_product'], ['mst_product.id_product'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id_product')
+    )
+    op.create_index(op.f('ix_trn_price_change_created_at'), 'trn_price_change', ['created_at'], unique=False)
+    # CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.create_index('ix_mst_carts_id_product', 'mst_carts', ['id_product'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_mst_carts_id_product', table_name='mst_carts', postgresql_concurrently=True, if_exists=True)
+    op.drop_index(op.f('ix_trn_price_change_created_at'), table_name='trn_price_change')
+    op.drop_table('trn_price_change')
@@ -0,0 +1,40 @@
+"""Detach stock ledger from products
+
+Revision ID: f1b6d3a8c2e7
+Revises: e8a3c7f1d9b4
+Create Date: 2026-10-18 19:02:11.483920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1b6d3a8c2e7'
+down_revision: Union[str, None] = 'e8a3c7f1d9b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# the stock ledger is an audit trail: it keeps plain product ids so deleting a
+# product neither takes the ledger along nor is blocked by it
+FOREIGN_KEYS = [
+    ('trn_stock_movement_id_product_fkey', 'trn_stock_movement', 'mst_product', 'id_product'),
+    ('trn_stock_snapshot_id_product_fkey', 'trn_stock_snapshot', 'mst_product', 'id_product'),
+]
+
+
+def upgrade() -> None:
+    for name, table, _, _ in FOREIGN_KEYS:
+        op.drop_constraint(name, table, type_='foreignkey')
+
+
+def downgrade() -> None:
+    # rows of deleted products would fail the constraint; they go first
+    for name, table, referent, column in FOREIGN_KEYS:
+        op.execute(f'DELETE FROM {table} WHERE {column} NOT IN (SELECT {column} FROM {referent})')
+        op.create_foreign_key(name, table, referent, [column], [column], ondelete='CASCADE', postgresql_not_valid=True)
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in FOREIGN_KEYS:
+            op.execute(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name}')
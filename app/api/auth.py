@@ -1,19 +1,56 @@
-from fastapi import APIRouter, Depends, status
+import math
+from typing import Optional
+from fastapi import APIRouter, Depends, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
 from app.domain.users.schemas import UserLogin, UserCreate
 from app.domain.users.service import UserService
-from app.core.dependencies import get_auth_service, get_user_service
+from app.core.dependencies import get_auth_service, get_cart_service, get_current_admin, get_user_service, security
+from app.core.rate_limit import admit_auth_attempt, auth_email_limiter, auth_ip_limiter, resolve_client_ip
+from app.domain.auth.security import PasswordHasherBusyError, decoded_token_cache, password_hasher
+from app.domain.auth.schemas import LogoutRequest, Principal, RefreshRequest
 from app.domain.auth.service import AuthService
+from app.domain.carts.guest import InvalidGuestCartError
+from app.domain.carts.services import CartService
 from app.utils.response_utils import create_response
 from app.domain.users.models import UserRole
 
 router = APIRouter()
 
+def _busy_response():
+    return create_response(
+        success=False,
+        message="Authentication is busy, please retry shortly",
+        error_code="AUTH_BUSY",
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+def _rate_limited_response(retry_after: float):
+    response = create_response(
+        success=False,
+        message="Too many attempts, please retry later",
+        error_code="RATE_LIMITED",
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS
+    )
+    response.headers["Retry-After"] = str(math.ceil(retry_after))
+    return response
+
+def _client_ip(request: Request) -> str:
+    return resolve_client_ip(request.client.host if request.client else None, request.headers.get("x-forwarded-for"))
+
 @router.post("/login", response_model=None)
 async def login(
+    request: Request,
     login_data: UserLogin,
-    auth_service: AuthService = Depends(get_auth_service)
+    auth_service: AuthService = Depends(get_auth_service),
+    cart_service: CartService = Depends(get_cart_service)
 ):
-    user = await auth_service.authenticate_user(login_data)
+    retry_after = await admit_auth_attempt("login", _client_ip(request), login_data.email)
+    if retry_after:
+        return _rate_limited_response(retry_after)
+    try:
+        user = await auth_service.authenticate_user(login_data)
+    except PasswordHasherBusyError:
+        return _busy_response()
     if not user:
         return create_response(
             success=False,
@@ -22,21 +59,66 @@ async def login(
             status_code=status.HTTP_401_UNAUTHORIZED
         )
     
-    access_token = auth_service.create_token(user.id_user)
+    data = auth_service.create_tokens(user)
+    if login_data.guest_cart:
+        # a bad guest cart never blocks the login itself
+        try:
+            data["guest_cart"] = await cart_service.merge_guest_cart(user.id_user, login_data.guest_cart)
+        except InvalidGuestCartError:
+            data["guest_cart"] = None
     return create_response(
         success=True,
         message="Login successful",
-        data={
-            "access_token": access_token, 
-            "token_type": "bearer"
-        }
+        data=data
+    )
+
+@router.post("/refresh", response_model=None)
+async def refresh(
+    refresh_in: RefreshRequest,
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    tokens = await auth_service.refresh_tokens(refresh_in.refresh_token)
+    if not tokens:
+        return create_response(
+            success=False,
+            message="Invalid or revoked refresh token",
+            error_code="INVALID_REFRESH_TOKEN",
+            status_code=status.HTTP_401_UNAUTHORIZED
+        )
+    return create_response(
+        success=True,
+        message="Token refreshed successfully",
+        data=tokens
+    )
+
+@router.post("/logout", response_model=None)
+async def logout(
+    logout_in: Optional[LogoutRequest] = None,
+    token: HTTPAuthorizationCredentials = Depends(security),
+    auth_service: AuthService = Depends(get_auth_service)
+):
+    refresh_token = logout_in.refresh_token if logout_in else None
+    if not await auth_service.logout(token.credentials, refresh_token):
+        return create_response(
+            success=False,
+            message="Invalid access token",
+            error_code="INVALID_TOKEN",
+            status_code=status.HTTP_401_UNAUTHORIZED
+        )
+    return create_response(
+        success=True,
+        message="Logout successful"
     )
 
 @router.post("/register", response_model=None)
 async def register(
+    request: Request,
     user_in: UserCreate,
     user_service: UserService = Depends(get_user_service)
 ):
+    retry_after = await admit_auth_attempt("register", _client_ip(request), user_in.email)
+    if retry_after:
+        return _rate_limited_response(retry_after)
     existing_user = await user_service.get_user_by_email(user_in.email)
     if existing_user:
         return create_response(
@@ -46,7 +128,10 @@ async def register(
             status_code=status.HTTP_400_BAD_REQUEST
         )
     user_in.role = UserRole.USER
-    user = await user_service.create_user(user_in)
+    try:
+        user = await user_service.create_user(user_in)
+    except PasswordHasherBusyError:
+        return _busy_response()
     return create_response(
         success=True,
         message="User created successfully",
@@ -59,3 +144,30 @@ async def register(
         },
         status_code=status.HTTP_201_CREATED
     )
+
+@router.get("/hashing/stats", response_model=None)
+async def read_password_hashing_stats(current_user: Principal = Depends(get_current_admin)):
+    return create_response(
+        success=True,
+        message="Password hashing stats retrieved successfully",
+        data=password_hasher.stats(),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.get("/token-cache/stats", response_model=None)
+async def read_token_cache_stats(current_user: Principal = Depends(get_current_admin)):
+    return create_response(
+        success=True,
+        message="Token cache stats retrieved successfully",
+        data=decoded_token_cache.stats(),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.get("/rate-limit/stats", response_model=None)
+async def read_rate_limit_stats(current_user: Principal = Depends(get_current_admin)):
+    return create_response(
+        success=True,
+        message="Rate limit stats retrieved successfully",
+        data={"ip": auth_ip_limiter.stats(), "email": auth_email_limiter.stats()},
+        status_code=status.HTTP_200_OK
+    )
@@ -1,68 +1,187 @@
 import uuid
-from fastapi import APIRouter, Depends, status
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, Query, status
 from app.domain.users.schemas import UserRole
+from app.domain.auth.schemas import Principal
 from app.domain.users.models import MstUser
 from app.core.dependencies import get_user_service, get_current_admin, get_current_user, get_cart_service, get_product_service
+from app.core.background import cart_sweep_stats
+from app.utils.pagination import decode_cursor, next_cursor
 from app.utils.response_utils import create_response
 from app.domain.carts.services import CartService
 from app.domain.products.services import ProductService
-from app.domain.carts.schemas import CartCreate, CartDelete, CartUpdate
+from app.domain.carts.guest import InvalidGuestCartError
+from app.domain.carts.schemas import CartBatch, CartDelete, CartUpdate, GuestCartBatch
 
 router = APIRouter()
 
+def _product_not_found():
+    return create_response(
+        success=False,
+        message="Product not found",
+        error_code="PRODUCT_NOT_FOUND",
+        status_code=status.HTTP_404_NOT_FOUND
+    )
+
 @router.post("/", response_model=None)
 async def create_cart(
     product_id: uuid.UUID,
-    quantity: int,
+    quantity: int = Query(gt=0),
     cart_service: CartService = Depends(get_cart_service),
     product_service: ProductService = Depends(get_product_service),
     current_user: MstUser = Depends(get_current_user)
 ):
     user_id = current_user.id_user
-    product = await product_service.get_product_by_id(product_id)
-    if not product:
+    held = await product_service.hold_product_stock(user_id, product_id, quantity)
+    if not held:
+        if await product_service.get_product_by_id(product_id):
+            return create_response(
+                success=False,
+                message="Insufficient stock for the product",
+                error_code="INSUFFICIENT_STOCK",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        return _product_not_found()
+    new_cart = await cart_service.add_cart_item(user_id, product_id, quantity)
+    if not new_cart:
+        # the product was deleted after the hold was taken
+        await product_service.release_holds(user_id, product_id, quantity)
+        return _product_not_found()
+    return create_response(
+        success=True,
+        message="Cart item created successfully",
+        data={
+            "id": str(new_cart.id_cart),
+            "user_id": str(new_cart.id_user),
+            "product_id": str(new_cart.id_product),
+            "quantity": new_cart.quantity,
+            "price_at_time": new_cart.price_at_time
+        },
+        status_code=status.HTTP_201_CREATED
+    )
+
+def _serialize_guest_cart(token: str, lines: list) -> dict:
+    return {
+        "token": token,
+        "items": [
+            {
+                "product_id": str(product.id_product),
+                "name": product.name,
+                "price": product.price,
+                "stock": product.stock,
+                "image_url": product.product_image_url,
+                "quantity": quantity,
+                "price_at_time": product.price * quantity
+            }
+            for product, quantity in lines
+        ]
+    }
+
+def _invalid_guest_cart(exc: InvalidGuestCartError):
+    return create_response(
+        success=False,
+        message=str(exc),
+        error_code="INVALID_GUEST_CART",
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
+
+@router.get("/guest", response_model=None)
+async def read_guest_cart(
+    x_guest_cart: Optional[str] = Header(None),
+    cart_service: CartService = Depends(get_cart_service)
+):
+    try:
+        lines = await cart_service.get_guest_cart(x_guest_cart)
+    except InvalidGuestCartError as exc:
+        return _invalid_guest_cart(exc)
+    return create_response(
+        success=True,
+        message="Guest cart retrieved successfully",
+        data=_serialize_guest_cart(x_guest_cart, lines),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.patch("/guest", response_model=None)
+async def apply_guest_cart_operations(
+    batch: GuestCartBatch,
+    cart_service: CartService = Depends(get_cart_service)
+):
+    try:
+        token, lines = await cart_service.apply_guest_cart_operations(batch.token, batch.operations)
+    except InvalidGuestCartError as exc:
+        return _invalid_guest_cart(exc)
+    except LookupError as exc:
         return create_response(
             success=False,
-            message="Product not found",
+            message=str(exc),
+            error_code="PRODUCT_NOT_FOUND",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return create_response(
+        success=True,
+        message="Guest cart updated successfully",
+        data=_serialize_guest_cart(token, lines),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.patch("/", response_model=None)
+async def apply_cart_operations(
+    batch: CartBatch,
+    cart_service: CartService = Depends(get_cart_service),
+    current_user: MstUser = Depends(get_current_user)
+):
+    try:
+        carts = await cart_service.apply_cart_operations(current_user.id_user, batch.operations)
+    except LookupError as exc:
+        return create_response(
+            success=False,
+            message=str(exc),
             error_code="PRODUCT_NOT_FOUND",
             status_code=status.HTTP_404_NOT_FOUND
         )
-    if product.stock < quantity:
+    except ValueError as exc:
         return create_response(
             success=False,
-            message="Insufficient stock for the product",
+            message=str(exc),
             error_code="INSUFFICIENT_STOCK",
             status_code=status.HTTP_400_BAD_REQUEST
         )
-    cart_in = CartCreate(
-        id_user=user_id,
-        id_product=product_id,
-        quantity=quantity,
-        price_at_time=product.price * quantity,
+    return create_response(
+        success=True,
+        message="Cart updated successfully",
+        data=[
+            {
+                "id": str(cart.id_cart),
+                "user_id": str(cart.id_user),
+                "product_id": str(cart.id_product),
+                "quantity": cart.quantity,
+                "price_at_time": cart.price_at_time
+            }
+            for cart in carts
+        ],
+        status_code=status.HTTP_200_OK
     )
-    new_cart = await cart_service.create_cart(cart_in)
+
+@router.get("/sweeper/stats", response_model=None)
+async def read_cart_sweeper_stats(current_user: Principal = Depends(get_current_admin)):
     return create_response(
         success=True,
-        message="Cart item created successfully",
-        data={
-            "id": str(new_cart.id_cart),
-            "user_id": str(new_cart.id_user),
-            "product_id": str(new_cart.id_product),
-            "quantity": new_cart.quantity,
-            "price_at_time": new_cart.price_at_time
-        },
-        status_code=status.HTTP_201_CREATED
+        message="Cart sweeper stats retrieved successfully",
+        data=cart_sweep_stats.stats(),
+        status_code=status.HTTP_200_OK
     )
 
 @router.get("/user/{user_id}", response_model=None)
 async def read_carts_by_user_id_admin_only(
     user_id: uuid.UUID,
     cart_service: CartService = Depends(get_cart_service),
-    current_user: MstUser = Depends(get_current_admin),
+    current_user: Principal = Depends(get_current_admin),
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    carts = await cart_service.get_carts_by_user_id(user_id, limit, offset)
+    carts = await cart_service.get_carts_by_user_id(user_id, limit, offset, decode_cursor(cursor))
+    total, total_is_estimate = await cart_service.count_carts_by_user_id(user_id)
     return create_response(
         success=True,
         message="Cart items retrieved successfully",
@@ -80,7 +199,9 @@ async def read_carts_by_user_id_admin_only(
         pagination={
             "limit": limit,
             "offset": offset,
-            "total": len(carts)
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_cursor": next_cursor(carts, limit, "created_at", "id_cart")
         }
     )
 
@@ -89,28 +210,50 @@ async def read_carts_by_user_id(
     cart_service: CartService = Depends(get_cart_service),
     current_user: MstUser = Depends(get_current_user),
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    expand: Optional[Literal["product"]] = None
 ):
     user_id = current_user.id_user
-    carts = await cart_service.get_carts_by_user_id(user_id, limit, offset)
+    expand_product = expand == "product"
+    carts = await cart_service.get_carts_by_user_id(user_id, limit, offset, decode_cursor(cursor), expand_product)
+    items = [
+        {
+            "id": str(cart.id_cart),
+            "user_id": str(cart.id_user),
+            "product_id": str(cart.id_product),
+            "quantity": cart.quantity,
+            "price_at_time": cart.price_at_time
+        }
+        for cart in carts
+    ]
+    if expand_product:
+        for item, cart in zip(items, carts):
+            item["product"] = {
+                "name": cart.product.name,
+                "price": cart.product.price,
+                "stock": cart.product.stock,
+                "image_url": cart.product.product_image_url
+            }
+            item["stock_shortfall"] = cart.stock_shortfall
+        # the totals query already counts the lines exactly
+        totals = await cart_service.get_cart_totals(user_id)
+        total, total_is_estimate = totals["lines"], False
+        data = {"items": items, "totals": totals}
+    else:
+        total, total_is_estimate = await cart_service.count_carts_by_user_id(user_id)
+        data = items
     return create_response(
         success=True,
         message="Cart items retrieved successfully",
-        data=[
-            {
-                "id": str(cart.id_cart),
-                "user_id": str(cart.id_user),
-                "product_id": str(cart.id_product),
-                "quantity": cart.quantity,
-                "price_at_time": cart.price_at_time
-            }
-            for cart in carts
-        ],
+        data=data,
         status_code=status.HTTP_200_OK,
         pagination={
             "limit": limit,
             "offset": offset,
-            "total": len(carts)
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_cursor": next_cursor(carts, limit, "created_at", "id_cart")
         }
     )
 
@@ -118,6 +261,7 @@ async def read_carts_by_user_id(
 async def delete_cart_item(
     product_id: uuid.UUID,
     cart_service: CartService = Depends(get_cart_service),
+    product_service: ProductService = Depends(get_product_service),
     current_user: MstUser = Depends(get_current_user)
 ):
     user_id = current_user.id_user
@@ -130,6 +274,7 @@ async def delete_cart_item(
             error_code="CART_ITEM_NOT_FOUND",
             status_code=status.HTTP_404_NOT_FOUND
         )
+    await product_service.release_holds(user_id, product_id)
     return create_response(
         success=True,
         message="Cart item deleted successfully",
@@ -139,9 +284,11 @@ async def delete_cart_item(
 @router.delete("/empty", response_model=None)
 async def empty_cart(
     cart_service: CartService = Depends(get_cart_service),
+    product_service: ProductService = Depends(get_product_service),
     current_user: MstUser = Depends(get_current_user)
 ):
     user_id = current_user.id_user
+    await product_service.release_holds(user_id)
     success = await cart_service.empty_cart_by_user_id(user_id)
     if not success:
         return create_response(
@@ -159,7 +306,7 @@ async def empty_cart(
 @router.put("/{cart_id}", response_model=None)
 async def update_cart_item(
     cart_id: uuid.UUID,
-    quantity: int,
+    quantity: int = Query(gt=0),
     cart_service: CartService = Depends(get_cart_service),
     product_service: ProductService = Depends(get_product_service),
     current_user: MstUser = Depends(get_current_user)
@@ -187,14 +334,21 @@ async def update_cart_item(
             error_code="PRODUCT_NOT_FOUND",
             status_code=status.HTTP_404_NOT_FOUND,
         )
-    if product.stock < quantity:
-        return create_response(
-            success=False,
-            message="Insufficient stock for the product",
-            error_code="INSUFFICIENT_STOCK",
-            status_code=status.HTTP_400_BAD_REQUEST
-        )
-    cart_in = CartUpdate(quantity=quantity, price_at_time=product.price * quantity)
+    # read everything needed before the hold commits and expires the loaded rows
+    user_id, product_id, held_quantity = current_user.id_user, cart.id_product, cart.quantity
+    price_at_time = product.price * quantity
+    if quantity > held_quantity:
+        held = await product_service.hold_product_stock(user_id, product_id, quantity - held_quantity)
+        if not held:
+            return create_response(
+                success=False,
+                message="Insufficient stock for the product",
+                error_code="INSUFFICIENT_STOCK",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+    elif quantity < held_quantity:
+        await product_service.release_holds(user_id, product_id, held_quantity - quantity)
+    cart_in = CartUpdate(quantity=quantity, price_at_time=price_at_time)
     updated_cart = await cart_service.update_cart(cart_id, cart_in)
     return create_response(
         success=True,
@@ -1,8 +1,10 @@
 import uuid
+from typing import Optional
 from fastapi import APIRouter, Depends, status
 from app.domain.users.schemas import UserRole
-from app.domain.users.models import MstUser
+from app.domain.auth.schemas import Principal
 from app.core.dependencies import get_expedition_service, get_current_admin
+from app.utils.pagination import decode_cursor, next_cursor
 from app.utils.response_utils import create_response
 from app.domain.expeditions.services import ExpeditionService
 
@@ -12,7 +14,7 @@ router = APIRouter()
 async def create_expedition_service(
     name: str,
     expedition_service: ExpeditionService = Depends(get_expedition_service),
-    current_user: MstUser = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     new_service = await expedition_service.create_expedition_service(name)
     return create_response(
@@ -29,7 +31,7 @@ async def create_expedition_service(
 async def bulk_create_expedition_services(
     services: list[str],
     expedition_service: ExpeditionService = Depends(get_expedition_service),
-    current_user: MstUser = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     new_services = await expedition_service.bulk_create_expedition_services(services)
     return create_response(
@@ -49,9 +51,11 @@ async def bulk_create_expedition_services(
 async def read_expedition_services(
     expedition_service: ExpeditionService = Depends(get_expedition_service),
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    services = await expedition_service.get_all_expedition_services(limit, offset)
+    services = await expedition_service.get_all_expedition_services(limit, offset, decode_cursor(cursor))
+    total, total_is_estimate = await expedition_service.count_expedition_services()
     return create_response(
         success=True,
         message="Expedition services retrieved successfully",
@@ -66,7 +70,9 @@ async def read_expedition_services(
         pagination={
             "limit": limit,
             "offset": offset,
-            "total": len(services)
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_cursor": next_cursor(services, limit, "name", "id_expedition_service")
         }
     )
 
@@ -98,7 +104,7 @@ async def update_expedition_service(
     service_id: uuid.UUID,
     name: str,
     expedition_service: ExpeditionService = Depends(get_expedition_service),
-    current_user: MstUser = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     updated_service = await expedition_service.update_expedition_service(service_id, name)
     if not updated_service:
@@ -122,7 +128,7 @@ async def update_expedition_service(
 async def delete_expedition_service(
     service_id: uuid.UUID,
     expedition_service: ExpeditionService = Depends(get_expedition_service),
-    current_user: MstUser = Depends(get_current_admin)
+    current_user: Principal = Depends(get_current_admin)
 ):
     deleted = await expedition_service.delete_expedition_service(service_id)
     if not deleted:
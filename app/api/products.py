@@ -1,22 +1,36 @@
+import json
 import uuid
 from typing import Optional
-from fastapi import APIRouter, Depends, File, Form, UploadFile, status
+from fastapi import APIRouter, Depends, File, Form, Query, Request, UploadFile, status
 from app.domain.products.schemas import ProductCreate, ProductUpdate
-from app.domain.users.models import MstUser
+from app.domain.products.models import TrnProductStock
+from app.domain.auth.schemas import Principal
+from app.core.config import settings
 from app.core.dependencies import get_current_admin, get_product_service
 from app.domain.products.services import ProductService
+from app.utils.pagination import decode_cursor, next_cursor
 from app.utils.response_utils import create_response
+from app.utils.streaming import iterate, read_lines
 from app.core.image_service import ImageService
 
 router = APIRouter()
 
+def _serialize_stock_slots(product_id: uuid.UUID, stock_slots: list[TrnProductStock]) -> dict:
+    return {
+        "id": str(product_id),
+        "stock": sum(slot.stock or 0 for slot in stock_slots),
+        "slots": [slot.stock for slot in stock_slots]
+    }
+
 @router.get("/", response_model=None)
 async def read_products(
     product_service: ProductService = Depends(get_product_service),
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
-    products = await product_service.get_all_products(limit, offset)
+    products = await product_service.get_all_products(limit, offset, decode_cursor(cursor))
+    total, total_is_estimate = await product_service.count_products()
     return create_response(
         success=True,
         message="Products retrieved successfully",
@@ -35,10 +49,24 @@ async def read_products(
         pagination={
             "limit": limit,
             "offset": offset,
-            "total": len(products)
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_cursor": next_cursor(products, limit, "created_at", "id_product")
         }
     )
 
+@router.get("/cache/stats", response_model=None)
+async def read_product_cache_stats(
+    current_user: Principal = Depends(get_current_admin),
+    product_service: ProductService = Depends(get_product_service)
+):
+    return create_response(
+        success=True,
+        message="Product cache stats retrieved successfully",
+        data=product_service.get_cache_stats(),
+        status_code=status.HTTP_200_OK
+    )
+
 @router.get("/{product_id}", response_model=None)
 async def read_product(
     product_id: uuid.UUID,
@@ -73,7 +101,7 @@ async def create_product(
     stock: int = Form(...),
     description: Optional[str] = Form(None),
     image: Optional[UploadFile] = File(None),
-    current_user: MstUser = Depends(get_current_admin),
+    current_user: Principal = Depends(get_current_admin),
     product_service: ProductService = Depends(get_product_service),
     image_service: ImageService = Depends()
 ):
@@ -108,7 +136,7 @@ async def create_product(
 async def update_product(
     product_id: uuid.UUID,
     product_in: ProductUpdate,
-    current_user: MstUser = Depends(get_current_admin),
+    current_user: Principal = Depends(get_current_admin),
     product_service: ProductService = Depends(get_product_service)
 ):
     product = await product_service.update_product(product_id, product_in)
@@ -136,11 +164,19 @@ async def update_product(
 @router.put("/{product_id}/stock", response_model=None)
 async def update_product_stock(
     product_id: uuid.UUID,
-    stock: int,
-    current_user: MstUser = Depends(get_current_admin),
+    stock: int = Query(ge=0),
+    current_user: Principal = Depends(get_current_admin),
     product_service: ProductService = Depends(get_product_service)
 ):
-    product_stock = await product_service.update_product_stock(product_id, stock)
+    try:
+        product_stock = await product_service.update_product_stock(product_id, stock)
+    except ValueError as exc:
+        return create_response(
+            success=False,
+            message=str(exc),
+            error_code="STOCK_BELOW_RESERVED",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
     if not product_stock:
         return create_response(
             success=False,
@@ -158,10 +194,131 @@ async def update_product_stock(
         status_code=status.HTTP_200_OK
     )
 
+@router.put("/stock/bulk", response_model=None)
+async def bulk_update_product_stock(
+    request: Request,
+    current_user: Principal = Depends(get_current_admin),
+    product_service: ProductService = Depends(get_product_service)
+):
+    if "ndjson" in request.headers.get("content-type", ""):
+        rows = read_lines(request)
+    else:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            body = None
+        if not isinstance(body, list):
+            return create_response(
+                success=False,
+                message="Request body must be a JSON array or NDJSON stream of stock adjustments",
+                error_code="INVALID_STOCK_ADJUSTMENTS",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        rows = iterate(body)
+    results = await product_service.bulk_update_product_stock(rows)
+    return create_response(
+        success=True,
+        message="Product stock adjustments processed",
+        data=[
+            {
+                **result,
+                "product_id": str(result["product_id"]) if result["product_id"] else None
+            }
+            for result in results
+        ],
+        status_code=status.HTTP_200_OK
+    )
+
+@router.put("/{product_id}/stock/slots", response_model=None)
+async def update_product_stock_slots(
+    product_id: uuid.UUID,
+    slots: int = Query(ge=1, le=settings.stock_max_slots),
+    current_user: Principal = Depends(get_current_admin),
+    product_service: ProductService = Depends(get_product_service)
+):
+    try:
+        stock_slots = await product_service.set_stock_slots(product_id, slots)
+    except ValueError as exc:
+        return create_response(
+            success=False,
+            message=str(exc),
+            error_code="INVALID_STOCK_SLOTS",
+            status_code=status.HTTP_400_BAD_REQUEST
+        )
+    if not stock_slots:
+        return create_response(
+            success=False,
+            message="Product not found",
+            error_code="PRODUCT_NOT_FOUND",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return create_response(
+        success=True,
+        message="Product stock slots updated successfully",
+        data=_serialize_stock_slots(product_id, stock_slots),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.post("/{product_id}/stock/rebalance", response_model=None)
+async def rebalance_product_stock(
+    product_id: uuid.UUID,
+    current_user: Principal = Depends(get_current_admin),
+    product_service: ProductService = Depends(get_product_service)
+):
+    stock_slots = await product_service.rebalance_stock_slots(product_id)
+    if not stock_slots:
+        return create_response(
+            success=False,
+            message="Product not found",
+            error_code="PRODUCT_NOT_FOUND",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return create_response(
+        success=True,
+        message="Product stock rebalanced successfully",
+        data=_serialize_stock_slots(product_id, stock_slots),
+        status_code=status.HTTP_200_OK
+    )
+
+@router.get("/{product_id}/stock/ledger", response_model=None)
+async def read_product_stock_ledger(
+    product_id: uuid.UUID,
+    limit: int = 50,
+    current_user: Principal = Depends(get_current_admin),
+    product_service: ProductService = Depends(get_product_service)
+):
+    ledger = await product_service.get_stock_ledger(product_id, limit)
+    if not ledger:
+        return create_response(
+            success=False,
+            message="Product not found",
+            error_code="PRODUCT_NOT_FOUND",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return create_response(
+        success=True,
+        message="Product stock ledger retrieved successfully",
+        data={
+            "id": str(product_id),
+            "stock": ledger["stock"],
+            "ledger_stock": ledger["ledger_stock"],
+            "movements": [
+                {
+                    "id": str(movement.id_movement),
+                    "kind": movement.kind,
+                    "quantity": movement.quantity,
+                    "created_at": movement.created_at.isoformat()
+                }
+                for movement in ledger["movements"]
+            ]
+        },
+        status_code=status.HTTP_200_OK
+    )
+
 @router.delete("/{product_id}", response_model=None)
 async def delete_product(
     product_id: uuid.UUID,
-    current_user: MstUser = Depends(get_current_admin),
+    current_user: Principal = Depends(get_current_admin),
     product_service: ProductService = Depends(get_product_service),
     image_service: ImageService = Depends()
 ):
@@ -174,10 +331,18 @@ async def delete_product(
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    if product.product_image_url:
-        image_service.delete_image(product.product_image_url)
-
-    success = await product_service.delete_product(product_id)
+    image_url = product.product_image_url
+    try:
+        await product_service.delete_product(product_id)
+    except ValueError as exc:
+        return create_response(
+            success=False,
+            message=str(exc),
+            error_code="PRODUCT_IN_USE",
+            status_code=status.HTTP_409_CONFLICT
+        )
+    if image_url:
+        image_service.delete_image(image_url)
     return create_response(
         success=True,
         message="Product deleted successfully",
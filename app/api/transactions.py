@@ -3,7 +3,7 @@ from uuid import UUID
 from fastapi import APIRouter, Depends, status
 from app.core.dependencies import (
 	get_current_admin,
-	get_current_user,
+	get_current_principal,
 	get_transaction_service,
 )
 from app.domain.transactions.helpers import serialize_transaction
@@ -15,7 +15,8 @@ from app.domain.transactions.schemas import (
 	TransactionStatusUpdate,
 )
 from app.domain.transactions.services import TransactionService
-from app.domain.users.models import MstUser
+from app.domain.auth.schemas import Principal
+from app.utils.pagination import decode_cursor, next_cursor
 from app.utils.response_utils import create_response
 
 router = APIRouter()
@@ -25,7 +26,7 @@ router = APIRouter()
 async def create_transaction(
 	payload: TransactionCreateRequest,
 	transaction_service: TransactionService = Depends(get_transaction_service),
-	current_user: MstUser = Depends(get_current_user),
+	current_user: Principal = Depends(get_current_principal),
 ):
 	transaction_in = TransactionCreate(
 		id_user=current_user.id_user,
@@ -53,12 +54,13 @@ async def create_transaction(
 @router.get("/", response_model=None)
 async def list_transactions(
 	transaction_service: TransactionService = Depends(get_transaction_service),
-	current_user: MstUser = Depends(get_current_user),
+	current_user: Principal = Depends(get_current_principal),
 	user_id: Optional[UUID] = None,
 	status_filter: Optional[TransactionStatus] = None,
 	expedition_service: Optional[UUID] = None,
 	limit: int = 10,
 	offset: int = 0,
+	cursor: Optional[str] = None,
 ):
 	effective_user_id = user_id if current_user.role == "admin" else current_user.id_user
 
@@ -68,6 +70,12 @@ async def list_transactions(
 		expedition_service=expedition_service,
 		limit=limit,
 		offset=offset,
+		cursor=decode_cursor(cursor),
+	)
+	total, total_is_estimate = await transaction_service.count_transactions(
+		user_id=effective_user_id,
+		status=status_filter,
+		expedition_service=expedition_service,
 	)
 
 	return create_response(
@@ -78,7 +86,9 @@ async def list_transactions(
 		pagination={
 			"limit": limit,
 			"offset": offset,
-			"total": len(transactions),
+			"total": total,
+			"total_is_estimate": total_is_estimate,
+			"next_cursor": next_cursor(transactions, limit, "created_at", "id_transaction"),
 		},
 	)
 
@@ -87,7 +97,7 @@ async def list_transactions(
 async def get_transaction(
 	transaction_id: UUID,
 	transaction_service: TransactionService = Depends(get_transaction_service),
-	current_user: MstUser = Depends(get_current_user),
+	current_user: Principal = Depends(get_current_principal),
 ):
 	transaction = await transaction_service.get_transaction_by_id(transaction_id)
 	if not transaction:
@@ -119,9 +129,17 @@ async def update_transaction_status(
 	transaction_id: UUID,
 	payload: TransactionStatusUpdate,
 	transaction_service: TransactionService = Depends(get_transaction_service),
-	current_user: MstUser = Depends(get_current_admin),
+	current_user: Principal = Depends(get_current_admin),
 ):
-	updated_status = await transaction_service.update_transaction_status(transaction_id, payload.status)
+	try:
+		updated_status = await transaction_service.update_transaction_status(transaction_id, payload.status)
+	except ValueError as exc:
+		return create_response(
+			success=False,
+			message=str(exc),
+			error_code="INVALID_STATUS",
+			status_code=status.HTTP_400_BAD_REQUEST,
+		)
 	if not updated_status:
 		return create_response(
 			success=False,
@@ -146,7 +164,7 @@ async def update_transaction_expedition(
 	transaction_id: UUID,
 	expedition_service_id: UUID,
 	transaction_service: TransactionService = Depends(get_transaction_service),
-	current_user: MstUser = Depends(get_current_user),
+	current_user: Principal = Depends(get_current_principal),
 ):
 	transaction = await transaction_service.get_transaction_by_id(transaction_id)
 	if not transaction:
@@ -187,7 +205,7 @@ async def update_transaction_expedition(
 async def simulate_payment(
 	payload: TransactionPaymentSimulation,
 	transaction_service: TransactionService = Depends(get_transaction_service),
-	current_user: MstUser = Depends(get_current_user),
+	current_user: Principal = Depends(get_current_principal),
 ):
 	transaction = await transaction_service.get_transaction_by_id(payload.transaction_id)
 	if not transaction:
@@ -215,7 +233,15 @@ async def simulate_payment(
 			status_code=status.HTTP_400_BAD_REQUEST,
 		)
 
-	updated_status = await transaction_service.update_transaction_status(payload.transaction_id, TransactionStatus.PAID)
+	try:
+		updated_status = await transaction_service.update_transaction_status(payload.transaction_id, TransactionStatus.PAID)
+	except ValueError:
+		return create_response(
+			success=False,
+			message="Only pending transactions can be paid",
+			error_code="INVALID_STATUS",
+			status_code=status.HTTP_400_BAD_REQUEST,
+		)
 	if not updated_status:
 		return create_response(
 			success=False,
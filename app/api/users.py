@@ -1,9 +1,16 @@
-from fastapi import APIRouter, Depends, status
-from app.domain.users.schemas import UserUpdate, UserRole
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, Request, status
+from app.domain.users.schemas import UserUpdate
 from app.core.dependencies import get_user_service, get_current_user, get_current_admin
 from app.domain.users.service import UserService
-from app.domain.users.models import MstUser
+from app.domain.auth.schemas import Principal
+from app.domain.users.models import MstUser, UserRole
+from app.utils.pagination import decode_cursor, next_cursor
 from app.utils.response_utils import create_response
+from app.utils.streaming import iterate, parse_csv, read_lines
 
 router = APIRouter()
 
@@ -45,12 +52,20 @@ async def update_user_me(
 
 @router.get("/", response_model=None)
 async def read_users(
-    current_user: MstUser = Depends(get_current_admin),
+    current_user: Principal = Depends(get_current_admin),
     user_service: UserService = Depends(get_user_service),
     limit: int = 10,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    search: Optional[str] = None,
+    role: Optional[UserRole] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
 ):
-    users = await user_service.get_all_users(limit, offset)
+    users = await user_service.get_all_users(
+        limit, offset, decode_cursor(cursor), search, role, created_from, created_to
+    )
+    total, total_is_estimate = await user_service.count_users(search, role, created_from, created_to)
     return create_response(
         success=True,
         message="Users retrieved successfully",
@@ -67,6 +82,63 @@ async def read_users(
         pagination={
             "limit": limit,
             "offset": offset,
-            "total": len(users)
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "next_cursor": next_cursor(users, limit, "created_at", "id_user")
         }
-    )
\ No newline at end of file
+    )
+
+@router.post("/import", response_model=None)
+async def import_users(
+    request: Request,
+    current_user: Principal = Depends(get_current_admin),
+    user_service: UserService = Depends(get_user_service)
+):
+    content_type = request.headers.get("content-type", "")
+    if "csv" in content_type:
+        rows = parse_csv(read_lines(request))
+    elif "ndjson" in content_type:
+        rows = read_lines(request)
+    else:
+        try:
+            body = await request.json()
+        except json.JSONDecodeError:
+            body = None
+        if not isinstance(body, list):
+            return create_response(
+                success=False,
+                message="Request body must be a JSON array, NDJSON stream or CSV of users",
+                error_code="INVALID_USER_IMPORT",
+                status_code=status.HTTP_400_BAD_REQUEST
+            )
+        rows = iterate(body)
+    results = await user_service.import_users(rows)
+    return create_response(
+        success=True,
+        message="User import processed",
+        data=[
+            {**result, "id": str(result["id"]) if result["id"] else None}
+            for result in results
+        ],
+        status_code=status.HTTP_200_OK
+    )
+
+@router.post("/{user_id}/tokens/revoke", response_model=None)
+async def revoke_user_tokens(
+    user_id: uuid.UUID,
+    current_user: Principal = Depends(get_current_admin),
+    user_service: UserService = Depends(get_user_service)
+):
+    token_version = await user_service.revoke_tokens(user_id)
+    if token_version is None:
+        return create_response(
+            success=False,
+            message="User not found",
+            error_code="USER_NOT_FOUND",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return create_response(
+        success=True,
+        message="User tokens revoked successfully",
+        data={"id": str(user_id), "token_version": token_version}
+    )
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.domain.auth.repositories import TokenRepository
+from app.domain.auth.revocation import token_revocations
+from app.domain.carts.repositories import CartRepository
+from app.domain.carts.services import CartService
+from app.domain.products.repositories import ProductRepository
+from app.domain.products.services import ProductService
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(name: str, interval_seconds: float, job: Callable[[], Awaitable[object]]) -> None:
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Background job %s failed", name)
+        await asyncio.sleep(interval_seconds)
+
+
+async def release_expired_holds() -> int:
+    released = 0
+    async with SessionLocal() as db:
+        product_service = ProductService(ProductRepository(db))
+        while True:
+            batch = await product_service.release_expired_holds(settings.hold_sweep_batch_size)
+            released += batch
+            if batch < settings.hold_sweep_batch_size:
+                break
+    if released:
+        logger.info("Released %d expired stock holds", released)
+    return released
+
+
+async def snapshot_stock_ledger() -> int:
+    async with SessionLocal() as db:
+        snapshots = await ProductService(ProductRepository(db)).snapshot_stock_ledger()
+    if snapshots:
+        logger.info("Took %d stock ledger snapshots", snapshots)
+    return snapshots
+
+
+class SweepStats:
+    def __init__(self):
+        self.runs = 0
+        self.total_deleted = 0
+        self.last_run_at = None
+        self.last_deleted = 0
+        self.last_batches = 0
+        self.last_seconds = 0.0
+
+    def record(self, deleted: int, batches: int, seconds: float) -> None:
+        self.runs += 1
+        self.total_deleted += deleted
+        self.last_run_at = datetime.utcnow()
+        self.last_deleted = deleted
+        self.last_batches = batches
+        self.last_seconds = seconds
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "total_deleted": self.total_deleted,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_deleted": self.last_deleted,
+            "last_batches": self.last_batches,
+            "last_seconds": self.last_seconds,
+        }
+
+
+cart_sweep_stats = SweepStats()
+
+
+async def sweep_abandoned_carts() -> int:
+    # small committed batches with a pause in between keep lock times and WAL
+    # bursts short; holds on these lines expired long ago and are released by
+    # release_expired_holds
+    started = time.monotonic()
+    cutoff = datetime.utcnow() - timedelta(days=settings.cart_abandon_after_days)
+    deleted = batches = 0
+    after = None
+    async with SessionLocal() as db:
+        cart_service = CartService(CartRepository(db), ProductRepository(db))
+        while True:
+            batch, after = await cart_service.delete_abandoned_carts(cutoff, settings.cart_sweep_batch_size, after)
+            deleted += batch
+            batches += 1
+            if batch < settings.cart_sweep_batch_size:
+                break
+            await asyncio.sleep(settings.cart_sweep_pause_seconds)
+    cart_sweep_stats.record(deleted, batches, time.monotonic() - started)
+    logger.info(
+        "Swept %d abandoned cart lines older than %s in %d batches (%.2fs)",
+        deleted, cutoff.isoformat(), batches, cart_sweep_stats.last_seconds,
+    )
+    return deleted
+
+
+async def reprice_carts() -> int:
+    # drains the price-change queue one batch of products per transaction
+    products = repriced = 0
+    async with SessionLocal() as db:
+        cart_service = CartService(CartRepository(db), ProductRepository(db))
+        while True:
+            claimed, lines = await cart_service.reprice_carts(settings.cart_reprice_batch_size)
+            products += claimed
+            repriced += lines
+            if claimed < settings.cart_reprice_batch_size:
+                break
+    if products:
+        logger.info("Repriced %d cart lines for %d products", repriced, products)
+    return repriced
+
+
+async def refresh_token_revocations() -> int:
+    # first call loads every live revocation; later calls only fetch new rows,
+    # overlapping one interval so rows committed late are not missed
+    now = datetime.utcnow()
+    since = None
+    if token_revocations.refreshed_at is not None:
+        since = token_revocations.refreshed_at - timedelta(seconds=settings.token_revocation_refresh_seconds)
+    async with SessionLocal() as db:
+        token_repo = TokenRepository(db)
+        tokens = await token_repo.get_revoked_tokens(now, since)
+        await token_repo.delete_expired_tokens(now)
+    token_revocations.load(tokens, now)
+    token_revocations.prune(now)
+    return len(tokens)
+
+
+def start_background_tasks() -> list[asyncio.Task]:
+    if not settings.background_tasks_enabled:
+        return []
+    return [
+        asyncio.create_task(
+            run_periodically("release_expired_holds", settings.hold_sweep_interval_seconds, release_expired_holds)
+        ),
+        asyncio.create_task(
+            run_periodically("snapshot_stock_ledger", settings.stock_snapshot_interval_seconds, snapshot_stock_ledger)
+        ),
+        asyncio.create_task(
+            run_periodically("sweep_abandoned_carts", settings.cart_sweep_interval_seconds, sweep_abandoned_carts)
+        ),
+        asyncio.create_task(
+            run_periodically("reprice_carts", settings.cart_reprice_interval_seconds, reprice_carts)
+        ),
+        asyncio.create_task(
+            run_periodically(
+                "refresh_token_revocations", settings.token_revocation_refresh_seconds, refresh_token_revocations
+            )
+        ),
+    ]
+
+
+async def stop_background_tasks(tasks: list[asyncio.Task]) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
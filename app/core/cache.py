@@ -0,0 +1,145 @@
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+from app.core.config import settings
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+
+class RedisCacheBackend(CacheBackend):
+    # shared across workers; needs the optional `redis` package
+    def __init__(self, url: str, prefix: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._redis.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl_seconds: float) -> None:
+        await self._redis.set(self.prefix + key, pickle.dumps(value), px=max(int(ttl_seconds * 1000), 1))
+
+    async def delete(self, *keys: str) -> None:
+        await self._redis.delete(*(self.prefix + key for key in keys))
+
+    async def clear(self) -> None:
+        keys = [key async for key in self._redis.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+
+def _backend(prefix: str, max_entries: int) -> CacheBackend:
+    if settings.cache_redis_url:
+        return RedisCacheBackend(settings.cache_redis_url, prefix)
+    return MemoryCacheBackend(max_entries)
+
+
+class Cache:
+    def __init__(self, backend: CacheBackend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        await self.backend.set(key, value, self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+product_cache = Cache(
+    _backend("bakul:product:", settings.product_cache_max_entries)
+    if settings.product_cache_enabled
+    else MemoryCacheBackend(0),
+    settings.product_cache_ttl_seconds,
+)
+
+count_cache = Cache(
+    _backend("bakul:count:", settings.pagination_count_cache_max_entries),
+    settings.pagination_count_ttl_seconds,
+)
+
+principal_cache = Cache(
+    _backend("bakul:principal:", settings.principal_cache_max_entries),
+    settings.principal_cache_ttl_seconds,
+)
+
+token_version_cache = Cache(
+    _backend("bakul:token-version:", settings.token_version_cache_max_entries),
+    settings.token_version_cache_ttl_seconds,
+)
@@ -1,11 +1,12 @@
 from fastapi import Depends, HTTPException, status
-import jwt
 from jwt.exceptions import InvalidTokenError
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.core.config import settings
-from app.domain.auth.security import ALGORITHM
-from app.domain.auth.schemas import TokenData
+from app.domain.auth.security import decode_token
+from app.domain.auth.repositories import TokenRepository
+from app.domain.auth.revocation import token_revocations
+from app.domain.auth.schemas import Principal
 from app.domain.users.repositories import UserRepository
 from app.domain.users.service import UserService
 from app.domain.users.models import MstUser
@@ -39,6 +40,9 @@ def get_cart_repo(db: AsyncSession = Depends(get_db)) -> CartRepository:
 def get_transaction_repo(db: AsyncSession = Depends(get_db)) -> TransactionRepository:
     return TransactionRepository(db)
 
+def get_token_repo(db: AsyncSession = Depends(get_db)) -> TokenRepository:
+    return TokenRepository(db)
+
 # Services
 def get_user_service(user_repo: UserRepository = Depends(get_user_repo)) -> UserService:
     return UserService(user_repo)
@@ -49,8 +53,11 @@ def get_product_service(product_repo: ProductRepository = Depends(get_product_re
 def get_expedition_service(expedition_repo: ExpeditionRepository = Depends(get_expedition_repo)) -> ExpeditionService:
     return ExpeditionService(expedition_repo)
 
-def get_cart_service(cart_repo: CartRepository = Depends(get_cart_repo)) -> CartService:
-    return CartService(cart_repo)
+def get_cart_service(
+    cart_repo: CartRepository = Depends(get_cart_repo),
+    product_repo: ProductRepository = Depends(get_product_repo),
+) -> CartService:
+    return CartService(cart_repo, product_repo)
 
 def get_transaction_service(
     transaction_repo: TransactionRepository = Depends(get_transaction_repo),
@@ -60,32 +67,43 @@ def get_transaction_service(
 ) -> TransactionService:
     return TransactionService(transaction_repo, expedition_repo, product_repo, cart_repo)
 
-def get_auth_service(user_repo: UserRepository = Depends(get_user_repo)) -> AuthService:
-    return AuthService(user_repo)
+def get_auth_service(
+    user_repo: UserRepository = Depends(get_user_repo),
+    token_repo: TokenRepository = Depends(get_token_repo),
+) -> AuthService:
+    return AuthService(user_repo, token_repo)
 
 # Auth Dependency
-async def get_current_user(token: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)) -> MstUser:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_current_principal(token: HTTPAuthorizationCredentials = Depends(security), db: AsyncSession = Depends(get_db)) -> Principal:
     try:
-        payload = jwt.decode(token.credentials, settings.secret_key, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except InvalidTokenError:
-        raise credentials_exception
-    
-    user_repo = UserRepository(db)
-    user = await user_repo.get_user_by_id(token_data.user_id)
+        payload = decode_token(token.credentials, "access")
+        principal = Principal(id_user=payload.get("sub"), role=payload.get("role"), token_version=payload.get("ver"))
+    except (InvalidTokenError, ValidationError):
+        raise _credentials_exception()
+    if token_revocations.is_revoked(payload.get("jti")):
+        raise _credentials_exception()
+
+    # the role comes from the token; only the revocation counter is checked,
+    # and that is served from a small cache
+    token_version = await UserRepository(db).get_token_version(principal.id_user)
+    if token_version != principal.token_version:
+        raise _credentials_exception()
+    return principal
+
+async def get_current_user(principal: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)) -> MstUser:
+    user = await UserRepository(db).get_principal(principal.id_user)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
     return user
 
-def get_current_admin(current_user: MstUser = Depends(get_current_user)) -> MstUser:
+def get_current_admin(current_user: Principal = Depends(get_current_principal)) -> Principal:
     if current_user.role != "admin":
          raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,169 @@
+import ipaddress
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Optional, Sequence
+from app.core.config import settings
+
+
+class TokenBucketBackend(ABC):
+    # take() returns 0 when a token was taken, else the seconds until one refills
+    @abstractmethod
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+
+class MemoryTokenBucketBackend(TokenBucketBackend):
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / refill_per_second
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        # evicting the least recently used bucket only ever resets it to full
+        while len(self._buckets) > self.max_entries:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    async def clear(self) -> None:
+        self._buckets.clear()
+
+
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated_at) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return tostring(retry_after)
+"""
+
+
+class RedisTokenBucketBackend(TokenBucketBackend):
+    # shared across workers; needs the optional `redis` package
+    def __init__(self, url: str, prefix: str):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key: str, capacity: int, refill_per_second: float) -> float:
+        return float(await self._take(keys=[self.prefix + key], args=[capacity, refill_per_second]))
+
+    async def clear(self) -> None:
+        keys = [key async for key in self._redis.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self._redis.delete(*keys)
+
+
+def _backend(prefix: str) -> TokenBucketBackend:
+    if settings.rate_limit_redis_url:
+        return RedisTokenBucketBackend(settings.rate_limit_redis_url, prefix)
+    return MemoryTokenBucketBackend(settings.auth_rate_limit_max_entries)
+
+
+class RateLimiter:
+    def __init__(self, backend: TokenBucketBackend, capacity: int, per_seconds: float):
+        self.backend = backend
+        self.capacity = capacity
+        self.per_seconds = per_seconds
+        self.allowed = 0
+        self.limited = 0
+
+    async def hit(self, key: str) -> float:
+        retry_after = await self.backend.take(key, self.capacity, self.capacity / self.per_seconds)
+        if retry_after:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+        self.allowed = 0
+        self.limited = 0
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "per_seconds": self.per_seconds,
+            "allowed": self.allowed,
+            "limited": self.limited,
+        }
+
+
+auth_ip_limiter = RateLimiter(
+    _backend("bakul:rate:ip:"),
+    settings.auth_rate_limit_ip_capacity,
+    settings.auth_rate_limit_ip_per_seconds,
+)
+
+auth_email_limiter = RateLimiter(
+    _backend("bakul:rate:email:"),
+    settings.auth_rate_limit_email_capacity,
+    settings.auth_rate_limit_email_per_seconds,
+)
+
+
+def _parse_networks(value: str) -> list:
+    return [ipaddress.ip_network(part.strip(), strict=False) for part in value.split(",") if part.strip()]
+
+
+trusted_proxies = _parse_networks(settings.trusted_proxy_ips)
+
+
+def _is_trusted(address: str, networks: Sequence) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in networks)
+
+
+def resolve_client_ip(peer: Optional[str], forwarded_for: Optional[str], networks: Optional[Sequence] = None) -> str:
+    # X-Forwarded-For is only read when the direct peer is a trusted proxy; the
+    # client is then the right-most hop that is not itself a trusted proxy, so
+    # entries a client prepends to the header are never used
+    networks = trusted_proxies if networks is None else networks
+    if not peer:
+        return "unknown"
+    if not forwarded_for or not _is_trusted(peer, networks):
+        return peer
+    for hop in reversed([hop.strip() for hop in forwarded_for.split(",") if hop.strip()]):
+        if not _is_trusted(hop, networks):
+            return hop
+    return peer
+
+
+async def admit_auth_attempt(route: str, client_ip: str, email: str) -> float:
+    # the per-IP bucket is checked first so a flood from one address does not
+    # also drain the buckets of the accounts it targets
+    retry_after = await auth_ip_limiter.hit(f"{route}:{client_ip}")
+    if retry_after:
+        return retry_after
+    return await auth_email_limiter.hit(f"{route}:{email.lower()}")
@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from app.core.base_class import Base
+
+class TrnRevokedToken(Base):
+    __tablename__ = "trn_revoked_token"
+
+    jti = Column(String, primary_key=True)
+    id_user = Column(UUID(as_uuid=True), ForeignKey("mst_users.id_user", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
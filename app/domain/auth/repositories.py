@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Optional, Sequence
+from uuid import UUID
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.auth.models import TrnRevokedToken
+from app.utils.sql import dialect_insert
+
+class TokenRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def revoke_tokens(self, tokens: Sequence[tuple[str, UUID, datetime]]) -> set[str]:
+        # returns the jtis this call revoked; ones already revoked elsewhere are skipped
+        if not tokens:
+            return set()
+        result = await self.db.execute(
+            dialect_insert(self.db, TrnRevokedToken)
+            .values([
+                {"jti": jti, "id_user": user_id, "expires_at": expires_at}
+                for jti, user_id, expires_at in tokens
+            ])
+            .on_conflict_do_nothing(index_elements=[TrnRevokedToken.jti])
+            .returning(TrnRevokedToken.jti)
+        )
+        revoked = set(result.scalars().all())
+        await self.db.commit()
+        return revoked
+
+    async def get_revoked_tokens(self, now: datetime, since: Optional[datetime] = None) -> list[tuple[str, datetime]]:
+        query = select(TrnRevokedToken.jti, TrnRevokedToken.expires_at).where(TrnRevokedToken.expires_at > now)
+        if since is not None:
+            query = query.where(TrnRevokedToken.created_at >= since)
+        result = await self.db.execute(query)
+        return [(jti, expires_at) for jti, expires_at in result.all()]
+
+    async def delete_expired_tokens(self, now: datetime) -> int:
+        result = await self.db.execute(
+            delete(TrnRevokedToken).where(TrnRevokedToken.expires_at <= now).returning(TrnRevokedToken.jti)
+        )
+        deleted = len(result.all())
+        await self.db.commit()
+        return deleted
@@ -0,0 +1,72 @@
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+from app.core.config import settings
+
+
+class BloomFilter:
+    def __init__(self, size_bits: int, hashes: int):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        # double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size_bits for index in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TokenRevocationFilter:
+    # the Bloom filter answers "not revoked" for almost every token without
+    # touching the exact set, which only resolves the rare positive
+    def __init__(self, size_bits: int, hashes: int):
+        self.size_bits = size_bits
+        self.hashes = hashes
+        self._bloom = BloomFilter(size_bits, hashes)
+        self._revoked: dict[str, datetime] = {}
+        self.refreshed_at: Optional[datetime] = None
+
+    def add(self, jti: str, expires_at: datetime) -> None:
+        self._revoked[jti] = expires_at
+        self._bloom.add(jti)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None or jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    def load(self, tokens: Iterable[tuple[str, datetime]], refreshed_at: datetime) -> None:
+        for jti, expires_at in tokens:
+            self.add(jti, expires_at)
+        self.refreshed_at = refreshed_at
+
+    def prune(self, now: datetime) -> int:
+        # expired tokens fail `exp` validation anyway; rebuild the Bloom filter
+        # so their bits stop producing false positives
+        expired = [jti for jti, expires_at in self._revoked.items() if expires_at <= now]
+        if not expired:
+            return 0
+        for jti in expired:
+            del self._revoked[jti]
+        self._bloom = BloomFilter(self.size_bits, self.hashes)
+        for jti in self._revoked:
+            self._bloom.add(jti)
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+
+token_revocations = TokenRevocationFilter(
+    settings.token_revocation_bloom_bits,
+    settings.token_revocation_bloom_hashes,
+)
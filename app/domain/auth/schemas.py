@@ -1,5 +1,7 @@
+from uuid import UUID
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from app.domain.users.models import UserRole
 
 class Token(BaseModel):
     access_token: str
@@ -12,6 +14,17 @@ class TokenData(BaseModel):
     role: Optional[str] = None
     profile_picture: Optional[str] = None
 
+class Principal(BaseModel):
+    id_user: UUID
+    role: UserRole
+    token_version: int = 0
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
@@ -1,5 +1,11 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Callable, Union, Optional
 import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
@@ -8,18 +14,177 @@ pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 ALGORITHM = "HS256"
 
-def create_access_token(subject: Union[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: Union[str, Any],
+    expires_delta: Optional[timedelta] = None,
+    *,
+    role: Optional[str] = None,
+    token_version: int = 0,
+) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {
+        "exp": expire,
+        "sub": str(subject),
+        "jti": uuid.uuid4().hex,
+        "type": "access",
+        "role": role,
+        "ver": token_version,
+    }
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(subject: Union[str, Any], token_version: int = 0) -> str:
+    expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
+    to_encode = {"exp": expire, "sub": str(subject), "jti": uuid.uuid4().hex, "type": "refresh", "ver": token_version}
+    return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+
+class DecodedTokenCache:
+    # verified claims keyed by the raw token; an entry is only served until the
+    # token's own `exp`, so expiry is enforced exactly as jwt.decode would
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        payload = self._entries.get(token)
+        if payload is not None and payload["exp"] > time.time():
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return dict(payload)
+        if payload is not None:
+            del self._entries[token]
+        self.misses += 1
+        return None
+
+    def set(self, token: str, payload: dict) -> None:
+        if self.max_entries <= 0 or "exp" not in payload:
+            return
+        self._entries[token] = dict(payload)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+decoded_token_cache = DecodedTokenCache(settings.jwt_cache_max_entries)
+
+def decode_token(token: str, token_type: str) -> dict:
+    payload = decoded_token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        decoded_token_cache.set(token, payload)
+    if payload.get("type") != token_type:
+        raise jwt.InvalidTokenError(f"Expected a {token_type} token")
+    return payload
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+class PasswordHasherBusyError(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    # pbkdf2 releases the GIL inside hashlib, so a thread pool spreads hashing
+    # across cores and keeps it off the event loop
+    def __init__(self, max_workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusyError("Too many password operations in progress")
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.pending -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.max_seconds = max(self.max_seconds, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": self.total_seconds / self.completed * 1000 if self.completed else 0.0,
+            "max_ms": self.max_seconds * 1000,
+        }
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers or os.cpu_count() or 1,
+    max_pending=settings.password_hash_max_pending,
+)
+
+
+def _hash_batch(passwords: list[str]) -> list[str]:
+    return [get_password_hash(password) for password in passwords]
+
+
+_import_pool: Optional[ProcessPoolExecutor] = None
+
+async def hash_passwords(passwords: list[str]) -> list[str]:
+    # bulk imports hash tens of thousands of passwords; a process pool scales
+    # past the thread pool that request-path hashing shares with logins
+    global _import_pool
+    if not passwords:
+        return []
+    workers = settings.user_import_workers or os.cpu_count() or 1
+    if _import_pool is None:
+        _import_pool = ProcessPoolExecutor(max_workers=workers)
+    size = -(-len(passwords) // workers)
+    loop = asyncio.get_running_loop()
+    batches = await asyncio.gather(
+        *(
+            loop.run_in_executor(_import_pool, _hash_batch, passwords[start:start + size])
+            for start in range(0, len(passwords), size)
+        )
+    )
+    return [hashed for batch in batches for hashed in batch]
+
+
+def shutdown_import_pool() -> None:
+    global _import_pool
+    if _import_pool is not None:
+        _import_pool.shutdown(cancel_futures=True)
+        _import_pool = None
@@ -1,22 +1,82 @@
 from app.domain.users.repositories import UserRepository
-from app.domain.auth.security import verify_password, create_access_token
+from app.domain.auth.repositories import TokenRepository
+from app.domain.auth.revocation import token_revocations
+from app.domain.auth.security import create_access_token, create_refresh_token, decode_token, password_hasher
 from app.domain.users.schemas import UserLogin
+from app.domain.users.models import MstUser
 from typing import Optional
-from datetime import timedelta
+from datetime import datetime, timedelta
+from uuid import UUID
+from jwt.exceptions import InvalidTokenError
 from app.core.config import settings
 
 class AuthService:
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: UserRepository, token_repo: TokenRepository):
         self.user_repo = user_repo
+        self.token_repo = token_repo
 
     async def authenticate_user(self, login_data: UserLogin) -> Optional[dict]:
         user = await self.user_repo.get_user_by_email(login_data.email)
         if not user:
             return None
-        if not verify_password(login_data.password, user.password):
+        if not await password_hasher.verify(login_data.password, user.password):
             return None
         return user
 
-    def create_token(self, user_id: str) -> str:
+    def create_token(self, user_id: str, role: Optional[str] = None, token_version: int = 0) -> str:
         access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-        return create_access_token(subject=user_id, expires_delta=access_token_expires)
+        return create_access_token(
+            subject=user_id, expires_delta=access_token_expires, role=role, token_version=token_version
+        )
+
+    def create_tokens(self, user: MstUser) -> dict:
+        token_version = user.token_version or 0
+        return {
+            "access_token": self.create_token(user.id_user, user.role, token_version),
+            "refresh_token": create_refresh_token(user.id_user, token_version),
+            "token_type": "bearer",
+        }
+
+    async def refresh_tokens(self, refresh_token: str) -> Optional[dict]:
+        try:
+            payload = decode_token(refresh_token, "refresh")
+            user_id = UUID(payload.get("sub"))
+        except (InvalidTokenError, TypeError, ValueError):
+            return None
+        if token_revocations.is_revoked(payload.get("jti")):
+            return None
+        user = await self.user_repo.get_principal(user_id)
+        if user is None or (user.token_version or 0) != payload.get("ver"):
+            return None
+        # refresh tokens are single use: only the request whose revocation row
+        # was inserted gets new tokens
+        if payload.get("jti") not in await self._revoke([payload]):
+            return None
+        return self.create_tokens(user)
+
+    async def logout(self, access_token: str, refresh_token: Optional[str] = None) -> bool:
+        try:
+            payloads = [decode_token(access_token, "access")]
+        except InvalidTokenError:
+            return False
+        if refresh_token:
+            try:
+                refresh = decode_token(refresh_token, "refresh")
+            except InvalidTokenError:
+                refresh = None
+            # only the caller's own refresh token may be revoked
+            if refresh is not None and refresh.get("sub") == payloads[0].get("sub"):
+                payloads.append(refresh)
+        await self._revoke(payloads)
+        return True
+
+    async def _revoke(self, payloads: list[dict]) -> set[str]:
+        tokens = [
+            (payload["jti"], UUID(payload["sub"]), datetime.utcfromtimestamp(payload["exp"]))
+            for payload in payloads
+            if payload.get("jti") and not token_revocations.is_revoked(payload["jti"])
+        ]
+        revoked = await self.token_repo.revoke_tokens(tokens)
+        for jti, _, expires_at in tokens:
+            token_revocations.add(jti, expires_at)
+        return revoked
@@ -0,0 +1,41 @@
+import base64
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Mapping, Optional
+from uuid import UUID
+import jwt
+from app.core.config import settings
+from app.domain.auth.security import ALGORITHM
+
+
+class InvalidGuestCartError(ValueError):
+    pass
+
+
+def encode_guest_cart(lines: Mapping[UUID, int]) -> str:
+    # guest carts never touch the database: the lines travel in a signed token,
+    # zlib-compressed as [[product hex, quantity], ...]
+    if len(lines) > settings.guest_cart_max_lines:
+        raise InvalidGuestCartError(f"A guest cart holds at most {settings.guest_cart_max_lines} lines")
+    packed = json.dumps([[product_id.hex, quantity] for product_id, quantity in lines.items()], separators=(",", ":"))
+    payload = {
+        "exp": datetime.utcnow() + timedelta(days=settings.guest_cart_expire_days),
+        "type": "guest_cart",
+        "cart": base64.urlsafe_b64encode(zlib.compress(packed.encode(), 9)).decode().rstrip("="),
+    }
+    return jwt.encode(payload, settings.secret_key, algorithm=ALGORITHM)
+
+
+def decode_guest_cart(token: Optional[str]) -> dict[UUID, int]:
+    if not token:
+        return {}
+    try:
+        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+        if payload.get("type") != "guest_cart":
+            raise InvalidGuestCartError("Invalid guest cart")
+        packed = payload["cart"]
+        lines = json.loads(zlib.decompress(base64.urlsafe_b64decode(packed + "=" * (-len(packed) % 4))))
+        return {UUID(product_id): int(quantity) for product_id, quantity in lines}
+    except (jwt.InvalidTokenError, KeyError, TypeError, ValueError, zlib.error):
+        raise InvalidGuestCartError("Invalid guest cart")
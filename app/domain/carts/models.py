@@ -1,16 +1,22 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.base_class import Base
 
 class MstCart(Base):
     __tablename__ = "mst_carts"
+    __table_args__ = (
+        Index("ix_mst_carts_id_user_created_at", "id_user", "created_at"),
+        Index("ix_mst_carts_updated_at_id_cart", "updated_at", "id_cart"),
+        Index("ix_mst_carts_id_product", "id_product"),
+        UniqueConstraint("id_user", "id_product", name="uq_mst_carts_id_user_id_product"),
+    )
 
     id_cart = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    id_product = Column(UUID(as_uuid=True), ForeignKey("mst_product.id_product"))
-    id_user = Column(UUID(as_uuid=True), ForeignKey("mst_users.id_user"))
+    id_product = Column(UUID(as_uuid=True), ForeignKey("mst_product.id_product", ondelete="CASCADE"))
+    id_user = Column(UUID(as_uuid=True), ForeignKey("mst_users.id_user", ondelete="CASCADE"))
     quantity = Column(Integer, nullable=False)
     price_at_time = Column(Integer, nullable=False)
 
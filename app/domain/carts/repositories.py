@@ -1,8 +1,32 @@
+from datetime import datetime
 from app.domain.carts.models import MstCart
+from app.domain.products.models import MstProduct, TrnProductStock, TrnStockReservation
+from app.utils.pagination import count_rows, keyset_after
+from app.utils.sql import dialect_insert
+from sqlalchemy import delete, func, literal, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import Optional
-from uuid import UUID
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Mapping, Optional, Sequence
+from uuid import UUID, uuid4
+
+def _available_stock():
+    return (
+        select(func.coalesce(func.sum(TrnProductStock.stock - TrnProductStock.reserved), 0))
+        .where(TrnProductStock.id_product == MstCart.id_product)
+        .correlate(MstCart)
+        .scalar_subquery()
+    )
+
+
+def _held_quantity():
+    return (
+        select(func.coalesce(func.sum(TrnStockReservation.quantity), 0))
+        .where(TrnStockReservation.id_user == MstCart.id_user, TrnStockReservation.id_product == MstCart.id_product)
+        .correlate(MstCart)
+        .scalar_subquery()
+    )
+
 
 class CartRepository:
     def __init__(self, db: AsyncSession):
@@ -20,6 +44,92 @@ class CartRepository:
         await self.db.refresh(new_cart)
         return new_cart
 
+    async def add_cart_item(self, id_user: UUID, id_product: UUID, quantity: int) -> Optional[MstCart]:
+        # one statement: the product row supplies the price, and an existing
+        # line for the same product absorbs the new quantity; None if the
+        # product does not exist
+        now = datetime.utcnow()
+        insert = dialect_insert(self.db, MstCart)
+        statement = (
+            insert.from_select(
+                ["id_cart", "id_user", "id_product", "quantity", "price_at_time", "created_at", "updated_at"],
+                select(
+                    literal(uuid4(), MstCart.id_cart.type),
+                    literal(id_user, MstCart.id_user.type),
+                    MstProduct.id_product,
+                    literal(quantity),
+                    MstProduct.price * quantity,
+                    literal(now, MstCart.created_at.type),
+                    literal(now, MstCart.updated_at.type),
+                ).where(MstProduct.id_product == id_product),
+            )
+            .on_conflict_do_update(
+                index_elements=[MstCart.id_user, MstCart.id_product],
+                set_={
+                    "quantity": MstCart.quantity + insert.excluded.quantity,
+                    "price_at_time": MstCart.price_at_time + insert.excluded.price_at_time,
+                    "updated_at": insert.excluded.updated_at,
+                },
+            )
+            .returning(MstCart)
+        )
+        result = await self.db.execute(select(MstCart).from_statement(statement).execution_options(populate_existing=True))
+        cart = result.scalars().first()
+        await self.db.commit()
+        return cart
+
+    async def get_cart_quantities(self, id_user: UUID, product_ids: Sequence[UUID]) -> dict[UUID, int]:
+        result = await self.db.execute(
+            select(MstCart.id_product, MstCart.quantity)
+            .where(MstCart.id_user == id_user, MstCart.id_product.in_(list(product_ids)))
+        )
+        return dict(result.all())
+
+    async def _upsert_lines(self, id_user: UUID, lines: Mapping[UUID, tuple[int, int]], *, additive: bool) -> None:
+        # `lines` maps product id to (quantity, price_at_time); existing lines
+        # either take these values or, when additive, add them to their own
+        now = datetime.utcnow()
+        insert = dialect_insert(self.db, MstCart)
+        quantity, price_at_time = insert.excluded.quantity, insert.excluded.price_at_time
+        if additive:
+            quantity, price_at_time = MstCart.quantity + quantity, MstCart.price_at_time + price_at_time
+        await self.db.execute(
+            insert.values([
+                {
+                    "id_cart": uuid4(),
+                    "id_user": id_user,
+                    "id_product": product_id,
+                    "quantity": line_quantity,
+                    "price_at_time": line_price,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for product_id, (line_quantity, line_price) in lines.items()
+            ])
+            .on_conflict_do_update(
+                index_elements=[MstCart.id_user, MstCart.id_product],
+                set_={"quantity": quantity, "price_at_time": price_at_time, "updated_at": insert.excluded.updated_at},
+            )
+        )
+
+    async def merge_cart_items(self, id_user: UUID, lines: Mapping[UUID, tuple[int, int]]) -> None:
+        if lines:
+            await self._upsert_lines(id_user, lines, additive=True)
+        await self.db.commit()
+
+    async def apply_cart_changes(
+        self, id_user: UUID, lines: Mapping[UUID, tuple[int, int]], removed: Sequence[UUID]
+    ) -> None:
+        # final lines are written by one upsert and `removed` by one DELETE,
+        # in a single commit
+        if lines:
+            await self._upsert_lines(id_user, lines, additive=False)
+        if removed:
+            await self.db.execute(
+                delete(MstCart).where(MstCart.id_user == id_user, MstCart.id_product.in_(list(removed)))
+            )
+        await self.db.commit()
+
     async def update_cart(
         self,
         cart_id: UUID,
@@ -41,32 +151,122 @@ class CartRepository:
         await self.db.refresh(cart)
         return cart
     
-    async def get_carts_by_user_id(self, user_id: UUID, limit: int = 10, offset: int = 0) -> list[MstCart]:
-        result = await self.db.execute(select(MstCart).where(MstCart.id_user == user_id).limit(limit).offset(offset))
-        return result.scalars().all()
+    async def get_carts_by_user_id(
+        self,
+        user_id: UUID,
+        limit: Optional[int] = 10,
+        offset: int = 0,
+        cursor: Optional[Sequence] = None,
+        expand_product: bool = False,
+    ) -> list[MstCart]:
+        query = select(MstCart)
+        if expand_product:
+            # product, available stock and this user's held units in the same
+            # round trip; a line falls short when neither covers its quantity
+            available, held = _available_stock(), _held_quantity()
+            query = (
+                select(MstCart, MstProduct, available, (MstCart.quantity > available + held).label("shortfall"))
+                .join(MstProduct, MstProduct.id_product == MstCart.id_product)
+            )
+        query = (
+            query
+            .where(MstCart.id_user == user_id)
+            .order_by(MstCart.created_at, MstCart.id_cart)
+            .limit(limit)
+        )
+        if cursor is not None:
+            query = query.where(keyset_after((MstCart.created_at, MstCart.id_cart), cursor))
+        else:
+            query = query.offset(offset)
+        result = await self.db.execute(query)
+        if not expand_product:
+            return result.scalars().all()
+        carts = []
+        for cart, product, available, shortfall in result.all():
+            set_committed_value(cart, "product", product)
+            product.stock = available  # expose stock for response
+            cart.stock_shortfall = bool(shortfall)
+            carts.append(cart)
+        return carts
+
+    async def get_cart_totals(self, user_id: UUID) -> dict:
+        result = await self.db.execute(
+            select(
+                func.count(MstCart.id_cart),
+                func.coalesce(func.sum(MstCart.quantity), 0),
+                func.coalesce(func.sum(MstCart.price_at_time), 0),
+                func.coalesce(func.sum(MstProduct.price * MstCart.quantity), 0),
+            )
+            .join(MstProduct, MstProduct.id_product == MstCart.id_product)
+            .where(MstCart.id_user == user_id)
+        )
+        lines, quantity, total, current_total = result.one()
+        return {"lines": lines, "quantity": quantity, "total": total, "current_total": current_total}
+
+    async def count_carts_by_user_id(self, user_id: UUID) -> tuple[int, bool]:
+        return await count_rows(self.db, select(MstCart.id_cart).where(MstCart.id_user == user_id), f"carts:{user_id}")
     
-    async def delete_cart_each_item(self, id_user: UUID, id_product: UUID) -> bool:
-        result = await self.db.execute(select(MstCart).where(
-            MstCart.id_product == id_product,
-            MstCart.id_user == id_user,
-        ))
-        cart = result.scalars().first()
-        if not cart:
-            return False
-        await self.db.delete(cart)
+    async def delete_cart_each_item(self, id_user: UUID, id_product: UUID) -> int:
+        result = await self.db.execute(
+            delete(MstCart)
+            .where(MstCart.id_product == id_product, MstCart.id_user == id_user)
+            .returning(MstCart.id_cart)
+        )
+        deleted = len(result.all())
+        await self.db.commit()
+        return deleted
+
+    async def delete_abandoned_carts(
+        self, cutoff: datetime, limit: int, after: Optional[Sequence] = None
+    ) -> tuple[int, Optional[tuple]]:
+        # one bounded batch in (updated_at, id_cart) order; `after` resumes past
+        # the previous batch so dead index entries are not rescanned. The cutoff is
+        # checked again on delete so a line touched since the subselect survives
+        batch = (
+            select(MstCart.id_cart)
+            .where(MstCart.updated_at < cutoff)
+            .order_by(MstCart.updated_at, MstCart.id_cart)
+            .limit(limit)
+        )
+        if after is not None:
+            batch = batch.where(
+                tuple_(MstCart.updated_at, MstCart.id_cart)
+                > tuple_(*after, types=[MstCart.updated_at.type, MstCart.id_cart.type])
+            )
+        result = await self.db.execute(
+            delete(MstCart)
+            .where(MstCart.id_cart.in_(batch), MstCart.updated_at < cutoff)
+            .returning(MstCart.updated_at, MstCart.id_cart)
+        )
+        keys = result.all()
+        await self.db.commit()
+        return len(keys), (tuple(max(keys)) if keys else None)
+
+    async def reprice_carts(self, product_ids: Sequence[UUID]) -> int:
+        # one UPDATE ... FROM for the whole batch; lines already at the current
+        # price are skipped and updated_at is kept so repricing does not count
+        # as cart activity for the abandoned-cart sweep
+        line_price = MstProduct.price * MstCart.quantity
+        result = await self.db.execute(
+            update(MstCart)
+            .where(
+                MstCart.id_product == MstProduct.id_product,
+                MstProduct.id_product.in_(list(product_ids)),
+                MstCart.price_at_time != line_price,
+            )
+            .values(price_at_time=line_price, updated_at=MstCart.updated_at)
+            .returning(MstCart.id_cart)
+        )
+        repriced = len(result.all())
         await self.db.commit()
-        return True
+        return repriced
 
     async def get_cart_by_id(self, cart_id: UUID) -> Optional[MstCart]:
         result = await self.db.execute(select(MstCart).where(MstCart.id_cart == cart_id))
         return result.scalars().first()
     
-    async def empty_cart_by_user_id(self, user_id: UUID) -> bool:
-        result = await self.db.execute(select(MstCart).where(MstCart.id_user == user_id))
-        carts = result.scalars().all()
-        if not carts:
-            return False
-        for cart in carts:
-            await self.db.delete(cart)
+    async def empty_cart_by_user_id(self, user_id: UUID) -> int:
+        result = await self.db.execute(delete(MstCart).where(MstCart.id_user == user_id).returning(MstCart.id_cart))
+        deleted = len(result.all())
         await self.db.commit()
-        return True
\ No newline at end of file
+        return deleted
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Literal, Optional
 from uuid import UUID
 
 class CartBase(BaseModel):
@@ -18,4 +18,23 @@ class CartUpdate(BaseModel):
 
 class CartDelete(BaseModel):
     id_product: UUID
-    id_user: UUID
\ No newline at end of file
+    id_user: UUID
+
+class CartOperation(BaseModel):
+    op: Literal["add", "set", "remove"]
+    product_id: UUID
+    quantity: Optional[int] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def check_quantity(self):
+        if self.op == "add" and not self.quantity:
+            raise ValueError("add needs a positive quantity")
+        if self.op == "set" and self.quantity is None:
+            raise ValueError("set needs a quantity")
+        return self
+
+class CartBatch(BaseModel):
+    operations: list[CartOperation] = Field(min_length=1, max_length=100)
+
+class GuestCartBatch(CartBatch):
+    token: Optional[str] = None
@@ -1,12 +1,29 @@
+from datetime import datetime, timedelta
+from app.core.config import settings
+from app.domain.carts.guest import decode_guest_cart, encode_guest_cart
 from app.domain.carts.models import MstCart
 from app.domain.carts.repositories import CartRepository
-from app.domain.carts.schemas import CartCreate, CartUpdate, CartDelete
-from typing import Optional, List
+from app.domain.carts.schemas import CartCreate, CartOperation, CartUpdate, CartDelete
+from app.domain.products.models import MstProduct
+from app.domain.products.repositories import ProductRepository
+from typing import Dict, Mapping, Optional, List, Sequence, Tuple
 from uuid import UUID
 
+def _fold_operations(current: Mapping[UUID, int], operations: Sequence[CartOperation]) -> Dict[UUID, int]:
+    targets: Dict[UUID, int] = dict(current)
+    for operation in operations:
+        if operation.op == "add":
+            targets[operation.product_id] = targets.get(operation.product_id, 0) + operation.quantity
+        elif operation.op == "set":
+            targets[operation.product_id] = operation.quantity
+        else:
+            targets[operation.product_id] = 0
+    return targets
+
 class CartService:
-    def __init__(self, cart_repo: CartRepository):
+    def __init__(self, cart_repo: CartRepository, product_repo: ProductRepository):
         self.cart_repo = cart_repo
+        self.product_repo = product_repo
 
     async def create_cart(self, cart_in: CartCreate) -> MstCart:
         return await self.cart_repo.create_cart(
@@ -16,6 +33,92 @@ class CartService:
             price_at_time=cart_in.price_at_time,
         )
 
+    async def add_cart_item(self, id_user: UUID, id_product: UUID, quantity: int) -> Optional[MstCart]:
+        return await self.cart_repo.add_cart_item(id_user, id_product, quantity)
+
+    async def apply_cart_operations(self, user_id: UUID, operations: Sequence[CartOperation]) -> List[MstCart]:
+        """Apply add/set/remove operations in order, all in one transaction."""
+        product_ids = list(dict.fromkeys(operation.product_id for operation in operations))
+        products = await self.product_repo.get_products_by_ids(product_ids)
+        for product_id in product_ids:
+            if product_id not in products:
+                raise LookupError(f"Product {product_id} not found")
+
+        current = await self.cart_repo.get_cart_quantities(user_id, product_ids)
+        targets = _fold_operations(current, operations)
+
+        # holds follow the net change per product; releases cannot fail
+        increases = {
+            product_id: target - current.get(product_id, 0)
+            for product_id, target in targets.items()
+            if target > current.get(product_id, 0)
+        }
+        if increases:
+            expires_at = datetime.utcnow() + timedelta(minutes=settings.cart_hold_ttl_minutes)
+            if await self.product_repo.hold_products_stock(user_id, increases, expires_at, commit=False) is None:
+                raise ValueError("Insufficient stock for one or more products")
+        decreases = {
+            product_id: current[product_id] - target
+            for product_id, target in targets.items()
+            if target < current.get(product_id, 0)
+        }
+        if decreases:
+            await self.product_repo.release_products_holds(user_id, decreases, commit=False)
+
+        await self.cart_repo.apply_cart_changes(
+            user_id,
+            {
+                product_id: (target, products[product_id].price * target)
+                for product_id, target in targets.items()
+                if target > 0
+            },
+            [product_id for product_id, target in targets.items() if target == 0 and product_id in current],
+        )
+        await self.product_repo.flush_invalidations()
+        return await self.cart_repo.get_carts_by_user_id(user_id, limit=None)
+
+    async def apply_guest_cart_operations(
+        self, token: Optional[str], operations: Sequence[CartOperation]
+    ) -> Tuple[str, List[Tuple[MstProduct, int]]]:
+        """Return the new guest cart token and its lines; reads only."""
+        targets = _fold_operations(decode_guest_cart(token), operations)
+        lines = {product_id: quantity for product_id, quantity in targets.items() if quantity > 0}
+        products = await self.product_repo.get_products_by_ids(list(lines))
+        for operation in operations:
+            if lines.get(operation.product_id) and operation.product_id not in products:
+                raise LookupError(f"Product {operation.product_id} not found")
+        # lines whose product has since been deleted simply drop out
+        lines = {product_id: quantity for product_id, quantity in lines.items() if product_id in products}
+        return encode_guest_cart(lines), [(products[product_id], quantity) for product_id, quantity in lines.items()]
+
+    async def get_guest_cart(self, token: Optional[str]) -> List[Tuple[MstProduct, int]]:
+        lines = decode_guest_cart(token)
+        products = await self.product_repo.get_products_by_ids(list(lines))
+        return [(products[product_id], quantity) for product_id, quantity in lines.items() if product_id in products]
+
+    async def merge_guest_cart(self, user_id: UUID, token: str) -> Dict[str, List[UUID]]:
+        # one product read, the holds, and one additive upsert in one commit;
+        # lines that cannot be held are left out rather than failing the login
+        guest_lines = decode_guest_cart(token)
+        products = await self.product_repo.get_products_by_ids(list(guest_lines))
+        lines = {product_id: quantity for product_id, quantity in guest_lines.items() if product_id in products}
+        expires_at = datetime.utcnow() + timedelta(minutes=settings.cart_hold_ttl_minutes)
+        held = dict(lines)
+        if lines and await self.product_repo.hold_products_stock(user_id, lines, expires_at, commit=False) is None:
+            held = {
+                product_id: quantity
+                for product_id, quantity in lines.items()
+                if await self.product_repo.hold_product_stock(user_id, product_id, quantity, expires_at, commit=False)
+            }
+        await self.cart_repo.merge_cart_items(
+            user_id, {product_id: (quantity, products[product_id].price * quantity) for product_id, quantity in held.items()}
+        )
+        await self.product_repo.flush_invalidations()
+        return {
+            "merged": list(held),
+            "skipped": [product_id for product_id in guest_lines if product_id not in held],
+        }
+
     async def update_cart(self, cart_id: UUID, cart_in: CartUpdate) -> Optional[MstCart]:
         return await self.cart_repo.update_cart(
             cart_id,
@@ -23,17 +126,43 @@ class CartService:
             price_at_time=cart_in.price_at_time,
         )
     
-    async def get_carts_by_user_id(self, user_id: UUID, limit: int = 10, offset: int = 0) -> List[MstCart]:
-        return await self.cart_repo.get_carts_by_user_id(user_id, limit=limit, offset=offset)
+    async def get_carts_by_user_id(
+        self,
+        user_id: UUID,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[Sequence] = None,
+        expand_product: bool = False,
+    ) -> List[MstCart]:
+        return await self.cart_repo.get_carts_by_user_id(
+            user_id, limit=limit, offset=offset, cursor=cursor, expand_product=expand_product
+        )
+
+    async def get_cart_totals(self, user_id: UUID) -> dict:
+        return await self.cart_repo.get_cart_totals(user_id)
+
+    async def count_carts_by_user_id(self, user_id: UUID) -> tuple[int, bool]:
+        return await self.cart_repo.count_carts_by_user_id(user_id)
     
-    async def delete_cart_each_item(self, cart_in: CartDelete) -> bool:
+    async def delete_cart_each_item(self, cart_in: CartDelete) -> int:
         return await self.cart_repo.delete_cart_each_item(
             id_user=cart_in.id_user,
             id_product=cart_in.id_product,
         )
     
-    async def empty_cart_by_user_id(self, user_id: UUID) -> bool:
+    async def empty_cart_by_user_id(self, user_id: UUID) -> int:
         return await self.cart_repo.empty_cart_by_user_id(user_id)
 
+    async def delete_abandoned_carts(
+        self, cutoff: datetime, limit: int, after: Optional[Sequence] = None
+    ) -> Tuple[int, Optional[tuple]]:
+        return await self.cart_repo.delete_abandoned_carts(cutoff, limit, after)
+
+    async def reprice_carts(self, limit: int) -> Tuple[int, int]:
+        product_ids = await self.product_repo.claim_price_changes(limit)
+        if not product_ids:
+            return 0, 0
+        return len(product_ids), await self.cart_repo.reprice_carts(product_ids)
+
     async def get_cart_by_id(self, cart_id: UUID) -> Optional[MstCart]:
         return await self.cart_repo.get_cart_by_id(cart_id)
\ No newline at end of file
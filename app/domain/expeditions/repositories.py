@@ -1,9 +1,10 @@
 import uuid
-from sqlalchemy import update
+from sqlalchemy import delete, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.domain.expeditions.models import MstExpeditionService
-from typing import Optional
+from typing import Optional, Sequence
+from app.utils.pagination import count_rows, keyset_after
 
 class ExpeditionRepository:
     def __init__(self, db: AsyncSession):
@@ -40,15 +41,28 @@ class ExpeditionRepository:
         result = await self.db.execute(select(MstExpeditionService).where(MstExpeditionService.id_expedition_service == service_id))
         return result.scalars().first()
     
-    async def get_all_expedition_services(self, limit: int = 10, offset: int = 0) -> list[MstExpeditionService]:
-        result = await self.db.execute(select(MstExpeditionService).limit(limit).offset(offset))
+    async def get_all_expedition_services(
+        self, limit: int = 10, offset: int = 0, cursor: Optional[Sequence] = None
+    ) -> list[MstExpeditionService]:
+        # expedition services have no created_at, so they page by name
+        keys = (MstExpeditionService.name, MstExpeditionService.id_expedition_service)
+        query = select(MstExpeditionService).order_by(*keys).limit(limit)
+        if cursor is not None:
+            query = query.where(keyset_after(keys, cursor))
+        else:
+            query = query.offset(offset)
+        result = await self.db.execute(query)
         return result.scalars().all()
 
-    async def delete_expedition_service(self, service_id: uuid.UUID) -> bool:
-        result = await self.db.execute(select(MstExpeditionService).where(MstExpeditionService.id_expedition_service == service_id))
-        service = result.scalars().first()
-        if not service:
-            return False
-        await self.db.delete(service)
+    async def count_expedition_services(self) -> tuple[int, bool]:
+        return await count_rows(self.db, select(MstExpeditionService.id_expedition_service), "expedition_services")
+
+    async def delete_expedition_service(self, service_id: uuid.UUID) -> int:
+        result = await self.db.execute(
+            delete(MstExpeditionService)
+            .where(MstExpeditionService.id_expedition_service == service_id)
+            .returning(MstExpeditionService.id_expedition_service)
+        )
+        deleted = len(result.all())
         await self.db.commit()
-        return True
\ No newline at end of file
+        return deleted
\ No newline at end of file
@@ -1,6 +1,6 @@
 from app.domain.expeditions.repositories import ExpeditionRepository
 from app.domain.expeditions.models import MstExpeditionService
-from typing import Optional
+from typing import Optional, Sequence
 
 class ExpeditionService:
     def __init__(self, expedition_repo: ExpeditionRepository):
@@ -18,8 +18,13 @@ class ExpeditionService:
     async def get_expedition_service_by_id(self, service_id: str) -> Optional[MstExpeditionService]:
         return await self.expedition_repo.get_expedition_service_by_id(service_id)
     
-    async def get_all_expedition_services(self, limit: int = 10, offset: int = 0) -> list[MstExpeditionService]:
-        return await self.expedition_repo.get_all_expedition_services(limit, offset)
+    async def get_all_expedition_services(
+        self, limit: int = 10, offset: int = 0, cursor: Optional[Sequence] = None
+    ) -> list[MstExpeditionService]:
+        return await self.expedition_repo.get_all_expedition_services(limit, offset, cursor)
 
-    async def delete_expedition_service(self, service_id: str) -> bool:
+    async def count_expedition_services(self) -> tuple[int, bool]:
+        return await self.expedition_repo.count_expedition_services()
+
+    async def delete_expedition_service(self, service_id: str) -> int:
         return await self.expedition_repo.delete_expedition_service(service_id)
\ No newline at end of file
@@ -1,12 +1,22 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey
+import enum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Index, UniqueConstraint, Enum
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.base_class import Base
 
+class StockMovementKind(str, enum.Enum):
+    RESTOCK = "restock"
+    SALE = "sale"
+    CANCELLATION = "cancellation"
+    ADJUSTMENT = "adjustment"
+
 class MstProduct(Base):
     __tablename__ = "mst_product"
+    __table_args__ = (
+        Index("ix_mst_product_created_at_id_product", "created_at", "id_product"),
+    )
 
     id_product = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     name = Column(String, nullable=False)
@@ -19,16 +29,73 @@ class MstProduct(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     updated_by = Column(String, nullable=True)
 
-    stocks = relationship("TrnProductStock", cascade="all, delete-orphan", back_populates="product")
+    stocks = relationship("TrnProductStock", cascade="all, delete-orphan", back_populates="product", passive_deletes=True)
 
 class TrnProductStock(Base):
     __tablename__ = "trn_product_stock"
+    __table_args__ = (
+        UniqueConstraint("id_product", "slot", name="uq_trn_product_stock_id_product_slot"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     id_product = Column(UUID(as_uuid=True), ForeignKey("mst_product.id_product", ondelete="CASCADE"))
+    slot = Column(Integer, nullable=False, default=0)
     stock = Column(Integer, default=0)
+    reserved = Column(Integer, nullable=False, default=0)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     product = relationship("MstProduct", back_populates="stocks")
+
+class TrnStockReservation(Base):
+    __tablename__ = "trn_stock_reservation"
+    __table_args__ = (
+        Index("ix_trn_stock_reservation_id_user_id_product", "id_user", "id_product"),
+    )
+
+    id_reservation = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    id_user = Column(UUID(as_uuid=True), ForeignKey("mst_users.id_user", ondelete="CASCADE"), nullable=False)
+    id_product = Column(UUID(as_uuid=True), ForeignKey("mst_product.id_product", ondelete="CASCADE"), nullable=False)
+    id_stock = Column(UUID(as_uuid=True), ForeignKey("trn_product_stock.id", ondelete="CASCADE"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TrnStockMovement(Base):
+    __tablename__ = "trn_stock_movement"
+    __table_args__ = (
+        Index("ix_trn_stock_movement_id_product_created_at", "id_product", "created_at"),
+    )
+
+    id_movement = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # no foreign key: the ledger is an audit trail and outlives deleted products
+    id_product = Column(UUID(as_uuid=True), nullable=False)
+    kind = Column(Enum(StockMovementKind), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TrnStockSnapshot(Base):
+    __tablename__ = "trn_stock_snapshot"
+    __table_args__ = (
+        Index("ix_trn_stock_snapshot_id_product_taken_at", "id_product", "taken_at"),
+    )
+
+    id_snapshot = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
+    # no foreign key: the ledger is an audit trail and outlives deleted products
+    id_product = Column(UUID(as_uuid=True), nullable=False)
+    stock = Column(Integer, nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TrnPriceChange(Base):
+    # pending cart repricing; one row per product however often its price moves
+    __tablename__ = "trn_price_change"
+
+    id_product = Column(UUID(as_uuid=True), ForeignKey("mst_product.id_product", ondelete="CASCADE"), primary_key=True)
+
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,12 +1,108 @@
 import uuid
-from typing import Optional
-from sqlalchemy import select
+from datetime import datetime
+from typing import Mapping, Optional, Sequence, TypedDict
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.domain.products.models import MstProduct, TrnProductStock
+from app.core.cache import Cache, product_cache
+from app.utils.pagination import count_rows, keyset_after
+from app.utils.sql import dialect_insert
+from app.domain.products.models import (
+    MstProduct,
+    StockMovementKind,
+    TrnPriceChange,
+    TrnProductStock,
+    TrnStockMovement,
+    TrnStockReservation,
+    TrnStockSnapshot,
+)
+
+
+def _total_stock():
+    # available stock: sharded products keep it across several slot rows and
+    # held units are tracked per slot in `reserved`
+    return (
+        select(func.coalesce(func.sum(TrnProductStock.stock - TrnProductStock.reserved), 0))
+        .where(TrnProductStock.id_product == MstProduct.id_product)
+        .correlate(MstProduct)
+        .scalar_subquery()
+        .label("stock")
+    )
+
+
+class StockAdjustmentData(TypedDict):
+    id_product: uuid.UUID
+    stock: Optional[int]
+    delta: Optional[int]
+
+
+def _spread(total: int, reserved: Sequence[int]) -> list[int]:
+    # every slot keeps the units held against it and shares the rest evenly;
+    # callers reject totals below the held units, this only keeps slots from
+    # ever going negative
+    base, remainder = divmod(max(total - sum(reserved), 0), len(reserved))
+    return [held + base + (1 if index < remainder else 0) for index, held in enumerate(reserved)]
+
+
+def _spread_stock(slots: Sequence[TrnProductStock], total: int) -> None:
+    spread = _spread(total, [slot.reserved or 0 for slot in slots])
+    for index, (slot, stock) in enumerate(zip(slots, spread)):
+        slot.slot = index
+        slot.reserved = slot.reserved or 0
+        slot.stock = stock
+
+
+def _take_values(amount, hold: bool) -> dict:
+    if hold:
+        return {"reserved": TrnProductStock.reserved + amount}
+    return {"stock": TrnProductStock.stock - amount}
+
+
+def _give_back_values(amount, hold: bool) -> dict:
+    if hold:
+        return {"reserved": TrnProductStock.reserved - amount}
+    return {"stock": TrnProductStock.stock + amount}
+
+
+_available = TrnProductStock.stock - TrnProductStock.reserved
+
+
+def _in_lock_order(*conditions):
+    # slot ids matching the conditions, row-locked in (id_product, slot) order
+    # so concurrent writes over several products always queue the same way
+    return (
+        select(TrnProductStock.id)
+        .where(*conditions)
+        .order_by(TrnProductStock.id_product, TrnProductStock.slot)
+        .with_for_update()
+    )
+
+
+_PAGE_GENERATION_KEY = "products:page-generation"
+
+
+def _product_key(product_id: uuid.UUID) -> str:
+    return f"product:{product_id}"
+
+
+def _product_data(product: MstProduct, stock: int) -> dict:
+    data = {column.key: getattr(product, column.key) for column in MstProduct.__table__.columns}
+    data["stock"] = stock
+    return data
+
+
+def _cached_product(data: dict) -> MstProduct:
+    # transient copy: callers only read it, and it must not join the session
+    product = MstProduct(**{key: value for key, value in data.items() if key != "stock"})
+    product.stock = data["stock"]
+    return product
+
 
 class ProductRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, cache: Cache = product_cache):
         self.db = db
+        self.cache = cache
+        self._pending_invalidation: set[uuid.UUID] = set()
 
     async def create_product(
         self,
@@ -28,14 +124,17 @@ class ProductRepository:
 
         add_product_stock = TrnProductStock(
             id_product=new_product.id_product,
+            slot=0,
             stock=stock,
         )
         self.db.add(add_product_stock)
+        self._record_movements({new_product.id_product: stock}, StockMovementKind.RESTOCK)
 
         await self.db.commit()
         await self.db.refresh(new_product)
         await self.db.refresh(add_product_stock)
         new_product.stock = add_product_stock.stock  # expose stock for response
+        await self._invalidate_pages()
         return new_product
 
     async def update_product(
@@ -56,32 +155,177 @@ class ProductRepository:
             product.name = name
         if description is not None:
             product.description = description
-        if price is not None:
+        if price is not None and price != product.price:
             product.price = price
+            await self._enqueue_price_change(product_id)
         if product_image_url is not None:
             product.product_image_url = product_image_url
 
         self.db.add(product)
         await self.db.commit()
         await self.db.refresh(product)
+        await self._invalidate([product_id])
         return product
 
+    async def _enqueue_price_change(self, product_id: uuid.UUID) -> None:
+        # committed with the price itself; a product already queued keeps its place
+        await self.db.execute(
+            dialect_insert(self.db, TrnPriceChange)
+            .values(id_product=product_id, created_at=datetime.utcnow())
+            .on_conflict_do_nothing(index_elements=[TrnPriceChange.id_product])
+        )
+
+    async def claim_price_changes(self, limit: int) -> list[uuid.UUID]:
+        # the claimed rows are deleted in the caller's transaction, so a failed
+        # reprice rolls them back into the queue
+        pending = (
+            select(TrnPriceChange.id_product)
+            .order_by(TrnPriceChange.created_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        result = await self.db.execute(
+            delete(TrnPriceChange).where(TrnPriceChange.id_product.in_(pending)).returning(TrnPriceChange.id_product)
+        )
+        return list(result.scalars().all())
+
     async def update_product_stock(self, product_id: uuid.UUID, stock: int) -> Optional[TrnProductStock]:
-        result = await self.db.execute(select(TrnProductStock).where(TrnProductStock.id_product == product_id))
-        product_stock = result.scalars().first()
-        if not product_stock:
+        slots = await self._lock_stock_slots(product_id)
+        if not slots:
             return None
 
-        product_stock.stock = stock
-        self.db.add(product_stock)
+        self._record_movements(
+            {product_id: stock - sum(slot.stock or 0 for slot in slots)},
+            StockMovementKind.ADJUSTMENT,
+        )
+        _spread_stock(slots, stock)
+        self.db.add_all(slots)
         await self.db.commit()
-        await self.db.refresh(product_stock)
-        return product_stock
+        await self._invalidate([product_id])
+        if len(slots) > 1:
+            # sharded: report the product total rather than one slot's share
+            return TrnProductStock(id_product=product_id, stock=stock)
+        await self.db.refresh(slots[0])
+        return slots[0]
+
+    async def bulk_update_product_stock(self, adjustments: Sequence[StockAdjustmentData]) -> list[dict]:
+        # absolute values follow update_product_stock; deltas add to the first slot
+        # or take from the slots with the most available stock
+        result = await self.db.execute(
+            select(TrnProductStock.id_product, TrnProductStock.id, TrnProductStock.stock, TrnProductStock.reserved)
+            .where(TrnProductStock.id_product.in_({adjustment["id_product"] for adjustment in adjustments}))
+            .order_by(TrnProductStock.id_product, TrnProductStock.slot)
+            .with_for_update()
+        )
+        slots: dict[uuid.UUID, list[list]] = {}
+        original: dict[uuid.UUID, int] = {}
+        for product_id, slot_id, stock, reserved in result.all():
+            slots.setdefault(product_id, []).append([slot_id, stock or 0, reserved or 0])
+            original[slot_id] = stock or 0
+
+        results: list[dict] = []
+        for adjustment in adjustments:
+            product_slots = slots.get(adjustment["id_product"])
+            if product_slots is None:
+                results.append({"status": "not_found", "stock": None})
+                continue
+            if adjustment["stock"] is not None:
+                if adjustment["stock"] < sum(reserved for _, _, reserved in product_slots):
+                    results.append({"status": "below_reserved", "stock": sum(stock for _, stock, _ in product_slots)})
+                    continue
+                spread = _spread(adjustment["stock"], [reserved for _, _, reserved in product_slots])
+                for slot, stock in zip(product_slots, spread):
+                    slot[1] = stock
+            elif adjustment["delta"] >= 0:
+                product_slots[0][1] += adjustment["delta"]
+            else:
+                needed = -adjustment["delta"]
+                if sum(max(stock - reserved, 0) for _, stock, reserved in product_slots) < needed:
+                    results.append({"status": "insufficient_stock", "stock": sum(stock for _, stock, _ in product_slots)})
+                    continue
+                for slot in sorted(product_slots, key=lambda slot: slot[1] - slot[2], reverse=True):
+                    take = min(max(slot[1] - slot[2], 0), needed)
+                    slot[1] -= take
+                    needed -= take
+                    if needed == 0:
+                        break
+            results.append({"status": "updated", "stock": sum(stock for _, stock, _ in product_slots)})
+
+        changed = {
+            slot_id: stock
+            for product_slots in slots.values()
+            for slot_id, stock, _ in product_slots
+            if stock != original[slot_id]
+        }
+        if changed:
+            await self.db.execute(
+                update(TrnProductStock)
+                .where(TrnProductStock.id.in_(list(changed)))
+                .values(stock=case(changed, value=TrnProductStock.id))
+            )
+        self._record_movements(
+            {
+                product_id: sum(stock for _, stock, _ in product_slots) - sum(original[slot_id] for slot_id, _, _ in product_slots)
+                for product_id, product_slots in slots.items()
+            },
+            StockMovementKind.ADJUSTMENT,
+        )
+        await self.db.commit()
+        await self._invalidate(slots)
+        return results
+
+    async def get_stock_slots(self, product_id: uuid.UUID) -> list[TrnProductStock]:
+        result = await self.db.execute(
+            select(TrnProductStock)
+            .where(TrnProductStock.id_product == product_id)
+            .order_by(TrnProductStock.slot)
+            .execution_options(populate_existing=True)
+        )
+        return list(result.scalars().all())
+
+    async def set_stock_slots(self, product_id: uuid.UUID, slots: int) -> Optional[list[TrnProductStock]]:
+        current = await self._lock_stock_slots(product_id)
+        if not current:
+            return None
+
+        total = sum(slot.stock or 0 for slot in current)
+        kept, dropped = current[:slots], current[slots:]
+        moved = sum(slot.reserved or 0 for slot in dropped)
+        if moved:
+            # holds on dropped slots move to the first slot that stays
+            await self.db.execute(
+                update(TrnStockReservation)
+                .where(TrnStockReservation.id_stock.in_([slot.id for slot in dropped]))
+                .values(id_stock=kept[0].id)
+            )
+            kept[0].reserved = (kept[0].reserved or 0) + moved
+        for extra in dropped:
+            await self.db.delete(extra)
+        for _ in range(len(kept), slots):
+            new_slot = TrnProductStock(id_product=product_id, stock=0)
+            self.db.add(new_slot)
+            kept.append(new_slot)
+
+        _spread_stock(kept, total)
+        await self.db.commit()
+        return await self.get_stock_slots(product_id)
+
+    async def rebalance_stock_slots(self, product_id: uuid.UUID) -> Optional[list[TrnProductStock]]:
+        current = await self._lock_stock_slots(product_id)
+        if not current:
+            return None
+
+        _spread_stock(current, sum(slot.stock or 0 for slot in current))
+        await self.db.commit()
+        return await self.get_stock_slots(product_id)
 
     async def get_product_by_id(self, product_id: uuid.UUID) -> Optional[MstProduct]:
+        cached = await self.cache.get(_product_key(product_id))
+        if cached is not None:
+            return _cached_product(cached)
+
         result = await self.db.execute(
-            select(MstProduct, TrnProductStock.stock)
-            .join(TrnProductStock, MstProduct.id_product == TrnProductStock.id_product)
+            select(MstProduct, _total_stock())
             .where(MstProduct.id_product == product_id)
         )
         row = result.first()
@@ -89,27 +333,543 @@ class ProductRepository:
             return None
         product, stock = row
         product.stock = stock
+        await self.cache.set(_product_key(product_id), _product_data(product, stock))
         return product
 
-    async def get_all_products(self, limit: int = 10, offset: int = 0) -> list[MstProduct]:
+    async def get_products_by_ids(self, product_ids: Sequence[uuid.UUID]) -> dict[uuid.UUID, MstProduct]:
+        result = await self.db.execute(
+            select(MstProduct, _total_stock())
+            .where(MstProduct.id_product.in_(product_ids))
+        )
+        products: dict[uuid.UUID, MstProduct] = {}
+        for product, stock in result.all():
+            product.stock = stock
+            products[product.id_product] = product
+        return products
+
+    async def decrement_product_stock(self, product_id: uuid.UUID, quantity: int, *, commit: bool = True) -> Optional[int]:
+        remaining = await self.decrement_products_stock({product_id: quantity}, commit=commit)
+        if remaining is None:
+            return None
+        return remaining[product_id]
+
+    async def decrement_products_stock(
+        self, quantities: Mapping[uuid.UUID, int], *, commit: bool = True
+    ) -> Optional[dict[uuid.UUID, int]]:
+        # values are the stock left in the slot that served each decrement, which
+        # is the product's available stock unless the product is sharded
+        taken = await self._take_stock(quantities, hold=False)
+        if taken is None:
+            return None
+        self._record_movements({product_id: -quantity for product_id, quantity in quantities.items()}, StockMovementKind.SALE)
+        if commit:
+            await self.db.commit()
+            await self._invalidate(quantities)
+        else:
+            self._invalidate_after_commit(quantities)
+        return {product_id: left for product_id, (_, left) in taken.items()}
+
+    async def hold_product_stock(
+        self,
+        user_id: uuid.UUID,
+        product_id: uuid.UUID,
+        quantity: int,
+        expires_at: datetime,
+        *,
+        commit: bool = True,
+    ) -> Optional[list[TrnStockReservation]]:
+        return await self.hold_products_stock(user_id, {product_id: quantity}, expires_at, commit=commit)
+
+    async def hold_products_stock(
+        self,
+        user_id: uuid.UUID,
+        quantities: Mapping[uuid.UUID, int],
+        expires_at: datetime,
+        *,
+        commit: bool = True,
+    ) -> Optional[list[TrnStockReservation]]:
+        # all products are held or none are
+        taken = await self._take_stock(quantities, hold=True)
+        if taken is None:
+            return None
+
+        # earlier holds on the same products live as long as the newest one
+        await self.db.execute(
+            update(TrnStockReservation)
+            .where(TrnStockReservation.id_user == user_id, TrnStockReservation.id_product.in_(list(quantities)))
+            .values(expires_at=expires_at)
+        )
+        reservations = [
+            TrnStockReservation(
+                id_user=user_id,
+                id_product=product_id,
+                id_stock=slot_id,
+                quantity=held,
+                expires_at=expires_at,
+            )
+            for product_id, (slots, _) in taken.items()
+            for slot_id, held in slots
+        ]
+        self.db.add_all(reservations)
+        if commit:
+            await self.db.commit()
+            await self._invalidate(quantities)
+        else:
+            self._invalidate_after_commit(quantities)
+        return reservations
+
+    async def release_holds(
+        self,
+        user_id: uuid.UUID,
+        product_id: Optional[uuid.UUID] = None,
+        quantity: Optional[int] = None,
+        *,
+        commit: bool = True,
+    ) -> int:
+        if quantity is not None:
+            return await self.release_products_holds(user_id, {product_id: quantity}, commit=commit)
+        conditions = [TrnStockReservation.id_user == user_id]
+        if product_id is not None:
+            conditions.append(TrnStockReservation.id_product == product_id)
+
+        result = await self.db.execute(
+            delete(TrnStockReservation)
+            .where(*conditions)
+            .returning(TrnStockReservation.id_product, TrnStockReservation.id_stock, TrnStockReservation.quantity)
+        )
+        products: set[uuid.UUID] = set()
+        freed: dict[uuid.UUID, int] = {}
+        for held_product_id, slot_id, held in result.all():
+            products.add(held_product_id)
+            freed[slot_id] = freed.get(slot_id, 0) + held
+
+        await self._free_reserved(freed)
+        if commit:
+            await self.db.commit()
+            await self._invalidate(products)
+        else:
+            self._invalidate_after_commit(products)
+        return sum(freed.values())
+
+    async def release_products_holds(
+        self, user_id: uuid.UUID, quantities: Mapping[uuid.UUID, int], *, commit: bool = True
+    ) -> int:
+        # shrinks the newest holds first, in the same few statements however
+        # many products are released
+        freed = await self._shrink_holds(user_id, quantities)
+        await self._free_reserved(freed)
+        if commit:
+            await self.db.commit()
+            await self._invalidate(quantities)
+        else:
+            self._invalidate_after_commit(quantities)
+        return sum(freed.values())
+
+    async def convert_holds(self, user_id: uuid.UUID, quantities: Mapping[uuid.UUID, int]) -> dict[uuid.UUID, int]:
+        # no commit: held units become sold units in the caller's transaction
+        result = await self.db.execute(
+            delete(TrnStockReservation)
+            .where(TrnStockReservation.id_user == user_id, TrnStockReservation.id_product.in_(list(quantities)))
+            .returning(TrnStockReservation.id_product, TrnStockReservation.id_stock, TrnStockReservation.quantity)
+        )
+        converted: dict[uuid.UUID, int] = {}
+        sold: dict[uuid.UUID, int] = {}
+        freed: dict[uuid.UUID, int] = {}
+        for product_id, slot_id, held in result.all():
+            used = min(held, quantities[product_id] - converted.get(product_id, 0))
+            converted[product_id] = converted.get(product_id, 0) + used
+            sold[slot_id] = sold.get(slot_id, 0) + used
+            freed[slot_id] = freed.get(slot_id, 0) + held
+
+        if freed:
+            await self.db.execute(
+                update(TrnProductStock)
+                .where(TrnProductStock.id.in_(_in_lock_order(TrnProductStock.id.in_(list(freed)))))
+                .values(
+                    stock=TrnProductStock.stock - case(sold, value=TrnProductStock.id, else_=0),
+                    reserved=TrnProductStock.reserved - case(freed, value=TrnProductStock.id),
+                )
+            )
+        self._record_movements({product_id: -used for product_id, used in converted.items()}, StockMovementKind.SALE)
+        self._invalidate_after_commit(quantities)
+        return converted
+
+    async def checkout_stock(
+        self, user_id: uuid.UUID, quantities: Mapping[uuid.UUID, int], *, use_holds: bool
+    ) -> bool:
+        # no commit on success: the caller commits the sale with its order rows
+        converted = await self.convert_holds(user_id, quantities) if use_holds else {}
+        shortfall = {
+            product_id: quantity - converted.get(product_id, 0)
+            for product_id, quantity in quantities.items()
+            if quantity > converted.get(product_id, 0)
+        }
+        if shortfall and await self.decrement_products_stock(shortfall, commit=False) is None:
+            await self.db.rollback()
+            return False
+        return True
+
+    async def restock_products(
+        self,
+        quantities: Mapping[uuid.UUID, int],
+        kind: StockMovementKind = StockMovementKind.RESTOCK,
+        *,
+        commit: bool = True,
+    ) -> None:
+        await self.db.execute(
+            update(TrnProductStock)
+            .where(TrnProductStock.id.in_(
+                _in_lock_order(TrnProductStock.id_product.in_(list(quantities)), TrnProductStock.slot == 0)
+            ))
+            .values(stock=TrnProductStock.stock + case(dict(quantities), value=TrnProductStock.id_product))
+        )
+        self._record_movements(quantities, kind)
+        if commit:
+            await self.db.commit()
+            await self._invalidate(quantities)
+        else:
+            self._invalidate_after_commit(quantities)
+
+    async def get_stock_movements(self, product_id: uuid.UUID, limit: int = 50) -> list[TrnStockMovement]:
+        result = await self.db.execute(
+            select(TrnStockMovement)
+            .where(TrnStockMovement.id_product == product_id)
+            .order_by(TrnStockMovement.created_at.desc())
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def get_ledger_stock(self, product_id: uuid.UUID) -> int:
+        # latest snapshot plus the short tail of movements recorded after it
+        snapshot = (
+            select(TrnStockSnapshot.stock, TrnStockSnapshot.taken_at)
+            .where(TrnStockSnapshot.id_product == product_id)
+            .order_by(TrnStockSnapshot.taken_at.desc())
+            .limit(1)
+            .subquery()
+        )
+        tail = (
+            select(func.coalesce(func.sum(TrnStockMovement.quantity), 0))
+            .where(
+                TrnStockMovement.id_product == product_id,
+                TrnStockMovement.created_at > func.coalesce(select(snapshot.c.taken_at).scalar_subquery(), datetime.min),
+            )
+            .scalar_subquery()
+        )
+        result = await self.db.execute(
+            select(func.coalesce(select(snapshot.c.stock).scalar_subquery(), 0) + tail)
+        )
+        return result.scalar_one()
+
+    async def get_on_hand_stock(self, product_id: uuid.UUID) -> Optional[int]:
         result = await self.db.execute(
-            select(MstProduct, TrnProductStock.stock)
-            .join(TrnProductStock, MstProduct.id_product == TrnProductStock.id_product)
+            select(func.sum(TrnProductStock.stock)).where(TrnProductStock.id_product == product_id)
+        )
+        return result.scalar_one()
+
+    async def snapshot_stock_ledger(self, horizon: datetime) -> int:
+        # folds every movement up to `horizon` into a new snapshot per product;
+        # the horizon lags behind now so movements of open transactions are not
+        # skipped when they commit
+        latest = (
+            select(TrnStockSnapshot.id_product, func.max(TrnStockSnapshot.taken_at).label("taken_at"))
+            .group_by(TrnStockSnapshot.id_product)
+            .subquery()
+        )
+        previous = (
+            select(TrnStockSnapshot.id_product, TrnStockSnapshot.stock, TrnStockSnapshot.taken_at)
+            .join(
+                latest,
+                (TrnStockSnapshot.id_product == latest.c.id_product) & (TrnStockSnapshot.taken_at == latest.c.taken_at),
+            )
+            .subquery()
+        )
+        result = await self.db.execute(
+            select(
+                TrnStockMovement.id_product,
+                func.coalesce(previous.c.stock, 0) + func.sum(TrnStockMovement.quantity),
+            )
+            .outerjoin(previous, previous.c.id_product == TrnStockMovement.id_product)
+            .where(
+                TrnStockMovement.created_at > func.coalesce(previous.c.taken_at, datetime.min),
+                TrnStockMovement.created_at <= horizon,
+            )
+            .group_by(TrnStockMovement.id_product, previous.c.stock)
+        )
+        snapshots = [
+            TrnStockSnapshot(id_product=product_id, stock=stock, taken_at=horizon)
+            for product_id, stock in result.all()
+        ]
+        self.db.add_all(snapshots)
+        await self.db.commit()
+        return len(snapshots)
+
+    def _record_movements(self, quantities: Mapping[uuid.UUID, int], kind: StockMovementKind) -> None:
+        # the ledger is append-only; rows are flushed with the caller's commit
+        self.db.add_all(
+            TrnStockMovement(id_product=product_id, kind=kind, quantity=quantity)
+            for product_id, quantity in quantities.items()
+            if quantity
+        )
+
+    async def release_expired_holds(self, now: datetime, limit: int) -> int:
+        expired = (
+            select(TrnStockReservation.id_reservation)
+            .where(TrnStockReservation.expires_at <= now)
+            .order_by(TrnStockReservation.expires_at)
             .limit(limit)
-            .offset(offset)
         )
+        result = await self.db.execute(
+            delete(TrnStockReservation)
+            .where(TrnStockReservation.id_reservation.in_(expired))
+            .returning(TrnStockReservation.id_product, TrnStockReservation.id_stock, TrnStockReservation.quantity)
+        )
+        rows = result.all()
+        freed: dict[uuid.UUID, int] = {}
+        for _, slot_id, held in rows:
+            freed[slot_id] = freed.get(slot_id, 0) + held
+        await self._free_reserved(freed)
+        await self.db.commit()
+        await self._invalidate({product_id for product_id, _, _ in rows})
+        return len(rows)
+
+    async def _shrink_holds(self, user_id: uuid.UUID, quantities: Mapping[uuid.UUID, int]) -> dict[uuid.UUID, int]:
+        result = await self.db.execute(
+            select(
+                TrnStockReservation.id_reservation,
+                TrnStockReservation.id_product,
+                TrnStockReservation.id_stock,
+                TrnStockReservation.quantity,
+            )
+            .where(TrnStockReservation.id_user == user_id, TrnStockReservation.id_product.in_(list(quantities)))
+            .order_by(TrnStockReservation.id_product, TrnStockReservation.created_at.desc())
+            .with_for_update()
+        )
+        remaining = dict(quantities)
+        emptied: list[uuid.UUID] = []
+        shrunk: dict[uuid.UUID, int] = {}
+        freed: dict[uuid.UUID, int] = {}
+        for reservation_id, product_id, slot_id, held in result.all():
+            released = min(held, remaining[product_id])
+            if released <= 0:
+                continue
+            if released == held:
+                emptied.append(reservation_id)
+            else:
+                shrunk[reservation_id] = held - released
+            freed[slot_id] = freed.get(slot_id, 0) + released
+            remaining[product_id] -= released
+
+        if emptied:
+            await self.db.execute(
+                delete(TrnStockReservation).where(TrnStockReservation.id_reservation.in_(emptied))
+            )
+        if shrunk:
+            await self.db.execute(
+                update(TrnStockReservation)
+                .where(TrnStockReservation.id_reservation.in_(list(shrunk)))
+                .values(quantity=case(shrunk, value=TrnStockReservation.id_reservation))
+            )
+        return freed
+
+    async def _free_reserved(self, freed: Mapping[uuid.UUID, int]) -> None:
+        if not freed:
+            return
+        await self.db.execute(
+            update(TrnProductStock)
+            .where(TrnProductStock.id.in_(_in_lock_order(TrnProductStock.id.in_(list(freed)))))
+            .values(reserved=TrnProductStock.reserved - case(dict(freed), value=TrnProductStock.id))
+        )
+
+    async def _take_stock(
+        self, quantities: Mapping[uuid.UUID, int], *, hold: bool
+    ) -> Optional[dict[uuid.UUID, tuple[list[tuple[uuid.UUID, int]], int]]]:
+        # takes every quantity or nothing; `hold` reserves the units instead of
+        # removing them from stock. Slot locks are always taken in (id_product,
+        # slot) order so overlapping multi-product takes cannot deadlock
+        if any(quantity <= 0 for quantity in quantities.values()):
+            return None
+        quantities = dict(sorted(quantities.items()))
+        if len(quantities) > 1:
+            # one statement when every product has a slot that covers it; if one
+            # must be drained, the savepoint drops the locks taken so far and the
+            # products are taken one at a time, still in order
+            savepoint = await self.db.begin_nested()
+            served = await self._take_random_slots(quantities, hold=hold)
+            if len(served) == len(quantities):
+                await savepoint.commit()
+                return {product_id: ([(slot_id, quantities[product_id])], left) for product_id, (slot_id, left) in served.items()}
+            await savepoint.rollback()
+
+        taken: dict[uuid.UUID, tuple[list[tuple[uuid.UUID, int]], int]] = {}
+        for product_id, quantity in quantities.items():
+            served = await self._take_random_slots({product_id: quantity}, hold=hold)
+            if served:
+                slot_id, left = served[product_id]
+                taken[product_id] = ([(slot_id, quantity)], left)
+                continue
+            drained = await self._drain_slots(product_id, quantity, hold=hold)
+            if drained is None:
+                # give back what the other products already took
+                await self._restore_slots([slot for slots, _ in taken.values() for slot in slots], hold=hold)
+                return None
+            taken[product_id] = drained
+        return taken
+
+    async def _take_random_slots(
+        self, quantities: Mapping[uuid.UUID, int], *, hold: bool
+    ) -> dict[uuid.UUID, tuple[uuid.UUID, int]]:
+        # a random covering slot per product spreads contention over the shards
+        amount = case(dict(quantities), value=TrnProductStock.id_product)
+        candidates = (
+            select(
+                TrnProductStock.id,
+                func.row_number()
+                .over(partition_by=TrnProductStock.id_product, order_by=func.random())
+                .label("pick"),
+            )
+            .where(TrnProductStock.id_product.in_(list(quantities)), _available >= amount)
+            .subquery()
+        )
+        picked = TrnProductStock.id.in_(select(candidates.c.id).where(candidates.c.pick == 1))
+        result = await self.db.execute(
+            update(TrnProductStock)
+            .where(TrnProductStock.id.in_(_in_lock_order(picked, _available >= amount)), _available >= amount)
+            .values(**_take_values(amount, hold))
+            .returning(TrnProductStock.id_product, TrnProductStock.id, _available)
+        )
+        return {product_id: (slot_id, left) for product_id, slot_id, left in result.all()}
+
+    async def _drain_slots(
+        self, product_id: uuid.UUID, quantity: int, *, hold: bool
+    ) -> Optional[tuple[list[tuple[uuid.UUID, int]], int]]:
+        # no single slot could cover the quantity: take it from several slots and
+        # give back what was taken if a concurrent request gets there first
+        result = await self.db.execute(
+            select(TrnProductStock.id, _available)
+            .where(TrnProductStock.id_product == product_id, _available > 0)
+            .order_by(TrnProductStock.slot)
+        )
+        slots = result.all()
+        if sum(available for _, available in slots) < quantity:
+            return None
+
+        taken: list[tuple[uuid.UUID, int]] = []
+        needed = quantity
+        for slot_id, available in slots:
+            take = min(available, needed)
+            result = await self.db.execute(
+                update(TrnProductStock)
+                .where(TrnProductStock.id == slot_id, _available >= take)
+                .values(**_take_values(take, hold))
+                .returning(_available)
+            )
+            left = result.scalars().first()
+            if left is None:
+                break
+            taken.append((slot_id, take))
+            needed -= take
+            if needed == 0:
+                return taken, left
+
+        await self._restore_slots(taken, hold=hold)
+        return None
+
+    async def _restore_slots(self, taken: Sequence[tuple[uuid.UUID, int]], *, hold: bool) -> None:
+        if not taken:
+            return
+        amounts: dict[uuid.UUID, int] = {}
+        for slot_id, amount in taken:
+            amounts[slot_id] = amounts.get(slot_id, 0) + amount
+        await self.db.execute(
+            update(TrnProductStock)
+            .where(TrnProductStock.id.in_(_in_lock_order(TrnProductStock.id.in_(list(amounts)))))
+            .values(**_give_back_values(case(amounts, value=TrnProductStock.id), hold))
+        )
+
+    async def _lock_stock_slots(self, product_id: uuid.UUID) -> list[TrnProductStock]:
+        result = await self.db.execute(
+            select(TrnProductStock)
+            .where(TrnProductStock.id_product == product_id)
+            .order_by(TrnProductStock.slot)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return list(result.scalars().all())
+
+    async def get_all_products(
+        self, limit: int = 10, offset: int = 0, cursor: Optional[Sequence] = None
+    ) -> list[MstProduct]:
+        generation = await self._page_generation()
+        position = f"offset={offset}" if cursor is None else "after=" + ",".join(map(str, cursor))
+        page_key = f"products:page:{generation}:{limit}:{position}"
+        cached = await self.cache.get(page_key)
+        if cached is not None:
+            return [_cached_product(data) for data in cached]
+
+        keys = (MstProduct.created_at, MstProduct.id_product)
+        query = select(MstProduct, _total_stock()).order_by(*keys).limit(limit)
+        if cursor is not None:
+            query = query.where(keyset_after(keys, cursor))
+        else:
+            query = query.offset(offset)
+        result = await self.db.execute(query)
         products: list[MstProduct] = []
         for product, stock in result.all():
             product.stock = stock
             products.append(product)
+
+        await self.cache.set(page_key, [_product_data(product, product.stock) for product in products])
         return products
 
-    async def delete_product(self, product_id: uuid.UUID) -> bool:
-        result = await self.db.execute(select(MstProduct).where(MstProduct.id_product == product_id))
-        product = result.scalars().first()
-        if not product:
-            return False
+    async def count_products(self) -> tuple[int, bool]:
+        return await count_rows(self.db, select(MstProduct.id_product), "products")
 
-        await self.db.delete(product)
+    async def delete_product(self, product_id: uuid.UUID) -> Optional[int]:
+        # stock slots, holds and cart lines go with it via ON DELETE CASCADE and
+        # the stock ledger stays; order history RESTRICTs the delete, which returns None
+        try:
+            # a savepoint, so a refused delete leaves the rest of the session intact
+            async with self.db.begin_nested():
+                result = await self.db.execute(
+                    delete(MstProduct).where(MstProduct.id_product == product_id).returning(MstProduct.id_product)
+                )
+                deleted = len(result.all())
+        except IntegrityError:
+            return None
         await self.db.commit()
-        return True
\ No newline at end of file
+        if deleted:
+            await self._invalidate([product_id])
+        return deleted
+
+    def _invalidate_after_commit(self, product_ids) -> None:
+        # commit=False writes: dropping the keys before the caller commits would
+        # let a concurrent read re-cache the pre-commit stock for the whole TTL
+        self._pending_invalidation.update(product_ids)
+
+    async def flush_invalidations(self) -> None:
+        # called by whoever commits after commit=False writes
+        product_ids, self._pending_invalidation = self._pending_invalidation, set()
+        await self._invalidate(product_ids)
+
+    async def _invalidate(self, product_ids) -> None:
+        # any product write can change what a listing page shows, so it also
+        # starts a new page generation
+        keys = [_product_key(product_id) for product_id in product_ids]
+        if keys:
+            await self.cache.delete(*keys)
+            await self._invalidate_pages()
+
+    async def _page_generation(self) -> str:
+        generation = await self.cache.backend.get(_PAGE_GENERATION_KEY)
+        if generation is None:
+            # an evicted generation must not bring back pages cached under it
+            generation = await self._invalidate_pages()
+        return generation
+
+    async def _invalidate_pages(self) -> str:
+        # a fresh token rather than an increment, so concurrent writers cannot
+        # lose a bump; old pages age out of the LRU
+        generation = uuid.uuid4().hex
+        await self.cache.backend.set(_PAGE_GENERATION_KEY, generation, 365 * 24 * 3600)
+        return generation
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
+from uuid import UUID
 
 class ProductBase(BaseModel):
     name: str
@@ -18,4 +19,15 @@ class ProductUpdate(BaseModel):
     product_image_url: Optional[str]
 
 class ProductUpdateStock(BaseModel):
-    stock: int
\ No newline at end of file
+    stock: int
+
+class ProductStockAdjustment(BaseModel):
+    product_id: UUID
+    stock: Optional[int] = Field(default=None, ge=0)
+    delta: Optional[int] = None
+
+    @model_validator(mode="after")
+    def check_one_adjustment(self):
+        if (self.stock is None) == (self.delta is None):
+            raise ValueError("Provide exactly one of stock or delta")
+        return self
@@ -1,7 +1,10 @@
-from typing import Optional
-from app.domain.products.repositories import ProductRepository
-from app.domain.products.schemas import ProductCreate, ProductUpdate
-from app.domain.products.models import MstProduct, TrnProductStock
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterable, Optional, Sequence
+from pydantic import ValidationError
+from app.core.config import settings
+from app.domain.products.repositories import ProductRepository, StockAdjustmentData
+from app.domain.products.schemas import ProductCreate, ProductStockAdjustment, ProductUpdate
+from app.domain.products.models import MstProduct, TrnProductStock, TrnStockReservation
 from uuid import UUID
 
 class ProductService:
@@ -27,13 +30,95 @@ class ProductService:
         )
 
     async def update_product_stock(self, product_id: UUID, stock: int) -> Optional[TrnProductStock]:
+        reserved = sum(slot.reserved or 0 for slot in await self.product_repo.get_stock_slots(product_id))
+        if stock < reserved:
+            raise ValueError(f"Stock cannot be set below the {reserved} units held in carts")
         return await self.product_repo.update_product_stock(product_id, stock)
 
+    async def bulk_update_product_stock(self, rows: AsyncIterable[Any]) -> list[dict]:
+        results: list[dict] = []
+        chunk: list[tuple[int, ProductStockAdjustment]] = []
+
+        async def flush() -> None:
+            applied = await self.product_repo.bulk_update_product_stock(
+                [
+                    StockAdjustmentData(id_product=adjustment.product_id, stock=adjustment.stock, delta=adjustment.delta)
+                    for _, adjustment in chunk
+                ]
+            )
+            for (index, adjustment), outcome in zip(chunk, applied):
+                results.append({"index": index, "product_id": adjustment.product_id, **outcome})
+            chunk.clear()
+
+        index = 0
+        async for row in rows:
+            try:
+                if isinstance(row, (str, bytes)):
+                    adjustment = ProductStockAdjustment.model_validate_json(row)
+                else:
+                    adjustment = ProductStockAdjustment.model_validate(row)
+            except ValidationError as exc:
+                results.append({"index": index, "product_id": None, "status": "invalid", "stock": None, "error": str(exc)})
+            else:
+                chunk.append((index, adjustment))
+                if len(chunk) >= settings.stock_bulk_chunk_size:
+                    await flush()
+            index += 1
+        if chunk:
+            await flush()
+        results.sort(key=lambda result: result["index"])
+        return results
+
+    async def set_stock_slots(self, product_id: UUID, slots: int) -> Optional[list[TrnProductStock]]:
+        if slots < 1:
+            raise ValueError("A product needs at least one stock slot")
+        if slots > settings.stock_max_slots:
+            raise ValueError(f"A product can have at most {settings.stock_max_slots} stock slots")
+        return await self.product_repo.set_stock_slots(product_id, slots)
+
+    async def rebalance_stock_slots(self, product_id: UUID) -> Optional[list[TrnProductStock]]:
+        return await self.product_repo.rebalance_stock_slots(product_id)
+
+    async def hold_product_stock(self, user_id: UUID, product_id: UUID, quantity: int) -> Optional[list[TrnStockReservation]]:
+        expires_at = datetime.utcnow() + timedelta(minutes=settings.cart_hold_ttl_minutes)
+        return await self.product_repo.hold_product_stock(user_id, product_id, quantity, expires_at)
+
+    async def release_holds(self, user_id: UUID, product_id: Optional[UUID] = None, quantity: Optional[int] = None) -> int:
+        return await self.product_repo.release_holds(user_id, product_id, quantity)
+
+    async def release_expired_holds(self, limit: int) -> int:
+        return await self.product_repo.release_expired_holds(datetime.utcnow(), limit)
+
+    async def get_stock_ledger(self, product_id: UUID, limit: int = 50) -> Optional[dict]:
+        on_hand = await self.product_repo.get_on_hand_stock(product_id)
+        if on_hand is None:
+            return None
+        return {
+            "stock": on_hand,
+            "ledger_stock": await self.product_repo.get_ledger_stock(product_id),
+            "movements": await self.product_repo.get_stock_movements(product_id, limit),
+        }
+
+    async def snapshot_stock_ledger(self) -> int:
+        horizon = datetime.utcnow() - timedelta(seconds=settings.stock_snapshot_lag_seconds)
+        return await self.product_repo.snapshot_stock_ledger(horizon)
+
     async def get_product_by_id(self, product_id: UUID) -> Optional[MstProduct]:
         return await self.product_repo.get_product_by_id(product_id)
     
-    async def get_all_products(self, limit: int = 10, offset: int = 0) -> list[MstProduct]:
-        return await self.product_repo.get_all_products(limit, offset)
+    async def get_all_products(
+        self, limit: int = 10, offset: int = 0, cursor: Optional[Sequence] = None
+    ) -> list[MstProduct]:
+        return await self.product_repo.get_all_products(limit, offset, cursor)
+
+    async def count_products(self) -> tuple[int, bool]:
+        return await self.product_repo.count_products()
     
-    async def delete_product(self, product_id: UUID) -> bool:
-        return await self.product_repo.delete_product(product_id)
\ No newline at end of file
+    def get_cache_stats(self) -> dict:
+        return self.product_repo.cache.stats()
+
+    async def delete_product(self, product_id: UUID) -> int:
+        deleted = await self.product_repo.delete_product(product_id)
+        if deleted is None:
+            raise ValueError("Product has order history and cannot be deleted")
+        return deleted
\ No newline at end of file
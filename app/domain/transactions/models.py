@@ -1,7 +1,7 @@
 from datetime import datetime
 import uuid
 import enum
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.core.base_class import Base
@@ -17,6 +17,10 @@ class TransactionStatus(str, enum.Enum):
 
 class MstTransaction(Base):
     __tablename__ = "mst_transactions"
+    __table_args__ = (
+        Index("ix_mst_transactions_id_user_created_at", "id_user", "created_at"),
+        Index("ix_mst_transactions_created_at_id_transaction", "created_at", "id_transaction"),
+    )
 
     id_transaction = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     id_user = Column(UUID(as_uuid=True), ForeignKey("mst_users.id_user"))
@@ -28,14 +32,14 @@ class MstTransaction(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     updated_by = Column(String, nullable=True)
 
-    items = relationship("TrnTransactionItem", back_populates="transaction")
-    statuses = relationship("TrnTransactionStatus", back_populates="transaction")
+    items = relationship("TrnTransactionItem", back_populates="transaction", cascade="all, delete-orphan", passive_deletes=True)
+    statuses = relationship("TrnTransactionStatus", back_populates="transaction", cascade="all, delete-orphan", passive_deletes=True)
 
 class TrnTransactionItem(Base):
     __tablename__ = "trn_transaction_items"
 
     id_transaction_item = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    id_transaction = Column(UUID(as_uuid=True), ForeignKey("mst_transactions.id_transaction"))
+    id_transaction = Column(UUID(as_uuid=True), ForeignKey("mst_transactions.id_transaction", ondelete="CASCADE"), index=True)
     id_product = Column(UUID(as_uuid=True), ForeignKey("mst_product.id_product"))
     quantity = Column(Integer, nullable=False)
     price_at_time = Column(Integer, nullable=False)
@@ -48,7 +52,7 @@ class TrnTransactionStatus(Base):
     __tablename__ = "trn_transaction_status"
 
     id_transaction_status = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
-    id_transaction = Column(UUID(as_uuid=True), ForeignKey("mst_transactions.id_transaction"))
+    id_transaction = Column(UUID(as_uuid=True), ForeignKey("mst_transactions.id_transaction", ondelete="CASCADE"), index=True)
     status = Column(Enum(TransactionStatus), default=TransactionStatus.PENDING)
 
     created_at = Column(DateTime, default=datetime.utcnow)
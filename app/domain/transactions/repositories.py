@@ -1,9 +1,10 @@
 from typing import Optional, Sequence, TypedDict
-from uuid import UUID
+from uuid import UUID, uuid4
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm.attributes import set_committed_value
 from app.domain.transactions.models import MstTransaction, TrnTransactionItem, TrnTransactionStatus, TransactionStatus
+from app.utils.pagination import count_rows, keyset_after
 
 
 class TransactionItemData(TypedDict):
@@ -11,6 +12,21 @@ class TransactionItemData(TypedDict):
     quantity: int
     price_at_time: int
 
+def _filter_transactions(
+    query,
+    user_id: Optional[UUID],
+    status: Optional[TransactionStatus],
+    expedition_service: Optional[UUID],
+):
+    query = query.join(TrnTransactionStatus, TrnTransactionStatus.id_transaction == MstTransaction.id_transaction)
+    if expedition_service:
+        query = query.where(MstTransaction.id_expedition_service == expedition_service)
+    if user_id:
+        query = query.where(MstTransaction.id_user == user_id)
+    if status:
+        query = query.where(TrnTransactionStatus.status == status)
+    return query
+
 class TransactionRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -25,12 +41,12 @@ class TransactionRepository:
         total = sum(item["price_at_time"] * item["quantity"] for item in items)
 
         new_transaction = MstTransaction(
+            id_transaction=uuid4(),
             id_user=id_user,
             total=total,
             id_expedition_service=id_expedition_service,
         )
         self.db.add(new_transaction)
-        await self.db.flush()
 
         transaction_items = []
         for item in items:
@@ -83,8 +99,18 @@ class TransactionRepository:
         transaction.status = status  # expose status for response
         return transaction
     
-    async def get_transaction_status_by_id(self, transaction_id: UUID) -> Optional[TrnTransactionStatus]:
-        result = await self.db.execute(select(TrnTransactionStatus).where(TrnTransactionStatus.id_transaction == transaction_id))
+    async def get_transaction_items(self, transaction_id: UUID) -> list[TrnTransactionItem]:
+        result = await self.db.execute(select(TrnTransactionItem).where(TrnTransactionItem.id_transaction == transaction_id))
+        return list(result.scalars().all())
+
+    async def get_transaction_status_by_id(
+        self, transaction_id: UUID, *, for_update: bool = False
+    ) -> Optional[TrnTransactionStatus]:
+        query = select(TrnTransactionStatus).where(TrnTransactionStatus.id_transaction == transaction_id)
+        if for_update:
+            # held until the caller commits, so status transitions are serialised
+            query = query.with_for_update().execution_options(populate_existing=True)
+        result = await self.db.execute(query)
         return result.scalars().first()
     
     async def update_expedition_service(self, transaction_id: UUID, expedition_service_id: UUID) -> Optional[MstTransaction]:
@@ -106,26 +132,42 @@ class TransactionRepository:
         expedition_service: Optional[UUID] = None,
         limit: int = 10,
         offset: int = 0,
+        cursor: Optional[Sequence] = None,
     ):
+        # page over transactions, then load the items of that page only
+        keys = (MstTransaction.created_at, MstTransaction.id_transaction)
         query = (
-            select(MstTransaction, TrnTransactionItem, TrnTransactionStatus.status)
-            .join(TrnTransactionItem, TrnTransactionItem.id_transaction == MstTransaction.id_transaction)
-            .join(TrnTransactionStatus, TrnTransactionStatus.id_transaction == MstTransaction.id_transaction)
-            .order_by(MstTransaction.created_at.desc())
+            _filter_transactions(select(MstTransaction, TrnTransactionStatus.status), user_id, status, expedition_service)
+            .order_by(MstTransaction.created_at.desc(), MstTransaction.id_transaction.desc())
+            .limit(limit)
         )
-        if expedition_service:
-            query = query.where(MstTransaction.id_expedition_service == expedition_service)
-        if user_id:
-            query = query.where(MstTransaction.id_user == user_id)
-        if status:
-            query = query.where(TrnTransactionStatus.status == status)
+        if cursor is not None:
+            query = query.where(keyset_after(keys, cursor, descending=True))
+        else:
+            query = query.offset(offset)
 
-        result = await self.db.execute(query.limit(limit).offset(offset))
+        result = await self.db.execute(query)
         transactions_dict = {}
-        for transaction, item, status in result.all():
-            if transaction.id_transaction not in transactions_dict:
-                set_committed_value(transaction, "items", [])  # initialize items list without triggering lazy load
-                transaction.status = status  # expose status for response
-                transactions_dict[transaction.id_transaction] = transaction
-            transactions_dict[transaction.id_transaction].items.append(item)  # append items to the transaction
-        return list(transactions_dict.values())
\ No newline at end of file
+        for transaction, status in result.all():
+            set_committed_value(transaction, "items", [])  # initialize items list without triggering lazy load
+            transaction.status = status  # expose status for response
+            transactions_dict[transaction.id_transaction] = transaction
+        if transactions_dict:
+            items = await self.db.execute(
+                select(TrnTransactionItem).where(TrnTransactionItem.id_transaction.in_(list(transactions_dict)))
+            )
+            for item in items.scalars().all():
+                transactions_dict[item.id_transaction].items.append(item)  # append items to the transaction
+        return list(transactions_dict.values())
+
+    async def count_transactions(
+        self,
+        user_id: Optional[UUID] = None,
+        status: Optional[TransactionStatus] = None,
+        expedition_service: Optional[UUID] = None,
+    ) -> tuple[int, bool]:
+        return await count_rows(
+            self.db,
+            _filter_transactions(select(MstTransaction.id_transaction), user_id, status, expedition_service),
+            f"transactions:{user_id}:{status}:{expedition_service}",
+        )
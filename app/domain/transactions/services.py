@@ -1,8 +1,9 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 from uuid import UUID
 
 from app.domain.transactions.repositories import TransactionItemData, TransactionRepository
 from app.domain.expeditions.repositories import ExpeditionRepository
+from app.domain.products.models import StockMovementKind
 from app.domain.products.repositories import ProductRepository
 from app.domain.carts.repositories import CartRepository
 from app.domain.transactions.models import MstTransaction, TrnTransactionStatus, TransactionStatus
@@ -37,28 +38,34 @@ class TransactionService:
                 for cart in carts
             ]
 
-        transaction_items: List[TransactionItemData] = []
+        quantities: Dict[UUID, int] = {}
         for item in items_payload:
             if item.quantity <= 0:
                 raise ValueError("Quantity must be greater than zero")
+            quantities[item.id_product] = quantities.get(item.id_product, 0) + item.quantity
 
-            product = await self.product_repo.get_product_by_id(item.id_product)
-            if not product:
-                raise ValueError(f"Product {item.id_product} not found")
-
-            product_stock = getattr(product, "stock", 0) or 0
-            if product_stock < item.quantity:
-                raise ValueError(f"Insufficient stock for product {item.id_product}")
+        products = await self.product_repo.get_products_by_ids(list(quantities))
+        for product_id, quantity in quantities.items():
+            if product_id not in products:
+                raise ValueError(f"Product {product_id} not found")
+            # cart lines are covered by their holds, which the product read excludes
+            if not used_cart_items and (getattr(products[product_id], "stock", 0) or 0) < quantity:
+                raise ValueError(f"Insufficient stock for product {product_id}")
 
+        transaction_items: List[TransactionItemData] = []
+        for item in items_payload:
+            product = products[item.id_product]
             unit_price = item.price_at_time if item.price_at_time is not None else product.price
-
             transaction_items.append({
                 "id_product": item.id_product,
                 "quantity": item.quantity,
                 "price_at_time": unit_price,
             })
 
-            await self.product_repo.update_product_stock(item.id_product, product_stock - item.quantity)
+        # held cart units are converted as they are; anything not held goes through
+        # the conditional decrement. Committed together with the transaction rows.
+        if not await self.product_repo.checkout_stock(transaction_in.id_user, quantities, use_holds=used_cart_items):
+            raise ValueError("Insufficient stock for one or more products")
 
         new_transaction = await self.transaction_repo.create_transaction(
             id_user=transaction_in.id_user,
@@ -66,12 +73,34 @@ class TransactionService:
             items=transaction_items,
         )
 
+        await self.product_repo.flush_invalidations()
+
         if used_cart_items:
             await self.cart_repo.empty_cart_by_user_id(transaction_in.id_user)
         return new_transaction
 
     async def update_transaction_status(self, transaction_id: UUID, status: TransactionStatus) -> Optional[TrnTransactionStatus]:
-        return await self.transaction_repo.update_transaction_status(transaction_id, status)
+        # the status row stays locked until the change commits, so concurrent
+        # cancels restock once; cancelled is terminal
+        current = await self.transaction_repo.get_transaction_status_by_id(transaction_id, for_update=True)
+        if not current:
+            return None
+        if current.status == TransactionStatus.CANCELLED:
+            if status == TransactionStatus.CANCELLED:
+                return current
+            raise ValueError("Cancelled transactions cannot change status")
+        if status == TransactionStatus.CANCELLED:
+            # cancelled orders give their units back; committed with the status change
+            quantities: Dict[UUID, int] = {}
+            for item in await self.transaction_repo.get_transaction_items(transaction_id):
+                quantities[item.id_product] = quantities.get(item.id_product, 0) + item.quantity
+            if quantities:
+                await self.product_repo.restock_products(
+                    quantities, StockMovementKind.CANCELLATION, commit=False
+                )
+        updated = await self.transaction_repo.update_transaction_status(transaction_id, status)
+        await self.product_repo.flush_invalidations()
+        return updated
 
     async def get_transaction_by_id(self, transaction_id: UUID) -> Optional[MstTransaction]:
         return await self.transaction_repo.get_transaction_by_id(transaction_id)
@@ -94,6 +123,7 @@ class TransactionService:
         expedition_service: Optional[UUID] = None,
         limit: int = 10,
         offset: int = 0,
+        cursor: Optional[Sequence] = None,
     ) -> List[MstTransaction]:
         return await self.transaction_repo.get_all_transactions(
             user_id=user_id,
@@ -101,4 +131,18 @@ class TransactionService:
             expedition_service=expedition_service,
             limit=limit,
             offset=offset,
+            cursor=cursor,
+        )
+
+    async def count_transactions(
+        self,
+        *,
+        user_id: Optional[UUID] = None,
+        status: Optional[TransactionStatus] = None,
+        expedition_service: Optional[UUID] = None,
+    ) -> tuple[int, bool]:
+        return await self.transaction_repo.count_transactions(
+            user_id=user_id,
+            status=status,
+            expedition_service=expedition_service,
         )
\ No newline at end of file
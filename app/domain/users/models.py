@@ -1,6 +1,6 @@
 from datetime import datetime
 import uuid
-from sqlalchemy import Column, String, DateTime, Enum
+from sqlalchemy import Column, String, Integer, DateTime, Enum, Index, func
 from sqlalchemy.dialects.postgresql import UUID
 from app.core.base_class import Base
 import enum
@@ -11,6 +11,16 @@ class UserRole(str, enum.Enum):
 
 class MstUser(Base):
     __tablename__ = "mst_users"
+    __table_args__ = (
+        Index("ix_mst_users_created_at_id_user", "created_at", "id_user"),
+        Index("ix_mst_users_role_created_at_id_user", "role", "created_at", "id_user"),
+        Index(
+            "ix_mst_users_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
 
     id_user = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     name = Column(String, nullable=False)
@@ -18,8 +28,16 @@ class MstUser(Base):
     profile_picture = Column(String, nullable=True)
     email = Column(String, unique=True, index=True, nullable=False)
     password = Column(String, nullable=False)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     created_at = Column(DateTime, default=datetime.utcnow)
     created_by = Column(String, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     updated_by = Column(String, nullable=True)
+
+# case-insensitive email prefix search; text_pattern_ops lets LIKE 'abc%' use it
+Index(
+    "ix_mst_users_email_lower",
+    func.lower(MstUser.email).label("email_lower"),
+    postgresql_ops={"email_lower": "text_pattern_ops"},
+)
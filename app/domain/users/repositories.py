@@ -1,13 +1,62 @@
 import uuid
-from sqlalchemy import update
+from datetime import datetime
+from sqlalchemy import func, or_, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.domain.users.models import MstUser, UserRole
-from typing import Optional
+from typing import Iterable, Optional, Sequence, TypedDict
+from app.core.cache import Cache, principal_cache, token_version_cache
+from app.utils.pagination import count_rows, keyset_after
+from app.utils.sql import dialect_insert, escape_like
+
+
+def _principal_key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def _filter_users(
+    query,
+    search: Optional[str],
+    role: Optional[UserRole],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime],
+):
+    if search:
+        # prefix matches served by ix_mst_users_email_lower and ix_mst_users_name_trgm
+        prefix = escape_like(search.lower()) + "%"
+        query = query.where(
+            or_(
+                func.lower(MstUser.email).like(prefix, escape="\\"),
+                MstUser.name.ilike(prefix, escape="\\"),
+            )
+        )
+    if role:
+        query = query.where(MstUser.role == role)
+    if created_from:
+        query = query.where(MstUser.created_at >= created_from)
+    if created_to:
+        query = query.where(MstUser.created_at < created_to)
+    return query
+
+
+class UserImportData(TypedDict):
+    name: str
+    email: str
+    role: UserRole
+    profile_picture: Optional[str]
+    password: str
+
 
 class UserRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        cache: Cache = principal_cache,
+        token_versions: Cache = token_version_cache,
+    ):
         self.db = db
+        self.cache = cache
+        self.token_versions = token_versions
 
     async def get_user_by_email(self, email: str) -> Optional[MstUser]:
         result = await self.db.execute(select(MstUser).where(MstUser.email == email))
@@ -34,6 +83,28 @@ class UserRepository:
         await self.db.refresh(new_user)
         return new_user
 
+    async def get_existing_emails(self, emails: Iterable[str]) -> set[str]:
+        emails = list(emails)
+        if not emails:
+            return set()
+        result = await self.db.execute(select(MstUser.email).where(MstUser.email.in_(emails)))
+        return set(result.scalars().all())
+
+    async def bulk_create_users(self, users: list[UserImportData]) -> dict[str, uuid.UUID]:
+        # multi-row INSERT ... RETURNING; emails claimed by a concurrent insert
+        # are skipped rather than failing the whole chunk
+        if not users:
+            return {}
+        statement = (
+            dialect_insert(self.db, MstUser)
+            .on_conflict_do_nothing(index_elements=[MstUser.email])
+            .returning(MstUser.email, MstUser.id_user)
+        )
+        result = await self.db.execute(statement, [dict(user, id_user=uuid.uuid4()) for user in users])
+        created = {email: id_user for email, id_user in result.all()}
+        await self.db.commit()
+        return created
+
     async def update_user(
         self,
         user_id: uuid.UUID,
@@ -52,20 +123,92 @@ class UserRepository:
             user.name = name
         if email is not None:
             user.email = email
-        if role is not None:
+        if role is not None and role != user.role:
+            # tokens carry the role, so a role change revokes them
             user.role = role
+            user.token_version = (user.token_version or 0) + 1
         if profile_picture is not None:
             user.profile_picture = profile_picture
 
         self.db.add(user)
         await self.db.commit()
         await self.db.refresh(user)
+        await self.cache.delete(_principal_key(user_id))
+        await self.token_versions.delete(_principal_key(user_id))
+        return user
+
+    async def get_token_version(self, user_id: uuid.UUID) -> Optional[int]:
+        cached = await self.token_versions.get(_principal_key(user_id))
+        if cached is not None:
+            return cached
+        token_version = await self.db.scalar(select(MstUser.token_version).where(MstUser.id_user == user_id))
+        if token_version is not None:
+            await self.token_versions.set(_principal_key(user_id), token_version)
+        return token_version
+
+    async def bump_token_version(self, user_id: uuid.UUID) -> Optional[int]:
+        result = await self.db.execute(
+            update(MstUser)
+            .where(MstUser.id_user == user_id)
+            .values(token_version=MstUser.token_version + 1)
+            .returning(MstUser.token_version)
+        )
+        token_version = result.scalar()
+        await self.db.commit()
+        await self.cache.delete(_principal_key(user_id))
+        await self.token_versions.delete(_principal_key(user_id))
+        return token_version
+
+    async def get_principal(self, user_id: uuid.UUID) -> Optional[MstUser]:
+        # authenticated user for request dependencies; a transient copy without
+        # the password hash, refreshed at most every principal_cache_ttl_seconds
+        cached = await self.cache.get(_principal_key(user_id))
+        if cached is not None:
+            return MstUser(**cached)
+        user = await self.get_user_by_id(user_id)
+        if user is None:
+            return None
+        await self.cache.set(
+            _principal_key(user_id),
+            {column.key: getattr(user, column.key) for column in MstUser.__table__.columns if column.key != "password"},
+        )
         return user
 
     async def get_user_by_id(self, user_id: uuid.UUID) -> Optional[MstUser]:
         result = await self.db.execute(select(MstUser).where(MstUser.id_user == user_id))
         return result.scalars().first()
 
-    async def get_all_users(self, limit: int = 10, offset: int = 0) -> list[MstUser]:
-        result = await self.db.execute(select(MstUser).limit(limit).offset(offset))
-        return result.scalars().all()
\ No newline at end of file
+    async def get_all_users(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[Sequence] = None,
+        search: Optional[str] = None,
+        role: Optional[UserRole] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> list[MstUser]:
+        query = (
+            _filter_users(select(MstUser), search, role, created_from, created_to)
+            .order_by(MstUser.created_at, MstUser.id_user)
+            .limit(limit)
+        )
+        if cursor is not None:
+            query = query.where(keyset_after((MstUser.created_at, MstUser.id_user), cursor))
+        else:
+            query = query.offset(offset)
+        result = await self.db.execute(query)
+        return result.scalars().all()
+
+    async def count_users(
+        self,
+        search: Optional[str] = None,
+        role: Optional[UserRole] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> tuple[int, bool]:
+        return await count_rows(
+            self.db,
+            _filter_users(select(MstUser.id_user), search, role, created_from, created_to),
+            f"users:{search}:{role}:{created_from}:{created_to}",
+        )
\ No newline at end of file
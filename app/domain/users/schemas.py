@@ -1,6 +1,6 @@
 import uuid
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Literal, Optional
 
 class UserBase(BaseModel):
     name: str
@@ -26,4 +26,12 @@ class UserUpdate(BaseModel):
 
 class UserLogin(BaseModel):
     email: EmailStr
-    password: str
\ No newline at end of file
+    password: str
+    guest_cart: Optional[str] = None
+
+class UserImportRow(BaseModel):
+    name: str
+    email: EmailStr
+    password: str
+    role: Literal["admin", "user"] = "user"
+    profile_picture: Optional[str] = None
@@ -1,8 +1,12 @@
-from app.domain.users.repositories import UserRepository
-from app.domain.users.schemas import UserUpdate, UserBase, UserCreate
-from typing import Optional
+from app.domain.users.repositories import UserImportData, UserRepository
+from app.domain.users.schemas import UserUpdate, UserBase, UserCreate, UserImportRow
+from datetime import datetime
+from typing import Any, AsyncIterable, Optional, Sequence
+from uuid import UUID
+from pydantic import ValidationError
+from app.core.config import settings
 from app.domain.users.models import MstUser, UserRole
-from app.domain.auth.security import get_password_hash
+from app.domain.auth.security import hash_passwords, password_hasher
 
 class UserService:
     def __init__(self, user_repo: UserRepository):
@@ -12,7 +16,7 @@ class UserService:
         return await self.user_repo.get_user_by_email(email)
     
     async def create_user(self, user_in: UserCreate) -> MstUser:
-        hashed_password = get_password_hash(user_in.password)
+        hashed_password = await password_hasher.hash(user_in.password)
         role = user_in.role if isinstance(user_in.role, UserRole) else UserRole(user_in.role)
         return await self.user_repo.create_user(
             name=user_in.name,
@@ -22,6 +26,66 @@ class UserService:
             hashed_password=hashed_password,
         )
 
+    async def import_users(self, rows: AsyncIterable[Any]) -> list[dict]:
+        results: list[dict] = []
+        chunk: list[tuple[int, UserImportRow]] = []
+
+        async def flush() -> None:
+            # uniqueness is checked before hashing so duplicates cost no CPU
+            existing = await self.user_repo.get_existing_emails(row.email for _, row in chunk)
+            pending: list[tuple[int, UserImportRow]] = []
+            seen: set[str] = set()
+            for index, row in chunk:
+                if row.email in existing:
+                    results.append({"index": index, "email": row.email, "status": "exists", "id": None, "error": None})
+                elif row.email in seen:
+                    results.append({"index": index, "email": row.email, "status": "duplicate", "id": None, "error": None})
+                else:
+                    seen.add(row.email)
+                    pending.append((index, row))
+            hashed = await hash_passwords([row.password for _, row in pending])
+            created = await self.user_repo.bulk_create_users(
+                [
+                    UserImportData(
+                        name=row.name,
+                        email=row.email,
+                        role=UserRole(row.role),
+                        profile_picture=row.profile_picture,
+                        password=hashed_password,
+                    )
+                    for (_, row), hashed_password in zip(pending, hashed)
+                ]
+            )
+            for index, row in pending:
+                user_id = created.get(row.email)
+                results.append({
+                    "index": index,
+                    "email": row.email,
+                    "status": "created" if user_id else "exists",
+                    "id": user_id,
+                    "error": None,
+                })
+            chunk.clear()
+
+        index = 0
+        async for row in rows:
+            try:
+                if isinstance(row, (str, bytes)):
+                    user_row = UserImportRow.model_validate_json(row)
+                else:
+                    user_row = UserImportRow.model_validate(row)
+            except ValidationError as exc:
+                results.append({"index": index, "email": None, "status": "invalid", "id": None, "error": str(exc)})
+            else:
+                chunk.append((index, user_row))
+                if len(chunk) >= settings.user_import_chunk_size:
+                    await flush()
+            index += 1
+        if chunk:
+            await flush()
+        results.sort(key=lambda result: result["index"])
+        return results
+
     async def update_user(self, user_id: str, user_in: UserUpdate) -> Optional[UserBase]:
         role = None
         if user_in.role is not None:
@@ -38,6 +102,27 @@ class UserService:
     async def get_user_by_id(self, user_id: str) -> Optional[UserBase]:
         return await self.user_repo.get_user_by_id(user_id)
     
-    async def get_all_users(self, limit: int = 10, offset: int = 0) -> list[MstUser]:
-        return await self.user_repo.get_all_users(limit, offset)
+    async def get_all_users(
+        self,
+        limit: int = 10,
+        offset: int = 0,
+        cursor: Optional[Sequence] = None,
+        search: Optional[str] = None,
+        role: Optional[UserRole] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> list[MstUser]:
+        return await self.user_repo.get_all_users(limit, offset, cursor, search, role, created_from, created_to)
+
+    async def revoke_tokens(self, user_id: UUID) -> Optional[int]:
+        return await self.user_repo.bump_token_version(user_id)
+
+    async def count_users(
+        self,
+        search: Optional[str] = None,
+        role: Optional[UserRole] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> tuple[int, bool]:
+        return await self.user_repo.count_users(search, role, created_from, created_to)
     
\ No newline at end of file
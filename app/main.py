@@ -1,12 +1,35 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, status
+from .core.background import refresh_token_revocations, start_background_tasks, stop_background_tasks
+from .domain.auth.security import shutdown_import_pool
 from .api.auth import router as auth_router
 from .api.users import router as users_router
 from .api.products import router as products_router
 from .api.expeditions import router as expeditions_router
 from .api.carts import router as carts_router
 from .api.transactions import router as transactions_router
+from .utils.pagination import InvalidCursorError
+from .utils.response_utils import create_response
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # revoked tokens must be known before the first request is served
+    await refresh_token_revocations()
+    tasks = start_background_tasks()
+    yield
+    await stop_background_tasks(tasks)
+    shutdown_import_pool()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError):
+    return create_response(
+        success=False,
+        message=str(exc),
+        error_code="INVALID_CURSOR",
+        status_code=status.HTTP_400_BAD_REQUEST
+    )
 
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(users_router, prefix="/api/v1/users", tags=["users"])
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import json
+import logging
+from collections import Counter
+from pathlib import Path
+from typing import AsyncIterator
+from app.core.database import SessionLocal
+from app.domain.auth.security import shutdown_import_pool
+from app.domain.users.repositories import UserRepository
+from app.domain.users.service import UserService
+from app.utils.streaming import parse_csv
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def _read_lines(path: Path) -> AsyncIterator[str]:
+    with path.open(encoding="utf-8-sig") as source:
+        for line in source:
+            if line.strip():
+                yield line
+
+
+async def import_users(path: Path, file_format: str, report: Path):
+    rows = _read_lines(path)
+    if file_format == "csv":
+        rows = parse_csv(rows)
+    async with SessionLocal() as db:
+        results = await UserService(UserRepository(db)).import_users(rows)
+    with report.open("w") as output:
+        for result in results:
+            output.write(json.dumps({**result, "id": str(result["id"]) if result["id"] else None}) + "\n")
+    summary = Counter(result["status"] for result in results)
+    logger.info(f"Imported {path}: {dict(summary)}; report written to {report}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV or NDJSON")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--report", type=Path, default=Path("user_import_report.ndjson"))
+    args = parser.parse_args()
+    file_format = args.format or ("csv" if args.path.suffix.lower() == ".csv" else "ndjson")
+    try:
+        asyncio.run(import_users(args.path, file_format, args.report))
+    finally:
+        shutdown_import_pool()
@@ -0,0 +1,125 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Optional, Sequence
+from sqlalchemy import Select, String, Table, bindparam, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql.util import find_tables
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import count_cache
+from app.core.config import settings
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def _cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = json.dumps([_cursor_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursorError("Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise InvalidCursorError("Invalid cursor")
+    return values
+
+
+def keyset_after(columns: Sequence, cursor: Sequence, *, descending: bool = False):
+    # row-value comparison so Postgres can walk the matching composite index
+    if len(columns) != len(cursor):
+        raise InvalidCursorError("Invalid cursor")
+    values = []
+    for column, value in zip(columns, cursor):
+        python_type = column.type.python_type
+        try:
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is uuid.UUID:
+                value = uuid.UUID(value)
+        except (TypeError, ValueError):
+            raise InvalidCursorError("Invalid cursor")
+        values.append(value)
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
+
+
+def next_cursor(items: Sequence[Any], limit: int, *attributes: str) -> Optional[str]:
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(*(getattr(items[-1], attribute) for attribute in attributes))
+
+
+async def _planner_estimate(db: AsyncSession, query: Select) -> int:
+    connection = await db.connection()
+    compiled = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+_TABLE_ROWS = text(
+    "SELECT c.reltuples FROM unnest(:names) AS n(name) JOIN pg_class c ON c.oid = to_regclass(n.name)"
+).bindparams(bindparam("names", type_=ARRAY(String)))
+
+
+async def _table_rows(db: AsyncSession, query: Select) -> float:
+    # upper bound on the rows the query can see from pg_class statistics, or -1
+    # when a table was never analyzed; cached so small lists skip the lookup
+    names = sorted({
+        table.name
+        for from_ in query.get_final_froms()
+        for table in find_tables(from_)
+        if isinstance(table, Table)
+    })
+    cache_key = "reltuples:" + ",".join(names)
+    cached = await count_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await db.execute(_TABLE_ROWS, {"names": names})
+    rows = result.scalars().all()
+    bound = -1.0
+    if names and len(rows) == len(names) and all(row >= 0 for row in rows):
+        bound = 1.0
+        for row in rows:
+            bound *= row
+    await count_cache.set(cache_key, bound)
+    return bound
+
+
+async def count_rows(db: AsyncSession, query: Select, cache_key: str) -> tuple[int, bool]:
+    # small sets are counted exactly; on Postgres, sets the planner expects to be
+    # larger than pagination_exact_count_limit report its estimate instead.
+    # Tables whose statistics already fit under the limit skip the EXPLAIN
+    query = query.order_by(None).limit(None).offset(None)
+    cached = await count_cache.get(cache_key)
+    if cached is not None:
+        return cached, True
+    if db.get_bind().dialect.name == "postgresql" and not (
+        0 <= await _table_rows(db, query) <= settings.pagination_exact_count_limit
+    ):
+        estimate = await _planner_estimate(db, query)
+        if estimate > settings.pagination_exact_count_limit:
+            await count_cache.set(cache_key, estimate)
+            return estimate, True
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
+    return total or 0, False
@@ -0,0 +1,17 @@
+from sqlalchemy import Insert, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def dialect_insert(db: AsyncSession, table) -> Insert:
+    # ON CONFLICT clauses live on the dialect-specific insert constructs
+    name = db.get_bind().dialect.name
+    if name == "postgresql":
+        return postgresql.insert(table)
+    if name == "sqlite":
+        return sqlite.insert(table)
+    return insert(table)
+
+
+def escape_like(value: str, escape: str = "\\") -> str:
+    return value.replace(escape, escape * 2).replace("%", escape + "%").replace("_", escape + "_")
@@ -0,0 +1,36 @@
+import csv
+from typing import Any, AsyncIterable, AsyncIterator
+from fastapi import Request
+
+
+async def read_lines(request: Request) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+async def parse_csv(lines: AsyncIterable[Any]) -> AsyncIterator[dict]:
+    # one record per line; the first line is the header
+    header = None
+    async for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8-sig")
+        if not line.strip():
+            continue
+        values = next(csv.reader([line.rstrip("\r\n")]))
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        # empty cells are treated as missing so optional fields take defaults
+        yield {key: value for key, value in zip(header, values) if value != ""}
+
+
+async def iterate(rows: list[Any]) -> AsyncIterator[Any]:
+    for row in rows:
+        yield row
@@ -1,10 +1,12 @@
 import os
+import re
 import sys
 import uuid
 from typing import Optional
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient, ASGITransport
+from sqlalchemy import event
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
@@ -15,8 +17,11 @@ if ROOT_DIR not in sys.path:
     sys.path.insert(0, ROOT_DIR)
 
 from app.core.base_class import Base
-from app.core.dependencies import get_current_admin, get_current_user, get_db
-from app.domain.auth.security import get_password_hash
+from app.core.cache import principal_cache, product_cache, token_version_cache
+from app.core.rate_limit import auth_email_limiter, auth_ip_limiter
+from app.core.dependencies import get_current_admin, get_current_principal, get_current_user, get_db
+from app.domain.auth.schemas import Principal
+from app.domain.auth.security import decoded_token_cache, get_password_hash
 from app.domain.carts.models import MstCart
 from app.domain.expeditions.models import MstExpeditionService
 from app.domain.products.models import MstProduct, TrnProductStock
@@ -33,6 +38,21 @@ def anyio_backend():
     return "asyncio"
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def clear_caches():
+    await product_cache.clear()
+    await principal_cache.clear()
+    await token_version_cache.clear()
+    decoded_token_cache.clear()
+    await auth_ip_limiter.clear()
+    await auth_email_limiter.clear()
+    yield
+    await product_cache.clear()
+    await principal_cache.clear()
+    await token_version_cache.clear()
+    decoded_token_cache.clear()
+
+
 @pytest_asyncio.fixture
 async def engine():
     engine = create_async_engine(
@@ -41,6 +61,12 @@ async def engine():
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
+
+    # SQLite leaves foreign keys (and their ON DELETE rules) off by default
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
     yield engine
@@ -55,6 +81,52 @@ async def db_session(engine):
         await session.rollback()
 
 
+LARGE_TABLES = {
+    "mst_carts",
+    "mst_product",
+    "mst_transactions",
+    "mst_users",
+    "trn_product_stock",
+    "trn_stock_movement",
+    "trn_stock_reservation",
+    "trn_transaction_items",
+    "trn_transaction_status",
+}
+
+
+@pytest_asyncio.fixture
+async def assert_uses_indexes(engine):
+    # runs EXPLAIN QUERY PLAN on every statement a repository call issues and
+    # fails when one of them scans a large table without an index. This is
+    # SQLite's planner on a handful of rows: it proves a usable index exists
+    # for each predicate and sort, not that Postgres will pick it on real
+    # data volumes; check those plans with EXPLAIN ANALYZE on a seeded database
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if re.match(r"\s*(SELECT|UPDATE|DELETE)\b", statement, re.IGNORECASE):
+            statements.append((statement, parameters))
+
+    async def _assert_uses_indexes(call):
+        statements.clear()
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            result = await call
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                plan = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+                for *_, detail in plan.all():
+                    scan = re.match(r"SCAN (\w+)(.*)", detail)
+                    assert not (scan and scan.group(1) in LARGE_TABLES and "INDEX" not in scan.group(2)), (
+                        f"{detail}\n{statement}"
+                    )
+        return result
+
+    return _assert_uses_indexes
+
+
 @pytest_asyncio.fixture
 async def user_factory(db_session: AsyncSession):
     async def _create_user(*, role: UserRole = UserRole.USER, email: Optional[str] = None, password: str = "password123") -> MstUser:
@@ -88,11 +160,15 @@ async def app(db_session: AsyncSession, regular_user: MstUser, admin_user: MstUs
     async def override_get_current_user():
         return regular_user
 
+    async def override_get_current_principal():
+        return Principal(id_user=regular_user.id_user, role=regular_user.role, token_version=regular_user.token_version)
+
     async def override_get_current_admin():
-        return admin_user
+        return Principal(id_user=admin_user.id_user, role=admin_user.role, token_version=admin_user.token_version)
 
     fastapi_app.dependency_overrides[get_db] = override_get_db
     fastapi_app.dependency_overrides[get_current_user] = override_get_current_user
+    fastapi_app.dependency_overrides[get_current_principal] = override_get_current_principal
     fastapi_app.dependency_overrides[get_current_admin] = override_get_current_admin
 
     yield fastapi_app
@@ -1,4 +1,13 @@
 import pytest
+from datetime import datetime
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.core.dependencies import get_current_principal
+from app.core.rate_limit import _parse_networks, auth_email_limiter, auth_ip_limiter, resolve_client_ip
+from app.domain.auth.repositories import TokenRepository
+from app.domain.auth.revocation import token_revocations
+from app.domain.users.models import UserRole
 
 
 @pytest.mark.asyncio
@@ -22,3 +31,125 @@ async def test_register_and_login(client):
     assert login_resp.status_code == 200
     login_body = login_resp.json()
     assert login_body["data"]["access_token"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_and_revoke_tokens(client, db_session):
+    await client.post(
+        "/api/v1/auth/register",
+        json={"email": "tokens@example.com", "password": "pass1234", "name": "Tokens", "role": "user", "profile_picture": None},
+    )
+    login_resp = await client.post("/api/v1/auth/login", json={"email": "tokens@example.com", "password": "pass1234"})
+    tokens = login_resp.json()["data"]
+
+    principal = await get_current_principal(
+        HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens["access_token"]), db_session
+    )
+    assert principal.role == UserRole.USER
+
+    refresh_resp = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refresh_resp.status_code == 200
+    assert refresh_resp.json()["data"]["access_token"]
+
+    wrong_type_resp = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["access_token"]})
+    assert wrong_type_resp.status_code == 401
+
+    revoke_resp = await client.post(f"/api/v1/users/{principal.id_user}/tokens/revoke")
+    assert revoke_resp.status_code == 200
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_principal(
+            HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens["access_token"]), db_session
+        )
+    assert exc_info.value.status_code == 401
+    revoked_resp = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert revoked_resp.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_access_and_refresh_tokens(client, db_session, monkeypatch):
+    await client.post(
+        "/api/v1/auth/register",
+        json={"email": "logout@example.com", "password": "pass1234", "name": "Logout", "role": "user", "profile_picture": None},
+    )
+    login_resp = await client.post("/api/v1/auth/login", json={"email": "logout@example.com", "password": "pass1234"})
+    tokens = login_resp.json()["data"]
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens["access_token"])
+    await get_current_principal(credentials, db_session)
+
+    logout_resp = await client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert logout_resp.status_code == 200
+
+    with pytest.raises(HTTPException):
+        await get_current_principal(credentials, db_session)
+    refresh_resp = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refresh_resp.status_code == 401
+
+    revoked = await TokenRepository(db_session).get_revoked_tokens(datetime.utcnow())
+    assert len(revoked) == 2
+
+    # another worker whose filter has not caught up yet
+    monkeypatch.setattr(token_revocations, "is_revoked", lambda jti: False)
+    again_resp = await client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers={"Authorization": f"Bearer {tokens['access_token']}"},
+    )
+    assert again_resp.status_code == 200
+    stale_refresh = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert stale_refresh.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_logout_ignores_another_users_refresh_token(client):
+    for email in ("owner@example.com", "intruder@example.com"):
+        await client.post(
+            "/api/v1/auth/register",
+            json={"email": email, "password": "pass1234", "name": "User", "role": "user", "profile_picture": None},
+        )
+    owner = (await client.post("/api/v1/auth/login", json={"email": "owner@example.com", "password": "pass1234"})).json()["data"]
+    intruder = (await client.post("/api/v1/auth/login", json={"email": "intruder@example.com", "password": "pass1234"})).json()["data"]
+
+    logout_resp = await client.post(
+        "/api/v1/auth/logout",
+        json={"refresh_token": owner["refresh_token"]},
+        headers={"Authorization": f"Bearer {intruder['access_token']}"},
+    )
+    assert logout_resp.status_code == 200
+
+    refresh_resp = await client.post("/api/v1/auth/refresh", json={"refresh_token": owner["refresh_token"]})
+    assert refresh_resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_login_is_rate_limited_per_email_and_ip(client, monkeypatch):
+    monkeypatch.setattr(auth_email_limiter, "capacity", 2)
+    monkeypatch.setattr(auth_ip_limiter, "capacity", 4)
+
+    for _ in range(2):
+        resp = await client.post("/api/v1/auth/login", json={"email": "victim@example.com", "password": "guess"})
+        assert resp.status_code == 401
+    limited = await client.post("/api/v1/auth/login", json={"email": "victim@example.com", "password": "guess"})
+    assert limited.status_code == 429
+    assert limited.json()["meta"]["error_code"] == "RATE_LIMITED"
+    assert int(limited.headers["retry-after"]) >= 1
+
+    other = await client.post("/api/v1/auth/login", json={"email": "other@example.com", "password": "guess"})
+    assert other.status_code == 401
+    blocked_ip = await client.post("/api/v1/auth/login", json={"email": "third@example.com", "password": "guess"})
+    assert blocked_ip.status_code == 429
+
+
+def test_client_ip_is_read_from_trusted_proxies_only():
+    proxies = _parse_networks("10.0.0.0/8, 192.168.1.5")
+
+    assert resolve_client_ip("203.0.113.9", "198.51.100.1", proxies) == "203.0.113.9"
+    assert resolve_client_ip("10.0.0.2", "198.51.100.1", proxies) == "198.51.100.1"
+    # a spoofed left-most entry is ignored, and proxy hops are skipped
+    assert resolve_client_ip("10.0.0.2", "1.1.1.1, 198.51.100.1, 192.168.1.5", proxies) == "198.51.100.1"
+    assert resolve_client_ip("10.0.0.2", None, proxies) == "10.0.0.2"
+    assert resolve_client_ip(None, "198.51.100.1", proxies) == "unknown"
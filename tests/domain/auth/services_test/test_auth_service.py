@@ -1,7 +1,9 @@
+import asyncio
 import pytest
 
+from app.domain.auth.repositories import TokenRepository
 from app.domain.auth.service import AuthService
-from app.domain.auth.security import get_password_hash
+from app.domain.auth.security import PasswordHasher, PasswordHasherBusyError, get_password_hash
 from app.domain.users.repositories import UserRepository
 from app.domain.users.schemas import UserLogin
 from app.domain.users.models import UserRole
@@ -18,7 +20,7 @@ async def test_authenticate_user_success(db_session):
         hashed_password=get_password_hash("secret"),
     )
 
-    service = AuthService(repo)
+    service = AuthService(repo, TokenRepository(db_session))
     user = await service.authenticate_user(UserLogin(email="auth@example.com", password="secret"))
 
     assert user is not None
@@ -28,7 +30,7 @@ async def test_authenticate_user_success(db_session):
 @pytest.mark.asyncio
 async def test_authenticate_user_failure(db_session):
     repo = UserRepository(db_session)
-    service = AuthService(repo)
+    service = AuthService(repo, TokenRepository(db_session))
 
     user = await service.authenticate_user(UserLogin(email="missing@example.com", password="bad"))
     assert user is None
@@ -38,8 +40,22 @@ async def test_authenticate_user_failure(db_session):
 async def test_create_token(db_session, user_factory):
     user = await user_factory(email="token@example.com")
     repo = UserRepository(db_session)
-    service = AuthService(repo)
+    service = AuthService(repo, TokenRepository(db_session))
 
     token = service.create_token(str(user.id_user))
     assert isinstance(token, str)
     assert token
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_runs_off_loop_and_bounds_queue():
+    hasher = PasswordHasher(max_workers=2, max_pending=2)
+    hashed = await hasher.hash("secret")
+
+    results = await asyncio.gather(hasher.verify("secret", hashed), hasher.verify("wrong", hashed))
+    assert results == [True, False]
+    assert hasher.stats()["completed"] == 3
+
+    with pytest.raises(PasswordHasherBusyError):
+        await asyncio.gather(*(hasher.verify("secret", hashed) for _ in range(3)))
+    assert hasher.stats()["rejected"] == 1
@@ -0,0 +1,47 @@
+import time
+import pytest
+from datetime import timedelta
+import jwt
+
+from app.domain.auth.security import (
+    DecodedTokenCache,
+    create_access_token,
+    decode_token,
+    decoded_token_cache,
+)
+
+
+def test_decode_token_serves_repeat_lookups_from_cache():
+    token = create_access_token("user-1", role="user", token_version=3)
+
+    first = decode_token(token, "access")
+    second = decode_token(token, "access")
+
+    assert first == second
+    assert second["sub"] == "user-1"
+    assert decoded_token_cache.stats()["hits"] == 1
+    assert decoded_token_cache.stats()["misses"] == 1
+
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_token(token, "refresh")
+
+
+def test_decoded_token_cache_honours_exp_and_bound():
+    cache = DecodedTokenCache(max_entries=2)
+    cache.set("expired", {"sub": "a", "exp": int(time.time()) - 1})
+    cache.set("no-exp", {"sub": "b"})
+    assert cache.get("expired") is None
+    assert cache.get("no-exp") is None
+
+    for name in ("a", "b", "c"):
+        cache.set(name, {"sub": name, "exp": int(time.time()) + 60})
+    assert cache.get("a") is None
+    assert cache.get("c")["sub"] == "c"
+    assert cache.stats()["entries"] == 2
+
+
+def test_expired_token_is_rejected_after_cache_entry_lapses():
+    token = create_access_token("user-1", expires_delta=timedelta(seconds=-1))
+    with pytest.raises(jwt.InvalidTokenError):
+        decode_token(token, "access")
+    assert decoded_token_cache.stats()["entries"] == 0
@@ -0,0 +1,19 @@
+from datetime import datetime, timedelta
+
+from app.domain.auth.revocation import TokenRevocationFilter
+
+
+def test_revocation_filter_checks_and_prunes():
+    now = datetime.utcnow()
+    revocations = TokenRevocationFilter(size_bits=1024, hashes=3)
+    revocations.load([("live", now + timedelta(minutes=5)), ("stale", now - timedelta(minutes=1))], now)
+
+    assert revocations.is_revoked("live")
+    assert revocations.is_revoked("stale")
+    assert not revocations.is_revoked("other")
+    assert not revocations.is_revoked(None)
+
+    assert revocations.prune(now) == 1
+    assert not revocations.is_revoked("stale")
+    assert revocations.is_revoked("live")
+    assert len(revocations) == 1
@@ -1,6 +1,9 @@
+import uuid
 import pytest
 
-from tests.factories import create_product
+from app.domain.products.repositories import ProductRepository
+from app.domain.carts.repositories import CartRepository
+from tests.factories import create_cart_item, create_product
 
 
 @pytest.mark.asyncio
@@ -27,3 +30,153 @@ async def test_cart_endpoints_flow(client, db_session, regular_user):
 
     empty_resp = await client.delete("/api/v1/carts/empty")
     assert empty_resp.status_code in (200, 404)
+
+
+@pytest.mark.asyncio
+async def test_cart_items_hold_stock(client, db_session):
+    product = await create_product(db_session, price=10, stock=4)
+    product_id = str(product.id_product)
+
+    negative_resp = await client.post("/api/v1/carts/", params={"product_id": product_id, "quantity": -5})
+    assert negative_resp.status_code == 422
+
+    create_resp = await client.post("/api/v1/carts/", params={"product_id": product_id, "quantity": 3})
+    assert create_resp.status_code == 201
+    cart_id = create_resp.json()["data"]["id"]
+
+    detail_resp = await client.get(f"/api/v1/products/{product_id}")
+    assert detail_resp.json()["data"]["stock"] == 1
+
+    over_resp = await client.put(f"/api/v1/carts/{cart_id}", params={"quantity": 5})
+    assert over_resp.status_code == 400
+    assert (await client.put(f"/api/v1/carts/{cart_id}", params={"quantity": 0})).status_code == 422
+
+    shrink_resp = await client.put(f"/api/v1/carts/{cart_id}", params={"quantity": 1})
+    assert shrink_resp.status_code == 200
+    assert (await client.get(f"/api/v1/products/{product_id}")).json()["data"]["stock"] == 3
+
+    delete_resp = await client.delete("/api/v1/carts/item", params={"product_id": product_id})
+    assert delete_resp.status_code == 200
+    assert (await client.get(f"/api/v1/products/{product_id}")).json()["data"]["stock"] == 4
+
+
+@pytest.mark.asyncio
+async def test_adding_same_product_merges_cart_line(client, db_session):
+    product = await create_product(db_session, price=10, stock=5)
+    product_id = str(product.id_product)
+
+    first = await client.post("/api/v1/carts/", params={"product_id": product_id, "quantity": 2})
+    second = await client.post("/api/v1/carts/", params={"product_id": product_id, "quantity": 2})
+    assert second.json()["data"]["id"] == first.json()["data"]["id"]
+    assert second.json()["data"]["quantity"] == 4
+
+    over = await client.post("/api/v1/carts/", params={"product_id": product_id, "quantity": 2})
+    assert over.status_code == 400
+    missing = await client.post("/api/v1/carts/", params={"product_id": str(uuid.uuid4()), "quantity": 1})
+    assert missing.status_code == 404
+
+    list_resp = await client.get("/api/v1/carts")
+    assert list_resp.json()["pagination"]["total"] == 1
+
+
+@pytest.mark.asyncio
+async def test_patch_cart_applies_operations_atomically(client, db_session):
+    apple = await create_product(db_session, price=10, stock=5)
+    pear = await create_product(db_session, price=20, stock=5)
+    plum = await create_product(db_session, price=30, stock=1)
+    apple_id, pear_id, plum_id = str(apple.id_product), str(pear.id_product), str(plum.id_product)
+    await client.post("/api/v1/carts/", params={"product_id": pear_id, "quantity": 2})
+
+    resp = await client.patch(
+        "/api/v1/carts/",
+        json={"operations": [
+            {"op": "add", "product_id": apple_id, "quantity": 1},
+            {"op": "add", "product_id": apple_id, "quantity": 2},
+            {"op": "remove", "product_id": pear_id},
+            {"op": "set", "product_id": plum_id, "quantity": 1},
+        ]},
+    )
+    assert resp.status_code == 200
+    lines = {line["product_id"]: line for line in resp.json()["data"]}
+    assert set(lines) == {apple_id, plum_id}
+    assert (lines[apple_id]["quantity"], lines[apple_id]["price_at_time"]) == (3, 30)
+    assert (await client.get(f"/api/v1/products/{apple_id}")).json()["data"]["stock"] == 2
+    assert (await client.get(f"/api/v1/products/{pear_id}")).json()["data"]["stock"] == 5
+
+    failed = await client.patch(
+        "/api/v1/carts/",
+        json={"operations": [
+            {"op": "set", "product_id": apple_id, "quantity": 1},
+            {"op": "add", "product_id": plum_id, "quantity": 1},
+        ]},
+    )
+    assert failed.status_code == 400
+    assert (await client.get(f"/api/v1/products/{apple_id}")).json()["data"]["stock"] == 2
+    carts = (await client.get("/api/v1/carts")).json()["data"]
+    assert {line["product_id"]: line["quantity"] for line in carts} == {apple_id: 3, plum_id: 1}
+
+    missing = await client.patch(
+        "/api/v1/carts/", json={"operations": [{"op": "add", "product_id": str(uuid.uuid4()), "quantity": 1}]}
+    )
+    assert missing.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_read_carts_expanded_with_products_and_totals(client, db_session, regular_user):
+    lamp = await create_product(db_session, price=10, stock=5)
+    desk = await create_product(db_session, price=40, stock=1)
+    await client.post("/api/v1/carts/", params={"product_id": str(lamp.id_product), "quantity": 2})
+    await client.post("/api/v1/carts/", params={"product_id": str(desk.id_product), "quantity": 1})
+    # a line whose hold has gone and whose stock was sold meanwhile
+    await ProductRepository(db_session).release_holds(regular_user.id_user, desk.id_product)
+    await client.put("/api/v1/products/stock/bulk", json=[{"product_id": str(desk.id_product), "stock": 0}])
+
+    resp = await client.get("/api/v1/carts", params={"expand": "product"})
+    assert resp.status_code == 200
+    body = resp.json()
+    lines = {item["product_id"]: item for item in body["data"]["items"]}
+    assert lines[str(lamp.id_product)]["product"]["name"] == lamp.name
+    assert lines[str(lamp.id_product)]["product"]["stock"] == 3
+    assert lines[str(lamp.id_product)]["stock_shortfall"] is False
+    assert lines[str(desk.id_product)]["stock_shortfall"] is True
+    assert body["data"]["totals"] == {"lines": 2, "quantity": 3, "total": 60, "current_total": 60}
+    assert body["pagination"]["total"] == 2
+
+    plain = await client.get("/api/v1/carts")
+    assert isinstance(plain.json()["data"], list)
+    assert (await client.get("/api/v1/carts", params={"expand": "user"})).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_guest_cart_is_merged_at_login(client, db_session, user_factory):
+    tea = await create_product(db_session, price=5, stock=10)
+    cup = await create_product(db_session, price=8, stock=1)
+    tea_id, cup_id = str(tea.id_product), str(cup.id_product)
+
+    guest = await client.patch(
+        "/api/v1/carts/guest",
+        json={"operations": [
+            {"op": "add", "product_id": tea_id, "quantity": 3},
+            {"op": "add", "product_id": cup_id, "quantity": 2},
+        ]},
+    )
+    assert guest.status_code == 200
+    token = guest.json()["data"]["token"]
+    guest = await client.patch(
+        "/api/v1/carts/guest", json={"token": token, "operations": [{"op": "add", "product_id": tea_id, "quantity": 1}]}
+    )
+    token = guest.json()["data"]["token"]
+    read = await client.get("/api/v1/carts/guest", headers={"x-guest-cart": token})
+    assert {item["product_id"]: item["quantity"] for item in read.json()["data"]["items"]} == {tea_id: 4, cup_id: 2}
+    assert (await client.get("/api/v1/carts/guest", headers={"x-guest-cart": "bogus"})).status_code == 400
+
+    user = await user_factory(email="shopper@example.com")
+    await create_cart_item(db_session, user_id=user.id_user, product_id=tea.id_product, quantity=1, price_at_time=5)
+    login = await client.post(
+        "/api/v1/auth/login", json={"email": "shopper@example.com", "password": "password123", "guest_cart": token}
+    )
+    assert login.status_code == 200
+    assert login.json()["data"]["guest_cart"] == {"merged": [tea_id], "skipped": [cup_id]}
+
+    carts = await CartRepository(db_session).get_carts_by_user_id(user.id_user)
+    assert [(cart.quantity, cart.price_at_time) for cart in carts] == [(5, 25)]
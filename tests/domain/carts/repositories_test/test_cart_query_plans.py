@@ -0,0 +1,30 @@
+import pytest
+from datetime import datetime
+
+from app.domain.carts.repositories import CartRepository
+from app.utils.pagination import decode_cursor, next_cursor
+from tests.factories import create_cart_item, create_product
+
+
+@pytest.mark.asyncio
+async def test_cart_queries_use_indexes(db_session, user_factory, assert_uses_indexes):
+    """Cart queries have a usable index under SQLite's planner (see assert_uses_indexes)."""
+    user = await user_factory()
+    other = await user_factory()
+    product = await create_product(db_session, stock=50)
+    second = await create_product(db_session, stock=50)
+    for owner, item in ((user, product), (other, product), (other, second)):
+        await create_cart_item(db_session, user_id=owner.id_user, product_id=item.id_product)
+    repo = CartRepository(db_session)
+
+    carts = await assert_uses_indexes(repo.get_carts_by_user_id(user.id_user, limit=1))
+    cursor = decode_cursor(next_cursor(carts, 1, "created_at", "id_cart"))
+    await assert_uses_indexes(repo.get_carts_by_user_id(user.id_user, limit=1, cursor=cursor))
+    await assert_uses_indexes(repo.count_carts_by_user_id(user.id_user))
+    await assert_uses_indexes(repo.get_carts_by_user_id(other.id_user, limit=1, expand_product=True))
+    await assert_uses_indexes(repo.get_cart_totals(other.id_user))
+    await assert_uses_indexes(repo.add_cart_item(user.id_user, product.id_product, 1))
+    await assert_uses_indexes(repo.delete_cart_each_item(user.id_user, product.id_product))
+    _, after = await assert_uses_indexes(repo.delete_abandoned_carts(datetime.utcnow(), 1))
+    await assert_uses_indexes(repo.delete_abandoned_carts(datetime.utcnow(), 1, after))
+    await assert_uses_indexes(repo.empty_cart_by_user_id(other.id_user))
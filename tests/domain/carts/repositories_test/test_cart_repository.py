@@ -1,6 +1,9 @@
+import uuid
+from datetime import datetime, timedelta
 import pytest
 
 from app.domain.carts.repositories import CartRepository
+from app.domain.products.repositories import ProductRepository
 from tests.factories import create_product
 
 
@@ -31,7 +34,7 @@ async def test_update_and_delete_cart_item(db_session, user_factory):
     assert updated.price_at_time == 60
 
     deleted = await repo.delete_cart_each_item(user.id_user, product.id_product)
-    assert deleted is True
+    assert deleted == 1
 
 
 @pytest.mark.asyncio
@@ -45,7 +48,74 @@ async def test_empty_cart_by_user(db_session, user_factory):
     await repo.create_cart(user.id_user, product2.id_product, quantity=2, price_at_time=30)
 
     result = await repo.empty_cart_by_user_id(user.id_user)
-    assert result is True
+    assert result == 2
 
     carts_after = await repo.get_carts_by_user_id(user.id_user)
     assert carts_after == []
+
+
+@pytest.mark.asyncio
+async def test_add_cart_item_merges_lines(db_session, user_factory):
+    user = await user_factory()
+    product = await create_product(db_session, price=15, stock=10)
+    repo = CartRepository(db_session)
+
+    first = await repo.add_cart_item(user.id_user, product.id_product, 2)
+    first_id, first_price = first.id_cart, first.price_at_time
+    second = await repo.add_cart_item(user.id_user, product.id_product, 3)
+
+    assert first_price == 30
+    assert second.id_cart == first_id
+    assert second.quantity == 5
+    assert second.price_at_time == 75
+    assert len(await repo.get_carts_by_user_id(user.id_user)) == 1
+    assert await repo.add_cart_item(user.id_user, uuid.uuid4(), 1) is None
+
+
+@pytest.mark.asyncio
+async def test_delete_abandoned_carts_in_keyset_batches(db_session, user_factory):
+    user = await user_factory()
+    repo = CartRepository(db_session)
+    now = datetime.utcnow()
+    for age_days in (40, 35, 31, 1):
+        product = await create_product(db_session, price=10, stock=5)
+        cart = await repo.create_cart(user.id_user, product.id_product, quantity=1, price_at_time=10)
+        cart.updated_at = now - timedelta(days=age_days)
+    await db_session.commit()
+    cutoff = now - timedelta(days=30)
+
+    deleted, after = await repo.delete_abandoned_carts(cutoff, 2)
+    assert deleted == 2
+    deleted, after = await repo.delete_abandoned_carts(cutoff, 2, after)
+    assert deleted == 1
+    assert await repo.delete_abandoned_carts(cutoff, 2, after) == (0, None)
+    assert len(await repo.get_carts_by_user_id(user.id_user)) == 1
+
+
+@pytest.mark.asyncio
+async def test_price_change_reprices_carts_in_batches(db_session, user_factory):
+    user = await user_factory()
+    other = await user_factory()
+    cheap = await create_product(db_session, price=10, stock=10)
+    dear = await create_product(db_session, price=20, stock=10)
+    repo = CartRepository(db_session)
+    product_repo = ProductRepository(db_session)
+    stale = datetime.utcnow() - timedelta(days=3)
+    for owner, product, quantity in ((user, cheap, 2), (other, cheap, 3), (user, dear, 1)):
+        cart = await repo.create_cart(owner.id_user, product.id_product, quantity=quantity, price_at_time=0)
+        cart.updated_at = stale
+    await db_session.commit()
+
+    await product_repo.update_product(cheap.id_product, price=12)
+    await product_repo.update_product(cheap.id_product, price=15)
+    await product_repo.update_product(dear.id_product, name="renamed")
+
+    claimed = await product_repo.claim_price_changes(10)
+    assert claimed == [cheap.id_product]
+    assert await repo.reprice_carts(claimed) == 2
+    assert await product_repo.claim_price_changes(10) == []
+
+    lines = {cart.id_product: cart for cart in await repo.get_carts_by_user_id(user.id_user)}
+    assert lines[cheap.id_product].price_at_time == 30
+    assert lines[cheap.id_product].updated_at == stale
+    assert lines[dear.id_product].price_at_time == 0
@@ -0,0 +1,18 @@
+import uuid
+import pytest
+
+from app.core.config import settings
+from app.domain.carts.guest import InvalidGuestCartError, decode_guest_cart, encode_guest_cart
+
+
+def test_guest_cart_token_round_trip_and_tamper():
+    lines = {uuid.uuid4(): 2, uuid.uuid4(): 1}
+    token = encode_guest_cart(lines)
+
+    assert decode_guest_cart(token) == lines
+    assert decode_guest_cart(None) == {}
+    header, payload, signature = token.split(".")
+    with pytest.raises(InvalidGuestCartError):
+        decode_guest_cart(f"{header}.{payload}.{signature[:-2]}AA")
+    with pytest.raises(InvalidGuestCartError):
+        encode_guest_cart({uuid.uuid4(): 1 for _ in range(settings.guest_cart_max_lines + 1)})
@@ -25,7 +25,7 @@ async def test_update_and_delete_expedition_service(db_session):
     assert updated.name == "NewName"
 
     deleted = await repo.delete_expedition_service(service.id_expedition_service)
-    assert deleted is True
+    assert deleted == 1
 
     missing = await repo.get_expedition_service_by_id(service.id_expedition_service)
     assert missing is None
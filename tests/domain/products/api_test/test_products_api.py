@@ -1,4 +1,5 @@
 import pytest
+import uuid
 
 
 @pytest.mark.asyncio
@@ -30,3 +31,107 @@ async def test_product_crud_flow(client):
 
     delete_resp = await client.delete(f"/api/v1/products/{product_id}")
     assert delete_resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_product_stock_slots_flow(client):
+    create_resp = await client.post(
+        "/api/v1/products/",
+        data={"name": "Flash", "price": "10", "stock": "7"},
+    )
+    product_id = create_resp.json()["data"]["id"]
+
+    slots_resp = await client.put(f"/api/v1/products/{product_id}/stock/slots", params={"slots": 3})
+    assert slots_resp.status_code == 200
+    assert slots_resp.json()["data"]["slots"] == [3, 2, 2]
+
+    invalid_resp = await client.put(f"/api/v1/products/{product_id}/stock/slots", params={"slots": 0})
+    assert invalid_resp.status_code == 422
+    too_many_resp = await client.put(f"/api/v1/products/{product_id}/stock/slots", params={"slots": 1_000_000})
+    assert too_many_resp.status_code == 422
+
+    rebalance_resp = await client.post(f"/api/v1/products/{product_id}/stock/rebalance")
+    assert rebalance_resp.status_code == 200
+    assert rebalance_resp.json()["data"]["stock"] == 7
+
+    detail_resp = await client.get(f"/api/v1/products/{product_id}")
+    assert detail_resp.json()["data"]["stock"] == 7
+
+
+@pytest.mark.asyncio
+async def test_bulk_update_product_stock(client):
+    create_resp = await client.post(
+        "/api/v1/products/",
+        data={"name": "Crate", "price": "10", "stock": "10"},
+    )
+    product_id = create_resp.json()["data"]["id"]
+    await client.put(f"/api/v1/products/{product_id}/stock/slots", params={"slots": 2})
+    missing_id = str(uuid.uuid4())
+
+    bulk_resp = await client.put(
+        "/api/v1/products/stock/bulk",
+        json=[
+            {"product_id": product_id, "stock": 20},
+            {"product_id": product_id, "delta": -5},
+            {"product_id": product_id, "delta": -50},
+            {"product_id": missing_id, "delta": 3},
+            {"product_id": product_id},
+        ],
+    )
+    assert bulk_resp.status_code == 200
+    results = bulk_resp.json()["data"]
+    assert [r["status"] for r in results] == ["updated", "updated", "insufficient_stock", "not_found", "invalid"]
+    assert results[1]["stock"] == 15
+
+    ndjson = f'{{"product_id": "{product_id}", "delta": 5}}\n\nnot json\n{{"product_id": "{product_id}", "stock": 4}}'
+    stream_resp = await client.put(
+        "/api/v1/products/stock/bulk",
+        content=ndjson,
+        headers={"content-type": "application/x-ndjson"},
+    )
+    assert [r["status"] for r in stream_resp.json()["data"]] == ["updated", "invalid", "updated"]
+
+    detail_resp = await client.get(f"/api/v1/products/{product_id}")
+    assert detail_resp.json()["data"]["stock"] == 4
+
+    invalid_resp = await client.put("/api/v1/products/stock/bulk", json={"product_id": product_id})
+    assert invalid_resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_product_cache_stats(client):
+    create_resp = await client.post(
+        "/api/v1/products/",
+        data={"name": "Lamp", "price": "30", "stock": "2"},
+    )
+    product_id = create_resp.json()["data"]["id"]
+    await client.get(f"/api/v1/products/{product_id}")
+    await client.get(f"/api/v1/products/{product_id}")
+
+    stats_resp = await client.get("/api/v1/products/cache/stats")
+    assert stats_resp.status_code == 200
+    assert stats_resp.json()["data"]["hits"] == 1
+    assert stats_resp.json()["data"]["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_list_products_by_cursor(client):
+    for name in ("Alpha", "Beta", "Gamma"):
+        await client.post("/api/v1/products/", data={"name": name, "price": "1", "stock": "1"})
+
+    first_resp = await client.get("/api/v1/products", params={"limit": 2})
+    first_page = first_resp.json()
+    assert len(first_page["data"]) == 2
+    assert first_page["pagination"]["total"] == 3
+    assert first_page["pagination"]["total_is_estimate"] is False
+    cursor = first_page["pagination"]["next_cursor"]
+    assert cursor
+
+    second_resp = await client.get("/api/v1/products", params={"limit": 2, "cursor": cursor})
+    second_page = second_resp.json()
+    assert [p["name"] for p in second_page["data"]] == ["Gamma"]
+    assert second_page["pagination"]["next_cursor"] is None
+
+    invalid_resp = await client.get("/api/v1/products", params={"cursor": "not-a-cursor"})
+    assert invalid_resp.status_code == 400
+    assert invalid_resp.json()["meta"]["error_code"] == "INVALID_CURSOR"
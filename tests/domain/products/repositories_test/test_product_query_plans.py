@@ -0,0 +1,29 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app.core.cache import Cache, MemoryCacheBackend
+from app.domain.products.repositories import ProductRepository
+from app.utils.pagination import decode_cursor, next_cursor
+from tests.factories import create_product
+
+
+@pytest.mark.asyncio
+async def test_product_queries_use_indexes(db_session, user_factory, assert_uses_indexes):
+    """Product queries have a usable index under SQLite's planner (see assert_uses_indexes)."""
+    user = await user_factory()
+    products = [await create_product(db_session, stock=20) for _ in range(3)]
+    product_id = products[0].id_product
+    repo = ProductRepository(db_session, cache=Cache(MemoryCacheBackend(max_entries=0), ttl_seconds=0))
+
+    await assert_uses_indexes(repo.get_product_by_id(product_id))
+    await assert_uses_indexes(repo.get_products_by_ids([product.id_product for product in products]))
+    page = await assert_uses_indexes(repo.get_all_products(limit=2))
+    cursor = decode_cursor(next_cursor(page, 2, "created_at", "id_product"))
+    await assert_uses_indexes(repo.get_all_products(limit=2, cursor=cursor))
+    await assert_uses_indexes(repo.decrement_products_stock({product_id: 1}))
+    expires_at = datetime.utcnow() + timedelta(minutes=5)
+    await assert_uses_indexes(repo.hold_product_stock(user.id_user, product_id, 2, expires_at))
+    await assert_uses_indexes(repo.release_holds(user.id_user, product_id, 1))
+    await assert_uses_indexes(repo.update_product_stock(product_id, 30))
+    await assert_uses_indexes(repo.get_stock_movements(product_id))
+    await assert_uses_indexes(repo.get_ledger_stock(product_id))
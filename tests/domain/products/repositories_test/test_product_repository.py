@@ -1,7 +1,14 @@
 import pytest
 import uuid
+from datetime import datetime, timedelta
 
+from sqlalchemy import func, select
+
+from app.core.cache import Cache, MemoryCacheBackend
+from app.domain.carts.models import MstCart
+from app.domain.products.models import StockMovementKind, TrnProductStock, TrnStockMovement, TrnStockReservation
 from app.domain.products.repositories import ProductRepository
+from tests.factories import create_cart_item, create_product
 
 
 @pytest.mark.asyncio
@@ -59,7 +66,255 @@ async def test_get_all_and_delete_product(db_session):
     assert len(products) == 2
 
     delete_result = await repo.delete_product(products[0].id_product)
-    assert delete_result is True
+    assert delete_result == 1
 
     remaining = await repo.get_all_products(limit=10, offset=0)
     assert len(remaining) == 1
+
+
+@pytest.mark.asyncio
+async def test_decrement_product_stock_is_conditional(db_session):
+    repo = ProductRepository(db_session)
+    product = await repo.create_product(name="Pen", description=None, price=5, stock=3, product_image_url=None)
+
+    assert await repo.decrement_product_stock(product.id_product, 2) == 1
+    assert await repo.decrement_product_stock(product.id_product, 2) is None
+    assert await repo.decrement_product_stock(uuid.uuid4(), 1) is None
+
+    fetched = await repo.get_product_by_id(product.id_product)
+    assert getattr(fetched, "stock", None) == 1
+
+
+@pytest.mark.asyncio
+async def test_decrement_products_stock_is_all_or_nothing(db_session):
+    repo = ProductRepository(db_session)
+    first = await repo.create_product(name="C", description=None, price=10, stock=4, product_image_url=None)
+    second = await repo.create_product(name="D", description=None, price=20, stock=1, product_image_url=None)
+    first_id, second_id = first.id_product, second.id_product
+
+    assert await repo.decrement_products_stock({first_id: 2, second_id: 2}) is None
+    remaining = await repo.decrement_products_stock({first_id: 3, second_id: 1})
+    assert remaining == {first_id: 1, second_id: 0}
+
+    products = await repo.get_products_by_ids([first_id, second_id])
+    assert getattr(products[first_id], "stock", None) == 1
+    assert getattr(products[second_id], "stock", None) == 0
+
+
+@pytest.mark.asyncio
+async def test_sharded_stock_slots(db_session):
+    repo = ProductRepository(db_session)
+    product = await repo.create_product(name="Flash", description=None, price=10, stock=10, product_image_url=None)
+    product_id = product.id_product
+
+    slots = await repo.set_stock_slots(product_id, 4)
+    assert [slot.stock for slot in slots] == [3, 3, 2, 2]
+    assert getattr(await repo.get_product_by_id(product_id), "stock", None) == 10
+
+    # no single slot holds 5, so the decrement drains several slots
+    assert await repo.decrement_product_stock(product_id, 5) is not None
+    assert await repo.decrement_product_stock(product_id, 2) is not None
+    assert await repo.decrement_product_stock(product_id, 4) is None
+    assert getattr(await repo.get_product_by_id(product_id), "stock", None) == 3
+
+    rebalanced = await repo.rebalance_stock_slots(product_id)
+    assert [slot.stock for slot in rebalanced] == [1, 1, 1, 0]
+
+    stock = await repo.update_product_stock(product_id, 9)
+    assert stock.stock == 9
+
+    merged = await repo.set_stock_slots(product_id, 1)
+    assert [slot.stock for slot in merged] == [9]
+
+
+@pytest.mark.asyncio
+async def test_multi_product_decrement_drains_sharded_slots(db_session):
+    repo = ProductRepository(db_session)
+    plain = await repo.create_product(name="Plain", description=None, price=10, stock=4, product_image_url=None)
+    sharded = await repo.create_product(name="Sharded", description=None, price=10, stock=10, product_image_url=None)
+    plain_id, sharded_id = plain.id_product, sharded.id_product
+    await repo.set_stock_slots(sharded_id, 4)
+
+    # the sharded product needs several slots, so both fall back to per-product takes
+    assert await repo.decrement_products_stock({sharded_id: 5, plain_id: 1}) is not None
+    assert await repo.decrement_products_stock({sharded_id: 5, plain_id: 1}) is not None
+    assert await repo.decrement_products_stock({plain_id: 1, sharded_id: 1}) is None
+    assert getattr(await repo.get_product_by_id(plain_id), "stock", None) == 2
+    assert getattr(await repo.get_product_by_id(sharded_id), "stock", None) == 0
+
+
+@pytest.mark.asyncio
+async def test_stock_holds_reduce_availability_until_released(db_session, user_factory):
+    user = await user_factory()
+    user_id = user.id_user
+    repo = ProductRepository(db_session)
+    product = await repo.create_product(name="Held", description=None, price=10, stock=5, product_image_url=None)
+    product_id = product.id_product
+    later = datetime.utcnow() + timedelta(minutes=15)
+
+    assert await repo.hold_product_stock(user_id, product_id, -5, later) is None
+    assert await repo.decrement_product_stock(product_id, 0) is None
+    assert await repo.hold_product_stock(user_id, product_id, 3, later)
+    assert await repo.hold_product_stock(user_id, product_id, 3, later) is None
+    assert getattr(await repo.get_product_by_id(product_id), "stock", None) == 2
+    assert await repo.decrement_product_stock(product_id, 3) is None
+
+    assert await repo.release_holds(user_id, product_id, 1) == 1
+    assert getattr(await repo.get_product_by_id(product_id), "stock", None) == 3
+
+    assert await repo.release_expired_holds(datetime.utcnow(), 100) == 0
+    assert await repo.release_expired_holds(later + timedelta(seconds=1), 100) == 1
+    assert getattr(await repo.get_product_by_id(product_id), "stock", None) == 5
+
+
+@pytest.mark.asyncio
+async def test_release_products_holds_shrinks_several_products_at_once(db_session, user_factory):
+    user = await user_factory()
+    user_id = user.id_user
+    repo = ProductRepository(db_session)
+    first = await repo.create_product(name="First", description=None, price=10, stock=6, product_image_url=None)
+    second = await repo.create_product(name="Second", description=None, price=10, stock=6, product_image_url=None)
+    first_id, second_id = first.id_product, second.id_product
+    later = datetime.utcnow() + timedelta(minutes=15)
+    await repo.hold_products_stock(user_id, {first_id: 2, second_id: 3}, later)
+    await repo.hold_product_stock(user_id, first_id, 2, later)
+
+    assert await repo.release_products_holds(user_id, {first_id: 3, second_id: 1}) == 4
+    assert getattr(await repo.get_product_by_id(first_id), "stock", None) == 5
+    assert getattr(await repo.get_product_by_id(second_id), "stock", None) == 4
+
+    held = await db_session.execute(
+        select(TrnStockReservation.id_product, func.sum(TrnStockReservation.quantity))
+        .where(TrnStockReservation.id_user == user_id)
+        .group_by(TrnStockReservation.id_product)
+    )
+    assert dict(held.all()) == {first_id: 1, second_id: 2}
+
+
+@pytest.mark.asyncio
+async def test_stock_ledger_tracks_movements_and_snapshots(db_session):
+    repo = ProductRepository(db_session)
+    product = await repo.create_product(name="Ledger", description=None, price=10, stock=6, product_image_url=None)
+    product_id = product.id_product
+
+    await repo.decrement_product_stock(product_id, 2)
+    await repo.update_product_stock(product_id, 10)
+    await repo.restock_products({product_id: 3}, StockMovementKind.CANCELLATION)
+
+    movements = await repo.get_stock_movements(product_id)
+    assert sorted((movement.kind, movement.quantity) for movement in movements) == sorted([
+        (StockMovementKind.RESTOCK, 6),
+        (StockMovementKind.SALE, -2),
+        (StockMovementKind.ADJUSTMENT, 6),
+        (StockMovementKind.CANCELLATION, 3),
+    ])
+    assert await repo.get_ledger_stock(product_id) == 13
+    assert await repo.get_on_hand_stock(product_id) == 13
+
+    assert await repo.snapshot_stock_ledger(datetime.utcnow()) == 1
+    await repo.decrement_product_stock(product_id, 4)
+    assert await repo.get_ledger_stock(product_id) == 9
+    assert await repo.get_on_hand_stock(product_id) == 9
+
+
+@pytest.mark.asyncio
+async def test_product_reads_are_cached_until_written(db_session):
+    repo = ProductRepository(db_session, cache=Cache(MemoryCacheBackend(max_entries=100), ttl_seconds=60))
+    product = await repo.create_product(name="Kettle", description=None, price=40, stock=6, product_image_url=None)
+    product_id = product.id_product
+
+    await repo.get_product_by_id(product_id)
+    cached = await repo.get_product_by_id(product_id)
+    assert cached.name == "Kettle"
+    assert repo.cache.stats()["hits"] == 1
+
+    await repo.update_product(product_id, name="Kettle XL")
+    assert (await repo.get_product_by_id(product_id)).name == "Kettle XL"
+
+    first_page = await repo.get_all_products(limit=10, offset=0)
+    assert [p.stock for p in first_page] == [6]
+    await repo.decrement_product_stock(product_id, 2)
+    assert [p.stock for p in await repo.get_all_products(limit=10, offset=0)] == [4]
+    assert (await repo.get_product_by_id(product_id)).stock == 4
+
+    await repo.create_product(name="Mug", description=None, price=5, stock=1, product_image_url=None)
+    assert len(await repo.get_all_products(limit=10, offset=0)) == 2
+
+    # losing the generation key must not resurrect pages cached under it
+    await repo.get_all_products(limit=10, offset=0)
+    await repo.cache.backend.delete("products:page-generation")
+    await repo.update_product(product_id, price=99)
+    assert [p.price for p in await repo.get_all_products(limit=10, offset=0)][0] == 99
+
+
+@pytest.mark.asyncio
+async def test_memory_cache_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    await backend.set("a", 1, 60)
+    await backend.set("b", 2, 60)
+    await backend.get("a")
+    await backend.set("c", 3, 60)
+
+    assert await backend.get("a") == 1
+    assert await backend.get("b") is None
+    await backend.set("d", 4, -1)
+    assert await backend.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_delete_product_cascades_in_database(db_session, user_factory):
+    user = await user_factory()
+    product = await create_product(db_session, stock=5)
+    product_id = product.id_product
+    repo = ProductRepository(db_session)
+    await repo.hold_product_stock(user.id_user, product_id, 2, datetime.utcnow() + timedelta(minutes=5))
+    await create_cart_item(db_session, user_id=user.id_user, product_id=product_id, quantity=2)
+    db_session.expunge_all()
+
+    assert await repo.delete_product(product_id) == 1
+    assert await repo.delete_product(product_id) == 0
+    for model in (MstCart, TrnProductStock, TrnStockReservation):
+        assert await db_session.scalar(select(func.count()).select_from(model).where(model.id_product == product_id)) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_product_keeps_stock_ledger(db_session):
+    product = await create_product(db_session, stock=5)
+    product_id = product.id_product
+    repo = ProductRepository(db_session)
+
+    await repo.decrement_product_stock(product_id, 2)
+    assert await repo.delete_product(product_id) == 1
+    movements = select(func.count()).select_from(TrnStockMovement).where(TrnStockMovement.id_product == product_id)
+    assert await db_session.scalar(movements) == 2
+
+
+@pytest.mark.asyncio
+async def test_absolute_stock_cannot_drop_below_held_units(db_session, user_factory):
+    user = await user_factory()
+    repo = ProductRepository(db_session)
+    product = await repo.create_product(name="Held", description=None, price=10, stock=6, product_image_url=None)
+    product_id = product.id_product
+    await repo.set_stock_slots(product_id, 2)
+    await repo.hold_product_stock(user.id_user, product_id, 5, datetime.utcnow() + timedelta(minutes=5))
+
+    results = await repo.bulk_update_product_stock([{"id_product": product_id, "stock": 0, "delta": None}])
+    assert results == [{"status": "below_reserved", "stock": 6}]
+    assert all(slot.stock >= slot.reserved for slot in await repo.get_stock_slots(product_id))
+
+
+@pytest.mark.asyncio
+async def test_uncommitted_stock_writes_invalidate_after_commit(db_session, user_factory):
+    user = await user_factory()
+    repo = ProductRepository(db_session)
+    product = await repo.create_product(name="Lamp", description=None, price=10, stock=5, product_image_url=None)
+    product_id = product.id_product
+    assert (await repo.get_product_by_id(product_id)).stock == 5
+
+    await repo.hold_product_stock(user.id_user, product_id, 2, datetime.utcnow() + timedelta(minutes=5), commit=False)
+    # the cached entry stays until the write commits
+    assert await repo.cache.backend.get(f"product:{product_id}") is not None
+
+    await db_session.commit()
+    await repo.flush_invalidations()
+    assert (await repo.get_product_by_id(product_id)).stock == 3
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core.base_class import Base
+from app.domain.products.repositories import ProductRepository
+
+
+@pytest.mark.asyncio
+async def test_concurrent_decrements_never_oversell(tmp_path):
+    # a file database with one connection per session so the tasks really race
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'stock.db'}",
+        poolclass=NullPool,
+        connect_args={"timeout": 30},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as session:
+        product = await ProductRepository(session).create_product(
+            name="Hot", description=None, price=1, stock=25, product_image_url=None
+        )
+        product_id = product.id_product
+
+    async def buy():
+        async with session_factory() as session:
+            return await ProductRepository(session).decrement_product_stock(product_id, 1)
+
+    results = await asyncio.gather(*(buy() for _ in range(60)))
+
+    async with session_factory() as session:
+        fetched = await ProductRepository(session).get_product_by_id(product_id)
+
+    await engine.dispose()
+
+    succeeded = [remaining for remaining in results if remaining is not None]
+    assert len(succeeded) == 25
+    assert sorted(succeeded) == list(range(25))
+    assert getattr(fetched, "stock", None) == 0
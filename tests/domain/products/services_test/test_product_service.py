@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime, timedelta
 
 from app.domain.products.repositories import ProductRepository
 from app.domain.products.schemas import ProductCreate, ProductUpdate
@@ -19,7 +20,7 @@ async def test_create_product_via_service(db_session):
 
 
 @pytest.mark.asyncio
-async def test_update_and_delete_product(db_session):
+async def test_update_and_delete_product(db_session, user_factory):
     repo = ProductRepository(db_session)
     service = ProductService(repo)
     product = await service.create_product(
@@ -38,5 +39,10 @@ async def test_update_and_delete_product(db_session):
     assert stock is not None
     assert stock.stock == 6
 
+    user = await user_factory()
+    await repo.hold_product_stock(user.id_user, product.id_product, 4, datetime.utcnow() + timedelta(minutes=5))
+    with pytest.raises(ValueError):
+        await service.update_product_stock(product.id_product, 3)
+
     deleted = await service.delete_product(product.id_product)
-    assert deleted is True
+    assert deleted == 1
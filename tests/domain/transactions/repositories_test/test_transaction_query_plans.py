@@ -0,0 +1,33 @@
+import pytest
+
+from app.domain.transactions.models import TransactionStatus
+from app.domain.transactions.repositories import TransactionRepository
+from app.utils.pagination import decode_cursor, next_cursor
+from tests.factories import create_expedition_service, create_product, create_transaction
+
+
+@pytest.mark.asyncio
+async def test_transaction_queries_use_indexes(db_session, user_factory, assert_uses_indexes):
+    """Transaction queries have a usable index under SQLite's planner (see assert_uses_indexes)."""
+    user = await user_factory()
+    expedition = await create_expedition_service(db_session)
+    product = await create_product(db_session, price=10, stock=50)
+    for _ in range(3):
+        transaction = await create_transaction(
+            db_session,
+            user_id=user.id_user,
+            expedition_service_id=expedition.id_expedition_service,
+            items=[{"id_product": product.id_product, "quantity": 1, "price_at_time": 10}],
+        )
+    transaction_id = transaction.id_transaction
+    repo = TransactionRepository(db_session)
+
+    await assert_uses_indexes(repo.get_transaction_by_id(transaction_id))
+    await assert_uses_indexes(repo.get_transaction_items(transaction_id))
+    await assert_uses_indexes(repo.get_transaction_status_by_id(transaction_id))
+    page = await assert_uses_indexes(repo.get_all_transactions(user_id=user.id_user, limit=2))
+    cursor = decode_cursor(next_cursor(page, 2, "created_at", "id_transaction"))
+    await assert_uses_indexes(repo.get_all_transactions(user_id=user.id_user, limit=2, cursor=cursor))
+    await assert_uses_indexes(repo.get_all_transactions(limit=2, cursor=cursor))
+    await assert_uses_indexes(repo.count_transactions(user_id=user.id_user, status=TransactionStatus.PENDING))
+    await assert_uses_indexes(repo.update_transaction_status(transaction_id, TransactionStatus.PAID))
@@ -2,7 +2,8 @@ import pytest
 
 from app.domain.transactions.models import TransactionStatus
 from app.domain.transactions.repositories import TransactionRepository
-from tests.factories import create_expedition_service, create_product
+from app.utils.pagination import decode_cursor, next_cursor
+from tests.factories import create_expedition_service, create_product, create_transaction
 
 
 @pytest.mark.asyncio
@@ -48,3 +49,33 @@ async def test_update_status_and_query_all(db_session, user_factory):
     all_for_user = await repo.get_all_transactions(user_id=user.id_user, status=TransactionStatus.PAID, limit=10, offset=0)
     assert len(all_for_user) == 1
     assert getattr(all_for_user[0], "status", None) == TransactionStatus.PAID
+    assert await repo.count_transactions(user_id=user.id_user, status=TransactionStatus.PAID) == (1, False)
+    assert await repo.count_transactions(user_id=user.id_user, status=TransactionStatus.CANCELLED) == (0, False)
+
+
+@pytest.mark.asyncio
+async def test_get_all_transactions_pages_by_cursor(db_session, user_factory):
+    user = await user_factory()
+    expedition = await create_expedition_service(db_session, name="Keyset")
+    product = await create_product(db_session, price=10, stock=20)
+    for _ in range(3):
+        await create_transaction(
+            db_session,
+            user_id=user.id_user,
+            expedition_service_id=expedition.id_expedition_service,
+            items=[
+                {"id_product": product.id_product, "quantity": 1, "price_at_time": 10},
+                {"id_product": product.id_product, "quantity": 2, "price_at_time": 10},
+            ],
+        )
+
+    repo = TransactionRepository(db_session)
+    first_page = await repo.get_all_transactions(user_id=user.id_user, limit=2)
+    assert len(first_page) == 2
+    assert all(len(transaction.items) == 2 for transaction in first_page)
+
+    cursor = decode_cursor(next_cursor(first_page, 2, "created_at", "id_transaction"))
+    second_page = await repo.get_all_transactions(user_id=user.id_user, limit=2, cursor=cursor)
+    assert len(second_page) == 1
+    seen = {transaction.id_transaction for transaction in first_page}
+    assert second_page[0].id_transaction not in seen
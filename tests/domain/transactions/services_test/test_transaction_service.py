@@ -1,3 +1,5 @@
+from datetime import datetime, timedelta
+
 import pytest
 
 from app.domain.carts.repositories import CartRepository
@@ -93,3 +95,108 @@ async def test_update_expedition_service_only_pending(db_session, user_factory):
     await transaction_repo.update_transaction_status(tx.id_transaction, TransactionStatus.PAID)
     with pytest.raises(ValueError):
         await service.update_expedition_service(tx.id_transaction, expedition1.id_expedition_service)
+
+
+@pytest.mark.asyncio
+async def test_create_transaction_validates_combined_quantities(db_session, user_factory):
+    user = await user_factory()
+    expedition = await create_expedition_service(db_session, name="Bulk")
+    product_repo = ProductRepository(db_session)
+    first = await create_product(db_session, price=10, stock=3)
+    second = await create_product(db_session, price=20, stock=5)
+
+    service = TransactionService(
+        TransactionRepository(db_session),
+        ExpeditionRepository(db_session),
+        product_repo,
+        CartRepository(db_session),
+    )
+
+    with pytest.raises(ValueError):
+        await service.create_transaction(
+            TransactionCreate(
+                id_user=user.id_user,
+                id_expedition_service=expedition.id_expedition_service,
+                items=[
+                    TransactionItem(id_product=first.id_product, quantity=2),
+                    TransactionItem(id_product=first.id_product, quantity=2),
+                ],
+            )
+        )
+
+    tx = await service.create_transaction(
+        TransactionCreate(
+            id_user=user.id_user,
+            id_expedition_service=expedition.id_expedition_service,
+            items=[
+                TransactionItem(id_product=first.id_product, quantity=1),
+                TransactionItem(id_product=second.id_product, quantity=2),
+                TransactionItem(id_product=first.id_product, quantity=2),
+            ],
+        )
+    )
+
+    assert tx.total == 10 + 40 + 20
+    assert len(tx.items) == 3
+    assert getattr(await product_repo.get_product_by_id(first.id_product), "stock", None) == 0
+    assert getattr(await product_repo.get_product_by_id(second.id_product), "stock", None) == 3
+
+
+@pytest.mark.asyncio
+async def test_create_transaction_from_cart_converts_holds(db_session, user_factory):
+    user = await user_factory()
+    user_id = user.id_user
+    expedition = await create_expedition_service(db_session, name="Held")
+    product = await create_product(db_session, price=30, stock=3)
+    product_id = product.id_product
+    product_repo = ProductRepository(db_session)
+    cart_repo = CartRepository(db_session)
+
+    await product_repo.hold_product_stock(user_id, product_id, 3, datetime.utcnow() + timedelta(minutes=15))
+    await cart_repo.create_cart(user_id, product_id, quantity=3, price_at_time=30)
+    assert getattr(await product_repo.get_product_by_id(product_id), "stock", None) == 0
+
+    service = TransactionService(
+        TransactionRepository(db_session),
+        ExpeditionRepository(db_session),
+        product_repo,
+        cart_repo,
+    )
+    tx = await service.create_transaction(
+        TransactionCreate(id_user=user_id, id_expedition_service=expedition.id_expedition_service, items=None)
+    )
+
+    assert tx.items
+    slots = await product_repo.get_stock_slots(product_id)
+    assert [(slot.stock, slot.reserved) for slot in slots] == [(0, 0)]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_transaction_restocks_items(db_session, user_factory):
+    user = await user_factory()
+    expedition = await create_expedition_service(db_session, name="Cancel")
+    product = await create_product(db_session, price=15, stock=4)
+    product_repo = ProductRepository(db_session)
+
+    service = TransactionService(
+        TransactionRepository(db_session),
+        ExpeditionRepository(db_session),
+        product_repo,
+        CartRepository(db_session),
+    )
+    tx = await service.create_transaction(
+        TransactionCreate(
+            id_user=user.id_user,
+            id_expedition_service=expedition.id_expedition_service,
+            items=[TransactionItem(id_product=product.id_product, quantity=3)],
+        )
+    )
+    assert await product_repo.get_on_hand_stock(product.id_product) == 1
+
+    await service.update_transaction_status(tx.id_transaction, TransactionStatus.CANCELLED)
+    await service.update_transaction_status(tx.id_transaction, TransactionStatus.CANCELLED)
+    with pytest.raises(ValueError):
+        await service.update_transaction_status(tx.id_transaction, TransactionStatus.PENDING)
+
+    assert await product_repo.get_on_hand_stock(product.id_product) == 4
+    assert await product_repo.get_ledger_stock(product.id_product) == 4
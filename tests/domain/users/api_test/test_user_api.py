@@ -23,3 +23,34 @@ async def test_list_users_requires_admin(client, admin_user):
     body = resp.json()
     assert body["meta"]["success"] is True
     assert len(body["data"]) >= 2
+
+
+@pytest.mark.asyncio
+async def test_import_users_reports_each_row(client, regular_user):
+    csv_body = (
+        "name,email,password,role\n"
+        "Ana,ana@example.com,secret1,\n"
+        f"Dup,{regular_user.email},secret2,user\n"
+        "Ana Again,ana@example.com,secret3,\n"
+        "Broken,not-an-email,secret4,\n"
+        "Boss,boss@example.com,secret5,admin\n"
+    )
+    resp = await client.post("/api/v1/users/import", content=csv_body, headers={"content-type": "text/csv"})
+    assert resp.status_code == 200
+    results = resp.json()["data"]
+    assert [r["status"] for r in results] == ["created", "exists", "duplicate", "invalid", "created"]
+    assert results[0]["id"]
+
+    ndjson = '{"name": "Bo", "email": "bo@example.com", "password": "pw"}\n{"name": "Ana", "email": "ana@example.com", "password": "pw"}'
+    stream_resp = await client.post(
+        "/api/v1/users/import", content=ndjson, headers={"content-type": "application/x-ndjson"}
+    )
+    assert [r["status"] for r in stream_resp.json()["data"]] == ["created", "exists"]
+
+    users_resp = await client.get("/api/v1/users", params={"limit": 50})
+    roles = {user["email"]: user["role"] for user in users_resp.json()["data"]}
+    assert roles["boss@example.com"] == "admin"
+    assert roles["bo@example.com"] == "user"
+
+    invalid_resp = await client.post("/api/v1/users/import", json={"email": "x@example.com"})
+    assert invalid_resp.status_code == 400
@@ -0,0 +1,24 @@
+import pytest
+from datetime import datetime, timedelta
+
+from app.domain.users.models import UserRole
+from app.domain.users.repositories import UserRepository
+from app.utils.pagination import decode_cursor, next_cursor
+
+
+@pytest.mark.asyncio
+async def test_user_queries_use_indexes(db_session, user_factory, assert_uses_indexes):
+    """User queries have a usable index under SQLite's planner (see assert_uses_indexes)."""
+    for _ in range(3):
+        user = await user_factory()
+    repo = UserRepository(db_session)
+    since = datetime.utcnow() - timedelta(days=1)
+
+    await assert_uses_indexes(repo.get_user_by_id(user.id_user))
+    await assert_uses_indexes(repo.get_user_by_email(user.email))
+    page = await assert_uses_indexes(repo.get_all_users(limit=2))
+    cursor = decode_cursor(next_cursor(page, 2, "created_at", "id_user"))
+    await assert_uses_indexes(repo.get_all_users(limit=2, cursor=cursor))
+    await assert_uses_indexes(repo.get_all_users(limit=2, role=UserRole.USER, cursor=cursor))
+    await assert_uses_indexes(repo.get_all_users(limit=2, created_from=since))
+    await assert_uses_indexes(repo.count_users(role=UserRole.USER))
@@ -1,5 +1,8 @@
 import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
 
+from app.core.cache import Cache, MemoryCacheBackend
 from app.domain.users.models import UserRole
 from app.domain.users.repositories import UserRepository
 from app.domain.auth.security import get_password_hash
@@ -52,3 +55,49 @@ async def test_update_user(db_session):
     all_users = await repo.get_all_users(limit=10, offset=0)
     assert len(all_users) == 1
     assert all_users[0].name == "New Name"
+
+
+@pytest.mark.asyncio
+async def test_get_principal_is_cached_until_user_is_updated(db_session, engine, user_factory):
+    user = await user_factory()
+    user_id = user.id_user
+    repo = UserRepository(db_session, cache=Cache(MemoryCacheBackend(max_entries=10), ttl_seconds=60))
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    await repo.get_principal(user_id)
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        principal = await repo.get_principal(user_id)
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+    assert statements == []
+    assert principal.role == UserRole.USER
+    assert principal.password is None
+
+    await repo.update_user(user_id, role=UserRole.ADMIN)
+    assert (await repo.get_principal(user_id)).role == UserRole.ADMIN
+
+
+@pytest.mark.asyncio
+async def test_get_all_users_filters(db_session):
+    repo = UserRepository(db_session)
+    for name, email, role in [
+        ("Alice Moss", "Alice@Example.com", UserRole.USER),
+        ("Alfred", "fred@example.com", UserRole.ADMIN),
+        ("Bob", "bob_al@example.com", UserRole.USER),
+    ]:
+        await repo.create_user(
+            name=name, email=email, role=role, profile_picture=None, hashed_password="x"
+        )
+
+    names = lambda users: sorted(user.name for user in users)
+    assert names(await repo.get_all_users(search="al")) == ["Alfred", "Alice Moss"]
+    assert names(await repo.get_all_users(search="ALICE@")) == ["Alice Moss"]
+    assert names(await repo.get_all_users(search="bob_")) == ["Bob"]
+    assert names(await repo.get_all_users(search="b%")) == []
+    assert names(await repo.get_all_users(search="al", role=UserRole.ADMIN)) == ["Alfred"]
+    assert names(await repo.get_all_users(created_to=datetime.utcnow() - timedelta(days=1))) == []
+    assert await repo.count_users(search="al") == (2, False)